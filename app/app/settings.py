@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,13 +82,40 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+def env_flag(name, default=False):
+    """Read a boolean (1/true/yes) environment variable"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+# Connections are kept open for DB_CONN_MAX_AGE seconds per thread or,
+# with DB_POOL, shared by the threads of a process through a pool that
+# they go back to after each request. DB_PGBOUNCER disables server-side
+# cursors, which pgbouncer's transaction pooling doesn't support.
+DB_POOL = env_flag('DB_POOL')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': ('core.backends.postgresql' if DB_POOL
+                   else 'django.db.backends.postgresql'),
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': (0 if DB_POOL else
+                         int(os.environ.get('DB_CONN_MAX_AGE', 60))),
+        'CONN_HEALTH_CHECKS': env_flag('DB_CONN_HEALTH_CHECKS', True),
+        'DISABLE_SERVER_SIDE_CURSORS': env_flag('DB_PGBOUNCER'),
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            },
+        } if DB_POOL else {},
     }
 }
 
@@ -134,12 +163,60 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# ModelBackend checking passwords in the hashing pool (see core.hashing)
+AUTHENTICATION_BACKENDS = ['core.hashing.HashingPoolBackend']
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
 }
+
+# Token -> user cache of CachedTokenAuthentication. Entries are dropped in
+# the process that deletes a token or saves a user, other processes see
+# the change once the TTL (seconds) has expired.
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000))
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 60))
+
+# Seconds the recipe statistics of a user are cached (see recipe.stats)
+RECIPE_STATS_CACHE_TTL = int(os.environ.get('RECIPE_STATS_CACHE_TTL', 3600))
+
+# Password hashes run at once and hashes admitted (running or waiting)
+# before sign-ins/sign-ups are answered with 429
+HASHING_WORKERS = int(os.environ.get('HASHING_WORKERS', os.cpu_count() or 1))
+HASHING_MAX_PENDING = int(
+    os.environ.get('HASHING_MAX_PENDING', 4 * HASHING_WORKERS))
+
+# Processes hashing the passwords of bulk provisioned users (see
+# core.provisioning), one hashes in the requesting process
+PROVISIONING_WORKERS = int(
+    os.environ.get('PROVISIONING_WORKERS', os.cpu_count() or 1))
+
+# Requests slower than this (milliseconds) are logged with their SQL, and
+# the last REQUEST_METRICS_WINDOW requests of each view kept for /api/metrics/
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+REQUEST_METRICS_WINDOW = int(os.environ.get('REQUEST_METRICS_WINDOW', 1000))
+
+# Admin changelists the planner expects to have more rows than this are
+# paginated with the estimate instead of a COUNT(*) (see core.admin)
+ADMIN_EXACT_COUNT_LIMIT = int(
+    os.environ.get('ADMIN_EXACT_COUNT_LIMIT', 100000))
+
+# Default page size of the keyset paginated list endpoints
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+
+# Contact lists and retrieves render the JSON documents maintained by the
+# database (see contact.documents) instead of fetching the children. Off
+# by default, the documents are maintained either way.
+CONTACT_DOCUMENTS = env_flag('CONTACT_DOCUMENTS')
+
+# Days deletions are kept for the sync endpoints, older watermarks are
+# refused (see core.sync and the prune_tombstones command)
+SYNC_TOMBSTONE_DAYS = int(os.environ.get('SYNC_TOMBSTONE_DAYS', 30))
+# Rows answered per page of a sync
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 500))
+
 SPECTACULAR_SETTINGS = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'COMPONENTS': {
@@ -15,6 +15,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.views import MetricsView
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -30,4 +31,5 @@ urlpatterns = [
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls', 'recipe')),
     path('api/contact/', include('contact.urls', 'contact')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -0,0 +1,228 @@
+"""
+Detection and merging of duplicate contacts
+
+Contacts are only compared within blocks sharing a key: a normalized
+email, the last 10 digits of a phone number or the soundex of the names.
+Blocking, scoring and merging run in SQL, a few statements per user or
+batch of merges whatever the number of contacts.
+
+The keys are computed by each run rather than read from an index: a run
+blocks all the contacts of one user, which it reads through the owner
+and contact_id indexes, and the children tables have no user column to
+lead an index on their keys. A run costs a pass over the user's contacts
+and children plus hashing their keys, linear in their number; indexed
+keys would only pay off for looking up the duplicates of one contact.
+"""
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from core.models import Contact
+
+# Score of a pair: the weights of the keys it shares plus NAME_WEIGHT
+# times the trigram similarity of the full names, at most 1.
+EMAIL_WEIGHT = 0.6
+PHONE_WEIGHT = 0.5
+NAME_WEIGHT = 0.5
+# Blocks with more contacts (very common names, shared mailboxes) are
+# skipped, pairs grow with the square of the block size.
+MAX_BLOCK_SIZE = 50
+# Similarity from which names are reported as a reason of a pair
+NAME_MATCH = 0.5
+# Contacts merged per transaction by `dedupe_contacts()`
+MERGE_BATCH_SIZE = 1000
+
+NORMALIZED_EMAIL = 'lower(trim({}))'
+NORMALIZED_PHONE = r"right(regexp_replace({}, '\D', '', 'g'), 10)"
+
+DUPLICATES_SQL = f"""
+WITH owned AS (
+    SELECT id, first_name, last_name FROM core_contact
+    WHERE user_id = %(user_id)s
+), keys AS (
+    SELECT e.contact_id, 'email' AS kind,
+           {NORMALIZED_EMAIL.format('e.email')} AS key
+    FROM core_email e JOIN owned ON owned.id = e.contact_id
+    UNION
+    SELECT p.contact_id, 'phone',
+           {NORMALIZED_PHONE.format('p.phone_number')}
+    FROM core_phonenumber p JOIN owned ON owned.id = p.contact_id
+    WHERE length({NORMALIZED_PHONE.format('p.phone_number')}) >= 7
+    UNION
+    SELECT id, 'name', soundex(first_name) || soundex(last_name)
+    FROM owned WHERE first_name <> '' OR last_name <> ''
+), blocks AS (
+    SELECT kind, array_agg(contact_id) AS ids FROM keys
+    GROUP BY kind, key
+    HAVING count(*) BETWEEN 2 AND %(max_block_size)s
+), pairs AS (
+    SELECT a.id AS a, b.id AS b,
+           bool_or(kind = 'email') AS email,
+           bool_or(kind = 'phone') AS phone
+    FROM blocks
+    CROSS JOIN LATERAL unnest(blocks.ids) AS a(id)
+    CROSS JOIN LATERAL unnest(blocks.ids) AS b(id)
+    WHERE a.id < b.id
+    GROUP BY a.id, b.id
+), scored AS (
+    SELECT pairs.*, similarity(
+        upper(ca.first_name || ' ' || ca.last_name),
+        upper(cb.first_name || ' ' || cb.last_name)) AS name_similarity
+    FROM pairs
+    JOIN owned ca ON ca.id = pairs.a
+    JOIN owned cb ON cb.id = pairs.b
+)
+SELECT a, b, email, phone, name_similarity, least(1,
+    CASE WHEN email THEN %(email_weight)s ELSE 0 END +
+    CASE WHEN phone THEN %(phone_weight)s ELSE 0 END +
+    %(name_weight)s * name_similarity) AS score
+FROM scored
+WHERE least(1,
+    CASE WHEN email THEN %(email_weight)s ELSE 0 END +
+    CASE WHEN phone THEN %(phone_weight)s ELSE 0 END +
+    %(name_weight)s * name_similarity) >= %(min_score)s
+ORDER BY score DESC, a, b
+LIMIT %(limit)s
+"""
+
+# Children are moved with one UPDATE per table, then children a target
+# now holds twice are deleted, keeping the oldest.
+MOVE_CHILDREN_SQL = """
+UPDATE {table} SET contact_id = merge.target
+FROM unnest(%s::bigint[], %s::bigint[]) AS merge(source, target)
+WHERE {table}.contact_id = merge.source
+"""
+
+DELETE_DUPLICATE_CHILDREN_SQL = """
+DELETE FROM {table} duplicate USING {table} kept
+WHERE duplicate.contact_id = ANY(%s::bigint[])
+  AND kept.contact_id = duplicate.contact_id
+  AND {same}
+  AND kept.id < duplicate.id
+"""
+
+# The sources have no children left once they are moved
+DELETE_SOURCES_SQL = 'DELETE FROM core_contact WHERE id = ANY(%s::bigint[])'
+
+CHILD_KEYS = {
+    'core_email': NORMALIZED_EMAIL.format('kept.email') + ' = ' +
+    NORMALIZED_EMAIL.format('duplicate.email'),
+    'core_phonenumber': NORMALIZED_PHONE.format('kept.phone_number') +
+    ' = ' + NORMALIZED_PHONE.format('duplicate.phone_number'),
+    'core_socialmedialink': 'kept.link = duplicate.link',
+}
+
+
+def find_duplicates(user, min_score=0.5, limit=None,
+                    max_block_size=MAX_BLOCK_SIZE):
+    """Return the candidate duplicate pairs of a user's contacts
+
+    Pairs are dicts with the two contact ids (lowest first), the score
+    and the keys they share, best scores first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(DUPLICATES_SQL, {
+            'user_id': user.pk,
+            'min_score': min_score,
+            'limit': limit,
+            'max_block_size': max_block_size,
+            'email_weight': EMAIL_WEIGHT,
+            'phone_weight': PHONE_WEIGHT,
+            'name_weight': NAME_WEIGHT,
+        })
+        rows = cursor.fetchall()
+    return [{
+        'contacts': [a, b],
+        'score': round(float(score), 3),
+        'reasons': [reason for reason, shared in [
+            ('email', email), ('phone', phone),
+            ('name', name_similarity >= NAME_MATCH)] if shared],
+    } for a, b, email, phone, name_similarity, score in rows]
+
+
+def group_duplicates(pairs):
+    """Group pairs into (target, sources) merges
+
+    Contacts linked by pairs, directly or not, are merged into the oldest
+    (lowest id) of them.
+    """
+    parent = {}
+
+    def find(pk):
+        root = pk
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while pk != root:
+            parent[pk], pk = root, parent.get(pk, root)
+        return root
+
+    for pair in pairs:
+        a, b = (find(pk) for pk in pair['contacts'])
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    groups = {}
+    for pk in parent:
+        groups.setdefault(find(pk), []).append(pk)
+    return [(target, sorted(sources))
+            for target, sources in sorted(groups.items())]
+
+
+def merge_contacts(user, merges):
+    """Merge each (target, sources) of a user in one transaction
+
+    The children of the sources are moved to their target, keeping one
+    of each email, phone number and link, and the sources are deleted.
+    Raises ValidationError if a contact isn't the user's or is in more
+    than one merge.
+    """
+    sources = [pk for _, group in merges for pk in group]
+    targets = [target for target, _ in merges]
+    ids = targets + sources
+    if len(set(ids)) != len(ids):
+        raise serializers.ValidationError(
+            'A contact can only be merged once.')
+    if not sources:
+        return 0
+
+    with transaction.atomic():
+        owned = set(Contact.objects.filter(
+            user=user, id__in=ids).select_for_update().values_list(
+            'id', flat=True))
+        unknown = sorted(set(ids) - owned)
+        if unknown:
+            raise serializers.ValidationError(
+                [f'Invalid contact id {pk}.' for pk in unknown])
+
+        source_targets = [target for target, group in merges
+                          for _ in group]
+        with connection.cursor() as cursor:
+            for table, same in CHILD_KEYS.items():
+                cursor.execute(MOVE_CHILDREN_SQL.format(table=table),
+                               [sources, source_targets])
+                cursor.execute(DELETE_DUPLICATE_CHILDREN_SQL.format(
+                    table=table, same=same), [targets])
+            cursor.execute(DELETE_SOURCES_SQL, [sources])
+    return len(sources)
+
+
+def dedupe_contacts(user, min_score=0.9, dry_run=False,
+                    batch_size=MERGE_BATCH_SIZE):
+    """Find and merge the duplicate contacts of a user
+
+    Returns the number of candidate pairs, merges and merged contacts.
+    Merges are committed in batches of about `batch_size` contacts.
+    """
+    pairs = find_duplicates(user, min_score)
+    merges = group_duplicates(pairs)
+    merged = 0
+    if not dry_run:
+        batch, size = [], 0
+        for target, sources in merges:
+            batch.append((target, sources))
+            size += len(sources)
+            if size >= batch_size:
+                merged += merge_contacts(user, batch)
+                batch, size = [], 0
+        if batch:
+            merged += merge_contacts(user, batch)
+    return {'pairs': len(pairs), 'merges': len(merges), 'merged': merged}
@@ -0,0 +1,86 @@
+"""
+Materialized JSON documents of contacts
+
+`Contact.document` holds the contact and its children as ContactSerializer
+renders them, written by database triggers in the transaction changing the
+contact or a child (see migration 0010). Lists and retrieves render the
+documents of the page, with settings.CONTACT_DOCUMENTS, instead of
+fetching the children. Documents are checked and rebuilt against their
+tables by the rebuild_contact_documents command.
+"""
+from django.conf import settings
+from django.db import connection
+from rest_framework import serializers
+
+from core.models import Contact
+from core.readers import DocumentReader
+
+from .serializers import ContactSerializer
+
+STALE_SQL = """
+SELECT id FROM core_contact
+WHERE document IS DISTINCT FROM core_contact_document(
+    id, first_name, last_name)
+ORDER BY id
+LIMIT %s
+"""
+
+REBUILD_SQL = """
+UPDATE core_contact
+SET document = core_contact_document(id, first_name, last_name)
+WHERE id >= %s AND id < %s
+  AND document IS DISTINCT FROM core_contact_document(
+      id, first_name, last_name)
+"""
+
+# Contacts checked per statement by `rebuild_documents()`
+REBUILD_BATCH_SIZE = 10000
+
+
+def get_document_reader(serializer):
+    """Return a reader of the documents for a ContactSerializer or None
+
+    Without children to render, reading the columns is cheaper than the
+    whole documents and there is no reader either.
+    """
+    if not (settings.CONTACT_DOCUMENTS and
+            isinstance(serializer, ContactSerializer)):
+        return None
+    fields = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name not in ContactSerializer.Meta.fields:
+            return None
+        if isinstance(field, serializers.ListSerializer):
+            fields.append((name, [
+                child_name for child_name, child in
+                field.child.fields.items() if not child.write_only]))
+        else:
+            fields.append(name)
+    if not any(isinstance(field, tuple) for field in fields):
+        return None
+    return DocumentReader(Contact, 'document', fields)
+
+
+def find_stale_documents(limit=None):
+    """Return the ids of the contacts whose document is out of date"""
+    with connection.cursor() as cursor:
+        cursor.execute(STALE_SQL, [limit])
+        return [pk for pk, in cursor.fetchall()]
+
+
+def rebuild_documents(batch_size=REBUILD_BATCH_SIZE):
+    """Rewrite the out of date documents, return how many were
+
+    Each batch of contacts (by id range) is its own statement, so rows
+    are only locked for a batch.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT min(id), max(id) FROM core_contact')
+        low, high = cursor.fetchone()
+        rebuilt = 0
+        for start in range(low or 0, (high or -1) + 1, batch_size):
+            cursor.execute(REBUILD_SQL, [start, start + batch_size])
+            rebuilt += cursor.rowcount
+    return rebuilt
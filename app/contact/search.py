@@ -0,0 +1,56 @@
+"""
+Ranked full-text and fuzzy search over contacts
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import DecimalField, F, Q
+from django.db.models.functions import Cast, Greatest, Upper
+
+# Characters kept in search terms, everything else separates terms.
+TERM = re.compile(r'[\w@.+-]+')
+
+
+def get_search_text(request):
+    """Return the `?q=` search text of a request or None"""
+    return request.query_params.get('q', '').strip() or None
+
+
+def _prefix_query(text):
+    """Build a `term:* & term:*` tsquery matching word prefixes"""
+    terms = [term.strip('.-+') for term in TERM.findall(text.lower())]
+    terms = [term for term in terms if term]
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f"'{term}':*" for term in terms),
+                       search_type='raw', config='simple')
+
+
+def search_contacts(queryset, text):
+    """Filter contacts matching `text` and annotate them with a `rank`
+
+    Matches prefixes of the names, emails, phone numbers and tags kept in
+    `search_vector` and names within trigram distance of the text. The
+    rank is rounded to a numeric, so it can be used in a keyset cursor.
+    """
+    upper_text = text.strip().upper()
+    query = _prefix_query(text)
+    queryset = queryset.alias(
+        upper_first_name=Upper('first_name'),
+        upper_last_name=Upper('last_name'),
+    )
+
+    match = (Q(upper_first_name__trigram_similar=upper_text) |
+             Q(upper_last_name__trigram_similar=upper_text))
+    similarity = Greatest(
+        TrigramSimilarity('upper_first_name', upper_text),
+        TrigramSimilarity('upper_last_name', upper_text))
+    if query is not None:
+        match |= Q(search_vector=query)
+        score = SearchRank(F('search_vector'), query) + similarity
+    else:
+        score = similarity
+
+    return queryset.filter(match).annotate(
+        rank=Cast(score, DecimalField(max_digits=12, decimal_places=6)))
@@ -1,26 +1,46 @@
+from django.db import transaction
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetMixin
+from core.metrics import TimedSerializerMixin
 from core.models import Contact, Email, PhoneNumber, SocialMediaLink
 
 
 class EmailSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Email
         fields = ['id', 'email']
 
 
 class PhoneNumberSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = PhoneNumber
         fields = ['id', 'phone_number']
 
 
 class SocialMediaLinkSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = SocialMediaLink
         fields = ['id', 'platform_name', 'link', 'tag']
 
 
-class ContactSerializer(serializers.ModelSerializer):
+CHILD_SERIALIZERS = {
+    'emails': EmailSerializer,
+    'phone_numbers': PhoneNumberSerializer,
+    'social_media_links': SocialMediaLinkSerializer,
+}
+
+CHILD_MODELS = {name: serializer.Meta.model
+                for name, serializer in CHILD_SERIALIZERS.items()}
+
+
+class ContactSerializer(TimedSerializerMixin, SparseFieldsetMixin,
+                        serializers.ModelSerializer):
     emails = EmailSerializer(many=True, required=False)
     phone_numbers = PhoneNumberSerializer(many=True, required=False)
     social_media_links = SocialMediaLinkSerializer(many=True, required=False)
@@ -34,110 +54,106 @@ class ContactSerializer(serializers.ModelSerializer):
                   'phone_numbers',
                   'social_media_links']
         read_only_fields = ['id']
+        # Left out when ?fields= or ?expand= is given and doesn't name them
+        expandable_fields = ['emails', 'phone_numbers', 'social_media_links']
 
     def create(self, validated_data):
-        emails_data = validated_data.pop('emails', [])
-        phone_numbers_data = validated_data.pop('phone_numbers', [])
-        social_media_links_data = validated_data.pop('social_media_links', [])
-        contact = Contact.objects.create(**validated_data)
-        for email_data in emails_data:
-            Email.objects.create(contact=contact, **email_data)
-        for phone_number_data in phone_numbers_data:
-            PhoneNumber.objects.create(
-                contact=contact, **phone_number_data)
-        for social_media_link_data in social_media_links_data:
-            SocialMediaLink.objects.create(
-                contact=contact, **social_media_link_data)
+        children = {name: validated_data.pop(name, None)
+                    for name in CHILD_MODELS}
+        with transaction.atomic():
+            contact = Contact.objects.create(**validated_data)
+            create_children([(contact, children)])
         return contact
 
     def update(self, instance, validated_data):
-        emails_data = (
-            validated_data.pop('emails', None))
-        phone_numbers_data = (
-            validated_data.pop('phone_numbers', None))
-        social_media_links_data = (
-            validated_data.pop('social_media_links', None))
-
-        if phone_numbers_data is not None:
-            phone_number_ids = [item['id'] for
-                                item in phone_numbers_data if 'id' in item]
-            for phone_number in (
-                    instance.phone_numbers.all()):
-                if (phone_number.id not in
-                        phone_number_ids):
-                    # Delete phone numbers not included in the request
-                    phone_number.delete()
-            for phone_number_data in phone_numbers_data:
-                phone_number_id = (
-                    phone_number_data.get('id', None))
-                if phone_number_id:
-                    phone_number_instance = (
-                        PhoneNumber.objects.get(
-                            id=phone_number_id, contact=instance))
-                    phone_number_instance.phone_number = (
-                        phone_number_data.get(
-                            'phone_number',
-                            phone_number_instance.phone_number))
-                    phone_number_instance.save()
-                else:
-                    PhoneNumber.objects.create(
-                        contact=instance, **phone_number_data)
-
-        if social_media_links_data is not None:
-            social_media_link_ids = \
-                [item['id']
-                 for item in social_media_links_data if 'id' in item]
-            for social_media_link in instance.social_media_links.all():
-                if social_media_link.id not in social_media_link_ids:
-                    # Delete social media links not included in the request
-                    social_media_link.delete()
-            for social_media_link_data in social_media_links_data:
-                social_media_link_id = (
-                    social_media_link_data.get('id', None))
-                if social_media_link_id:
-                    social_media_link_instance = (
-                        SocialMediaLink.objects.get(
-                            id=social_media_link_id, contact=instance))
-                    social_media_link_instance.platform_name = (
-                        social_media_link_data.get(
-                            'platform_name',
-                            social_media_link_instance.platform_name))
-                    social_media_link_instance.link = (
-                        social_media_link_data.get(
-                            'link', social_media_link_instance.link))
-                    social_media_link_instance.tag = (
-                        social_media_link_data.get(
-                            'tag', social_media_link_instance.tag))
-                    social_media_link_instance.save()
-                else:
-                    SocialMediaLink.objects.create(
-                        contact=instance, **social_media_link_data)
-
-        # Handling for phone_numbers and social_media_links similarly...
-
-        if emails_data is not None:
-            email_ids = [item['id'] for item in emails_data if 'id' in item]
-            for email in instance.emails.all():
-                if email.id not in email_ids:
-                    # Delete emails not included in the request
-                    email.delete()
-            for email_data in emails_data:
-                email_id = email_data.get('id', None)
-                if email_id:
-                    email_instance = Email.objects.get(
-                        id=email_id, contact=instance)
-                    email_instance.email = email_data.get(
-                        'email', email_instance.email)
-                    email_instance.save()
-                else:
-                    Email.objects.create(contact=instance, **email_data)
-
-        instance.first_name = validated_data.get(
-            'first_name', instance.first_name)
-        instance.last_name = validated_data.get(
-            'last_name', instance.last_name)
-        instance.save()
-
-        # Similar logic for updating phone_numbers and social_media_links...
-
+        children = {name: validated_data.pop(name, None)
+                    for name in CHILD_MODELS}
+        with transaction.atomic():
+            for related_name, items in children.items():
+                if items is not None:
+                    # Children left out of the request are deleted
+                    sync_children(instance, related_name, items)
+
+            instance.first_name = validated_data.get(
+                'first_name', instance.first_name)
+            instance.last_name = validated_data.get(
+                'last_name', instance.last_name)
+            instance.save()
         return instance
+
+
+class DuplicatesQuerySerializer(serializers.Serializer):
+    """Query parameters of the duplicates listing"""
+    min_score = serializers.FloatField(
+        min_value=0, max_value=1, default=0.5)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=1000, default=100)
+
+
+class MergeSerializer(serializers.Serializer):
+    """Contacts to merge into a target contact"""
+    target = serializers.IntegerField()
+    sources = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False)
+
+
+def _child_fields(related_name):
+    """Return the writable columns of a child relation"""
+    return [name for name in
+            CHILD_SERIALIZERS[related_name].Meta.fields if name != 'id']
+
+
+def create_children(contacts_children):
+    """Bulk create the children of new contacts
+
+    `contacts_children` is a list of (contact, {related_name: items})
+    pairs. Each child table costs a single INSERT.
+    """
+    for related_name, model in CHILD_MODELS.items():
+        fields = _child_fields(related_name)
+        objs = [model(contact=contact,
+                      **{name: item[name] for name in fields if name in item})
+                for contact, children in contacts_children
+                for item in children.get(related_name) or []]
+        if objs:
+            model.objects.bulk_create(objs)
+
+
+def sync_children(contact, related_name, items):
+    """Make a contact's children of one relation match `items`
+
+    Items with an `id` update that child, items without one are created
+    and existing children not referenced are deleted. At most one SELECT,
+    DELETE, UPDATE and INSERT is run, whatever the number of items.
+    """
+    model = CHILD_MODELS[related_name]
+    fields = _child_fields(related_name)
+    existing = model.objects.filter(
+        contact=contact).only('id', *fields).in_bulk()
+
+    keep_ids = {item['id'] for item in items if item.get('id')}
+    unknown_ids = keep_ids - existing.keys()
+    if unknown_ids:
+        raise serializers.ValidationError({related_name: [
+            f'Invalid id {pk} for this contact.'
+            for pk in sorted(unknown_ids)]})
+
+    stale_ids = existing.keys() - keep_ids
+    if stale_ids:
+        model.objects.filter(contact=contact, id__in=stale_ids).delete()
+
+    changed, new = {}, []
+    for item in items:
+        values = {name: item[name] for name in fields if name in item}
+        if not item.get('id'):
+            new.append(model(contact=contact, **values))
+            continue
+        obj = existing[item['id']]
+        for name, value in values.items():
+            if getattr(obj, name) != value:
+                setattr(obj, name, value)
+                changed[obj.id] = obj
+    if changed:
+        model.objects.bulk_update(changed.values(), fields)
+    if new:
+        model.objects.bulk_create(new)
@@ -1,10 +1,35 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+from contact.documents import find_stale_documents
+from contact.serializers import ContactSerializer
 from core.models import Contact, Email, PhoneNumber, SocialMediaLink
+from core.planner import plan_queryset
 
 CONTACT_URL = reverse('contact:contact-list')
+IMPORT_URL = reverse('contact:contact-import-contacts')
+EXPORT_URL = reverse('contact:contact-export-contacts')
+ASYNC_CONTACT_URL = reverse('contact:contact-async-list')
+DUPLICATES_URL = reverse('contact:contact-duplicates')
+MERGE_URL = reverse('contact:contact-merge')
+BULK_UPDATE_URL = reverse('contact:contact-bulk-update')
+BULK_DELETE_URL = reverse('contact:contact-bulk-delete')
+SYNC_URL = reverse('contact:contact-sync')
+
+
+def async_contact_url(contact_id):
+    return reverse('contact:contact-async-detail', args=[contact_id])
 
 
 def create_user(email='user@example.com', password='testpass123'):
@@ -35,9 +60,10 @@ class PrivateContactAPITests(APITestCase):
         res = self.client.get(CONTACT_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 2)
-        self.assertEqual(res.data[0]['first_name'], 'John')
-        self.assertEqual(res.data[1]['first_name'], 'Jane')
+        # Newest contacts come first
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertEqual(res.data['results'][0]['first_name'], 'Jane')
+        self.assertEqual(res.data['results'][1]['first_name'], 'John')
 
 
 class ContactAPITests(APITestCase):
@@ -119,6 +145,159 @@ class ContactAPITests(APITestCase):
             updated_social_media_links.first().link,
             'https://linkedin.com/in/janedoe')
 
+    def test_update_contact_diffs_children(self):
+        """Test kept children are updated in place and others removed."""
+        contact = Contact.objects.create(
+            user=self.user, first_name='Jane', last_name='Doe')
+        kept = Email.objects.create(
+            contact=contact, email='kept@example.com')
+        dropped = Email.objects.create(
+            contact=contact, email='dropped@example.com')
+        phone_number = PhoneNumber.objects.create(
+            contact=contact, phone_number='0987654321')
+
+        url = reverse('contact:contact-detail', args=[contact.id])
+        payload = {
+            'emails': [{'id': kept.id, 'email': 'new@example.com'},
+                       {'email': 'added@example.com'}],
+        }
+        response = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        kept.refresh_from_db()
+        self.assertEqual(kept.email, 'new@example.com')
+        self.assertFalse(Email.objects.filter(id=dropped.id).exists())
+        self.assertEqual(
+            sorted(Email.objects.filter(
+                contact=contact).values_list('email', flat=True)),
+            ['added@example.com', 'new@example.com'])
+        # Relations left out of a partial update are untouched
+        self.assertTrue(
+            PhoneNumber.objects.filter(id=phone_number.id).exists())
+
+    def test_update_contact_rejects_foreign_child_id(self):
+        """Test children of another contact can't be updated."""
+        contact = Contact.objects.create(
+            user=self.user, first_name='Jane', last_name='Doe')
+        other = Contact.objects.create(
+            user=self.user, first_name='John', last_name='Doe')
+        email = Email.objects.create(
+            contact=other, email='john@example.com')
+
+        url = reverse('contact:contact-detail', args=[contact.id])
+        payload = {'first_name': 'Changed',
+                   'emails': [{'id': email.id, 'email': 'x@example.com'}]}
+        response = self.client.patch(url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        email.refresh_from_db()
+        contact.refresh_from_db()
+        self.assertEqual(email.email, 'john@example.com')
+        self.assertEqual(contact.first_name, 'Jane')
+
+    def test_update_contact_query_count_is_fixed(self):
+        """Test nested updates cost the same queries for any size."""
+        def update_queries(count):
+            contact = Contact.objects.create(
+                user=self.user, first_name='Jane', last_name='Doe')
+            for i in range(count):
+                Email.objects.create(
+                    contact=contact, email=f'jane{i}@example.com')
+                PhoneNumber.objects.create(
+                    contact=contact, phone_number=str(i))
+            emails = list(Email.objects.filter(contact=contact))
+            phone_numbers = list(PhoneNumber.objects.filter(contact=contact))
+            payload = {
+                'first_name': 'Jane',
+                'last_name': 'Doe',
+                'emails': (
+                    [{'id': e.id, 'email': f'new{e.id}@example.com'}
+                     for e in emails[::2]] +
+                    [{'email': f'add{i}@example.com'} for i in range(count)]),
+                'phone_numbers': [{'id': p.id, 'phone_number': '1'}
+                                  for p in phone_numbers[1::2]],
+                'social_media_links': [
+                    {'platform_name': 'Twitter',
+                     'link': 'https://twitter.com/janedoe',
+                     'tag': 'personal'}] * count,
+            }
+            url = reverse('contact:contact-detail', args=[contact.id])
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.put(url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                len(response.data['emails']), len(emails[::2]) + count)
+            return len(queries)
+
+        self.assertEqual(update_queries(4), update_queries(50))
+
+    def test_delete_contact_skips_children_prefetch(self):
+        """Test deleting a contact doesn't fetch its children."""
+        contact = Contact.objects.create(
+            user=self.user, first_name='Jane', last_name='Doe')
+        Email.objects.create(contact=contact, email='jane@example.com')
+
+        url = reverse('contact:contact-detail', args=[contact.id])
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.delete(url)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Email.objects.exists())
+        self.assertFalse([query['sql'] for query in queries
+                          if query['sql'].startswith('SELECT') and
+                          'core_email' in query['sql']])
+
+    def test_list_query_count_is_fixed(self):
+        """Test listing contacts costs the same queries for any size."""
+        def add_contacts(count):
+            for i in range(count):
+                contact = Contact.objects.create(
+                    user=self.user, first_name=f'John {i}', last_name='Doe')
+                Email.objects.create(
+                    contact=contact, email=f'john{i}@example.com')
+                PhoneNumber.objects.create(
+                    contact=contact, phone_number='1234567890')
+                SocialMediaLink.objects.create(
+                    contact=contact, platform_name='Twitter',
+                    link='https://twitter.com/johndoe', tag='personal')
+
+        # Version (ETag) lookup, contacts and one query per child table
+        add_contacts(1)
+        with self.assertNumQueries(5):
+            res = self.client.get(self.contact_url)
+        self.assertEqual(len(res.data['results']), 1)
+
+        add_contacts(10)
+        with self.assertNumQueries(5):
+            res = self.client.get(self.contact_url)
+        self.assertEqual(len(res.data['results']), 11)
+        self.assertEqual(len(res.data['results'][0]['emails']), 1)
+        self.assertEqual(
+            len(res.data['results'][0]['social_media_links']), 1)
+
+    def test_list_is_keyset_paginated(self):
+        """Test pages follow the cursor even when rows are inserted."""
+        contacts = [Contact.objects.create(
+            user=self.user, first_name=f'John {i}', last_name='Doe')
+            for i in range(5)]
+
+        res = self.client.get(self.contact_url, {'page_size': 2})
+        self.assertEqual(
+            [c['id'] for c in res.data['results']],
+            [contacts[4].id, contacts[3].id])
+        self.assertNotIn('count', res.data)
+
+        Contact.objects.create(
+            user=self.user, first_name='New', last_name='Doe')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [c['id'] for c in res.data['results']],
+            [contacts[2].id, contacts[1].id])
+        for query in queries:
+            self.assertNotIn('COUNT', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
     def test_delete_contact(self):
         """Test deleting a contact."""
         contact = Contact.objects.create(
@@ -128,3 +307,829 @@ class ContactAPITests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Contact.objects.count(), 0)
+
+
+class ContactImportTests(APITestCase):
+    """Test the bulk contact import endpoint"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_import_ndjson(self):
+        """Test importing contacts with children from NDJSON."""
+        records = [
+            {'first_name': f'John {i}', 'last_name': 'Doe',
+             'emails': [{'email': f'john{i}@example.com'}],
+             'phone_numbers': [{'phone_number': '1234567890'}],
+             'social_media_links': [
+                 {'platform_name': 'Twitter',
+                  'link': 'https://twitter.com/johndoe', 'tag': 'personal'}]}
+            for i in range(5)]
+        body = '\n'.join(json.dumps(record) for record in records)
+
+        with patch('contact.transfer.BATCH_SIZE', 2):
+            res = self.client.post(
+                IMPORT_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 5)
+        self.assertEqual(res.data['failed'], 0)
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(Email.objects.count(), 5)
+        self.assertEqual(PhoneNumber.objects.count(), 5)
+        self.assertEqual(SocialMediaLink.objects.count(), 5)
+
+    def test_import_reports_row_errors(self):
+        """Test invalid rows are reported and valid rows still imported."""
+        body = '\n'.join([
+            json.dumps({'first_name': 'John', 'last_name': 'Doe'}),
+            'not json',
+            json.dumps({'first_name': 'Jane',
+                        'emails': [{'email': 'not-an-email'}]}),
+            json.dumps({'first_name': 'Jane', 'last_name': 'Doe'}),
+        ])
+
+        res = self.client.post(
+            IMPORT_URL, body, content_type='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 2)
+        self.assertEqual(
+            [error['line'] for error in res.data['errors']], [2, 3])
+        self.assertIn('last_name', res.data['errors'][1]['errors'])
+        self.assertIn('emails', res.data['errors'][1]['errors'])
+
+    def test_import_reports_lines_that_are_not_utf8(self):
+        """Test undecodable lines are row errors, not server errors."""
+        ndjson = b'\n'.join([
+            json.dumps({'first_name': 'John', 'last_name': 'Doe'}).encode(),
+            b'{"first_name": "J\xe9r\xf4me", "last_name": "Doe"}',
+            json.dumps({'first_name': 'Jane', 'last_name': 'Doe'}).encode(),
+        ])
+        csv_body = (b'first_name,last_name\n'
+                    b'John,Doe\n'
+                    b'J\xe9r\xf4me,Doe\n'
+                    b'Jane,Doe\n')
+
+        for body, content_type in [(ndjson, 'application/x-ndjson'),
+                                   (csv_body, 'text/csv')]:
+            res = self.client.post(IMPORT_URL, body,
+                                   content_type=content_type)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data['created'], 2)
+            self.assertEqual(res.data['failed'], 1)
+            error, = res.data['errors']
+            self.assertEqual(error['line'], 2 if body is ndjson else 3)
+            self.assertEqual(error['errors']['non_field_errors'],
+                             ['Line is not valid UTF-8.'])
+
+    def test_import_csv(self):
+        """Test importing contacts from CSV."""
+        body = (
+            'first_name,last_name,emails,phone_numbers,social_media_links\n'
+            'John,Doe,john@example.com;jd@example.com,123,'
+            'Twitter|https://twitter.com/johndoe|personal\n'
+            'Jane,Doe,,,\n'
+        )
+
+        res = self.client.post(IMPORT_URL, body, content_type='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        john = Contact.objects.get(first_name='John')
+        self.assertEqual(
+            sorted(john.emails.values_list('email', flat=True)),
+            ['jd@example.com', 'john@example.com'])
+        self.assertEqual(john.social_media_links.get().tag, 'personal')
+        self.assertFalse(
+            Email.objects.filter(contact__first_name='Jane').exists())
+
+    def test_import_csv_without_name_columns(self):
+        """Test a CSV header without the name columns is refused."""
+        res = self.client.post(IMPORT_URL, 'name,email\nJohn,j@example.com\n',
+                               content_type='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['header'], [
+            'Missing column first_name.', 'Missing column last_name.'])
+
+    def test_import_failing_partway_creates_nothing(self):
+        """Test batches written before a failure are rolled back."""
+        body = '\n'.join(
+            json.dumps({'first_name': f'John {i}', 'last_name': 'Doe'})
+            for i in range(3))
+
+        with patch('contact.transfer.BATCH_SIZE', 1), \
+                patch('contact.transfer.create_children',
+                      side_effect=[None, DatabaseError('lost')]):
+            with self.assertRaises(DatabaseError):
+                self.client.post(IMPORT_URL, body,
+                                 content_type='application/x-ndjson')
+
+        self.assertFalse(Contact.objects.exists())
+
+
+class ContactExportTests(APITestCase):
+    """Test the streaming contact export endpoint"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            contact = Contact.objects.create(
+                user=self.user, first_name=f'John {i}', last_name='Doe')
+            Email.objects.create(
+                contact=contact, email=f'john{i}@example.com')
+            SocialMediaLink.objects.create(
+                contact=contact, platform_name='Twitter',
+                link='https://twitter.com/johndoe', tag='personal')
+        other = create_user(email='other@example.com')
+        Contact.objects.create(user=other, first_name='Other', last_name='X')
+
+    def test_export_ndjson(self):
+        """Test exporting contacts with children as NDJSON."""
+        with patch('core.export.CHUNK_SIZE', 2):
+            res = self.client.get(EXPORT_URL)
+            body = b''.join(res.streaming_content).decode()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [row['first_name'] for row in rows],
+            ['John 0', 'John 1', 'John 2'])
+        self.assertEqual(rows[1]['emails'][0]['email'], 'john1@example.com')
+        self.assertEqual(rows[1]['phone_numbers'], [])
+
+    def test_export_csv_round_trips_through_import(self):
+        """Test a CSV export can be imported again."""
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+        body = b''.join(res.streaming_content).decode()
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertEqual(len(body.splitlines()), 4)
+        Contact.objects.filter(user=self.user).delete()
+        res = self.client.post(IMPORT_URL, body, content_type='text/csv')
+        self.assertEqual(res.data['created'], 3)
+        self.assertEqual(
+            SocialMediaLink.objects.filter(
+                contact__user=self.user, tag='personal').count(), 3)
+
+    def test_export_invalid_format(self):
+        """Test an unknown export format is rejected."""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ContactSearchTests(APITestCase):
+    """Test searching contacts with ?q="""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.john = Contact.objects.create(
+            user=self.user, first_name='Johnathan', last_name='Smith')
+        Email.objects.create(contact=self.john, email='jsmith@example.com')
+        PhoneNumber.objects.create(
+            contact=self.john, phone_number='+1 (555) 123-4567')
+        self.jane = Contact.objects.create(
+            user=self.user, first_name='Jane', last_name='Doe')
+        SocialMediaLink.objects.create(
+            contact=self.jane, platform_name='Twitter',
+            link='https://twitter.com/janedoe', tag='volunteer')
+        other = create_user(email='other@example.com')
+        Contact.objects.create(
+            user=other, first_name='Johnathan', last_name='Smith')
+
+    def search(self, text, **params):
+        res = self.client.get(CONTACT_URL, {'q': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [contact['id'] for contact in res.data['results']]
+
+    def test_search_fields(self):
+        """Test names and children are searched by prefix."""
+        self.assertEqual(self.search('john'), [self.john.id])
+        self.assertEqual(self.search('jsmith@example'), [self.john.id])
+        self.assertEqual(self.search('example.com'), [self.john.id])
+        self.assertEqual(self.search('15551234'), [self.john.id])
+        self.assertEqual(self.search('volunt'), [self.jane.id])
+        self.assertEqual(self.search('jane doe'), [self.jane.id])
+        self.assertEqual(self.search('nobody'), [])
+
+    def test_search_is_fuzzy(self):
+        """Test misspelled names are matched."""
+        self.assertEqual(self.search('Jonathan'), [self.john.id])
+
+    def test_search_ranking_and_paging(self):
+        """Test results are ranked and paged by rank."""
+        SocialMediaLink.objects.create(
+            contact=self.jane, platform_name='GitHub',
+            link='https://github.com/janedoe', tag='smith')
+        self.assertEqual(self.search('smith'), [self.john.id, self.jane.id])
+
+        res = self.client.get(CONTACT_URL, {'q': 'smith', 'page_size': 1})
+        self.assertEqual(res.data['results'][0]['id'], self.john.id)
+        res = self.client.get(res.data['next'])
+        self.assertEqual(res.data['results'][0]['id'], self.jane.id)
+        self.assertIsNone(res.data['next'])
+
+    def test_search_follows_child_updates(self):
+        """Test the search index is kept up to date with children."""
+        Email.objects.filter(contact=self.john).update(
+            email='johnny@example.org')
+        self.assertEqual(self.search('johnny'), [self.john.id])
+        self.assertEqual(self.search('example.com'), [])
+
+        Email.objects.filter(contact=self.john).delete()
+        self.assertEqual(self.search('example.org'), [])
+
+
+@override_settings(CONTACT_DOCUMENTS=False)
+class ContactFieldsetTests(APITestCase):
+    """Test ?fields= and ?expand= prune responses and queries when the
+    children are fetched"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.contact = Contact.objects.create(
+            user=self.user, first_name='John', last_name='Doe')
+        Email.objects.create(contact=self.contact, email='john@example.com')
+        PhoneNumber.objects.create(
+            contact=self.contact, phone_number='+15551234567')
+
+    def get(self, url, queries, **params):
+        with CaptureQueriesContext(connection) as captured:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(captured), queries,
+                         '\n'.join(q['sql'] for q in captured))
+        return res.data['results'][0] if 'results' in res.data else res.data
+
+    def test_fields(self):
+        """Test only the requested fields are selected and rendered."""
+        # ETag version and page, no children prefetched
+        contact = self.get(CONTACT_URL, 2, fields='id,first_name')
+        self.assertEqual(contact, {'id': self.contact.id,
+                                   'first_name': 'John'})
+
+        contact = self.get(f'{CONTACT_URL}{self.contact.id}/', 2,
+                           fields='last_name')
+        self.assertEqual(contact, {'last_name': 'Doe'})
+
+    def test_expand(self):
+        """Test only the requested children are fetched."""
+        contact = self.get(CONTACT_URL, 3, expand='emails')
+        self.assertEqual(set(contact),
+                         {'id', 'first_name', 'last_name', 'emails'})
+        self.assertEqual(contact['emails'][0]['email'], 'john@example.com')
+
+        contact = self.get(CONTACT_URL, 2, expand='')
+        self.assertEqual(set(contact), {'id', 'first_name', 'last_name'})
+
+        contact = self.get(CONTACT_URL, 3, fields='id', expand='phone_numbers')
+        self.assertEqual(set(contact), {'id', 'phone_numbers'})
+
+    def test_default_renders_everything(self):
+        """Test responses are unchanged without ?fields= or ?expand=."""
+        contact = self.get(CONTACT_URL, 5)
+        self.assertEqual(len(contact), 6)
+
+    def test_async_fields(self):
+        """Test the async list takes ?fields= too."""
+        token = Token.objects.create(user=self.user)
+        res = self.client.get(
+            ASYNC_CONTACT_URL, {'fields': 'first_name'},
+            HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(res.json()['results'], [{'first_name': 'John'}])
+
+    def test_invalid_fields(self):
+        """Test unknown or unexpandable fields are rejected."""
+        for params in [{'fields': 'id,password'}, {'expand': 'first_name'}]:
+            res = self.client.get(CONTACT_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CONTACT_DOCUMENTS=True)
+class ContactDocumentTests(APITestCase):
+    """Test lists and retrieves rendered from the contact documents"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        res = self.client.post(CONTACT_URL, {
+            'first_name': 'Ada', 'last_name': 'Lovelace',
+            'emails': [{'email': 'ada@example.com'},
+                       {'email': 'ada@example.org'}],
+            'phone_numbers': [{'phone_number': '555-0100'}],
+            'social_media_links': [{
+                'platform_name': 'X', 'link': 'https://x.com/ada',
+                'tag': 'work'}],
+        }, format='json')
+        self.contact_id = res.data['id']
+        self.detail_url = reverse('contact:contact-detail',
+                                  args=[self.contact_id])
+        Contact.objects.create(user=self.user, first_name='Charles',
+                               last_name='Babbage')
+
+    def assertRendersLikeSerializer(self, url, params=None):
+        res = self.client.get(url, params)
+        with self.settings(CONTACT_DOCUMENTS=False):
+            expected = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # Byte for byte, key order included
+        self.assertEqual(res.content, expected.content)
+        return res.data
+
+    def test_documents_match_serializer(self):
+        """Test documents render lists and retrieves like the serializer."""
+        self.assertRendersLikeSerializer(CONTACT_URL)
+        self.assertRendersLikeSerializer(CONTACT_URL, {'q': 'ada'})
+        self.assertRendersLikeSerializer(
+            CONTACT_URL, {'fields': 'id,emails'})
+        self.assertRendersLikeSerializer(self.detail_url)
+        self.assertRendersLikeSerializer(self.detail_url, {'expand': ''})
+
+        res = self.client.get(reverse('contact:contact-detail', args=[0]))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_documents_replace_the_child_queries(self):
+        """Test a list reads the version and the documents only."""
+        with self.assertNumQueries(2):
+            self.client.get(CONTACT_URL)
+
+    def test_columns_only_fieldsets_skip_documents(self):
+        """Test fieldsets without children read the columns only."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertRendersLikeSerializer(
+                CONTACT_URL, {'fields': 'id,first_name'})
+
+        self.assertFalse(any('"document"' in query['sql']
+                             for query in queries))
+
+    def test_documents_follow_writes(self):
+        """Test documents are rewritten with the contact and children."""
+        res = self.client.patch(self.detail_url, {
+            'last_name': 'King',
+            'emails': [{'email': 'ada@example.net'}],
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        PhoneNumber.objects.filter(contact_id=self.contact_id).update(
+            phone_number='555-0199')
+        SocialMediaLink.objects.filter(contact_id=self.contact_id).delete()
+
+        contact = self.assertRendersLikeSerializer(self.detail_url)
+        self.assertEqual(contact['last_name'], 'King')
+        self.assertEqual([e['email'] for e in contact['emails']],
+                         ['ada@example.net'])
+        self.assertEqual(contact['phone_numbers'][0]['phone_number'],
+                         '555-0199')
+        self.assertEqual(contact['social_media_links'], [])
+        self.assertEqual(find_stale_documents(), [])
+
+    def test_children_are_rendered_by_id(self):
+        """Test documents, readers and prefetches order children alike."""
+        Email.objects.create(contact_id=self.contact_id,
+                             email='lovelace@example.com')
+        # The updated row goes after the others in the table
+        first = Email.objects.filter(contact_id=self.contact_id).first()
+        Email.objects.filter(id=first.id).update(email='ada@example.net')
+
+        contact = self.assertRendersLikeSerializer(self.detail_url)
+        ids = [email['id'] for email in contact['emails']]
+        self.assertEqual(ids[0], first.id)
+        self.assertEqual(ids, sorted(ids))
+        prefetched = ContactSerializer(plan_queryset(
+            Contact.objects.filter(id=self.contact_id),
+            ContactSerializer()), many=True).data
+        self.assertEqual(prefetched[0]['emails'], contact['emails'])
+
+    def test_rebuild_command(self):
+        """Test stale documents are reported and rebuilt."""
+        Contact.objects.filter(id=self.contact_id).update(document=None)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_contact_documents', check=True)
+        out = StringIO()
+        call_command('rebuild_contact_documents', stdout=out)
+
+        self.assertIn('1 documents rebuilt', out.getvalue())
+        self.assertEqual(find_stale_documents(), [])
+        self.assertRendersLikeSerializer(self.detail_url)
+
+
+class ContactDedupeTests(APITestCase):
+    """Test finding and merging duplicate contacts"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.john = self.create_contact(
+            'John', 'Smith', emails=['john@example.com'],
+            phones=['+1 (555) 123-4567'], links=['https://x.com/john'])
+        # Same email, differently written, and a close name
+        self.johnny = self.create_contact(
+            'Jon', 'Smith', emails=[' JOHN@example.com', 'jon@example.org'],
+            links=['https://x.com/john'])
+        # Same phone number only
+        self.work = self.create_contact(
+            'Johnathan', 'Smith', phones=['555-123-4567'])
+        self.jane = self.create_contact(
+            'Jane', 'Doe', emails=['jane@example.com'])
+        self.other = Contact.objects.create(
+            user=create_user(email='other@example.com'),
+            first_name='John', last_name='Smith')
+        Email.objects.create(contact=self.other, email='john@example.com')
+
+    def create_contact(self, first_name, last_name, emails=(), phones=(),
+                       links=()):
+        contact = Contact.objects.create(
+            user=self.user, first_name=first_name, last_name=last_name)
+        for email in emails:
+            Email.objects.create(contact=contact, email=email)
+        for phone in phones:
+            PhoneNumber.objects.create(contact=contact, phone_number=phone)
+        for link in links:
+            SocialMediaLink.objects.create(
+                contact=contact, platform_name='X', link=link, tag='x')
+        return contact
+
+    def test_duplicates(self):
+        """Test pairs sharing keys are scored, best first."""
+        res = self.client.get(DUPLICATES_URL, {'min_score': 0.3})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        pairs = {tuple(pair['contacts']): pair
+                 for pair in res.data['results']}
+        self.assertEqual(res.data['results'][0]['contacts'],
+                         [self.john.id, self.johnny.id])
+        self.assertIn('email', pairs[self.john.id, self.johnny.id]['reasons'])
+        self.assertIn('phone', pairs[self.john.id, self.work.id]['reasons'])
+        self.assertNotIn(self.jane.id, {pk for pair in pairs for pk in pair})
+        self.assertNotIn(self.other.id, {pk for pair in pairs for pk in pair})
+
+    def test_duplicates_min_score_and_limit(self):
+        """Test pairs under min_score are left out and limit applies."""
+        res = self.client.get(DUPLICATES_URL, {'min_score': 0.9})
+        self.assertEqual([pair['contacts'] for pair in res.data['results']],
+                         [[self.john.id, self.johnny.id]])
+
+        res = self.client.get(DUPLICATES_URL, {'min_score': 0, 'limit': 1})
+        self.assertEqual(len(res.data['results']), 1)
+
+        res = self.client.get(DUPLICATES_URL, {'min_score': 2})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_merge(self):
+        """Test children are moved to the target in a few statements."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(MERGE_URL, {
+                'target': self.john.id,
+                'sources': [self.johnny.id, self.work.id]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['merged'], 2)
+        contact = res.data['contacts'][0]
+        self.assertEqual(contact['id'], self.john.id)
+        self.assertEqual(sorted(e['email'] for e in contact['emails']),
+                         ['john@example.com', 'jon@example.org'])
+        self.assertEqual([p['phone_number'] for p in contact['phone_numbers']],
+                         ['+1 (555) 123-4567'])
+        self.assertEqual(len(contact['social_media_links']), 1)
+        self.assertFalse(Contact.objects.filter(
+            id__in=[self.johnny.id, self.work.id]).exists())
+        self.assertLess(len(queries), 25)
+        # The search index follows the moved children
+        res = self.client.get(CONTACT_URL, {'q': 'jon@example'})
+        self.assertEqual([c['id'] for c in res.data['results']],
+                         [self.john.id])
+
+    def test_merge_batch(self):
+        """Test a list of merges is applied in one transaction."""
+        res = self.client.post(MERGE_URL, [
+            {'target': self.john.id, 'sources': [self.johnny.id]},
+            {'target': self.work.id, 'sources': [self.jane.id]},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['merged'], 2)
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 2)
+
+    def test_merge_invalid(self):
+        """Test merges of others' or repeated contacts change nothing."""
+        for payload in [
+                {'target': self.john.id, 'sources': [self.other.id]},
+                [{'target': self.john.id, 'sources': [self.johnny.id]},
+                 {'target': self.work.id, 'sources': [self.johnny.id]}],
+                {'target': self.john.id, 'sources': []}]:
+            res = self.client.post(MERGE_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(Email.objects.filter(contact=self.other).count(), 1)
+
+    def test_dedupe_contacts_command(self):
+        """Test the command merges pairs over the score transitively."""
+        etag = self.client.get(CONTACT_URL)['ETag']
+
+        call_command('dedupe_contacts', user=[self.user.email],
+                     min_score=0.5, stdout=StringIO())
+
+        res = self.client.get(CONTACT_URL, headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(
+            sorted(Contact.objects.filter(
+                user=self.user).values_list('id', flat=True)),
+            [self.john.id, self.jane.id])
+        self.assertEqual(Contact.objects.filter(user=self.other.user).count(),
+                         1)
+
+
+class ContactBulkTests(APITestCase):
+    """Test bulk updates and deletes of contacts"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.contacts = [Contact.objects.create(
+            user=self.user, first_name='John', last_name=f'Smith {n}')
+            for n in range(3)]
+        for contact in self.contacts[:2]:
+            Email.objects.create(contact=contact, email='team@example.com')
+            Email.objects.create(contact=contact,
+                                 email=f'{contact.id}@example.com')
+        self.other = Contact.objects.create(
+            user=create_user(email='other@example.com'),
+            first_name='John', last_name='Other')
+        Email.objects.create(contact=self.other, email='team@example.com')
+
+    def test_bulk_update_by_filter(self):
+        """Test a filter across children matches each contact once."""
+        res = self.client.post(BULK_UPDATE_URL, {
+            'filter': {'emails__email__iexact': 'TEAM@example.com'},
+            'set': {'last_name': 'Team'}}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(res.data['results'], [
+            {'id': contact.id, 'status': 'updated'}
+            for contact in self.contacts[:2]])
+        self.assertEqual(Contact.objects.filter(last_name='Team').count(), 2)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.last_name, 'Other')
+        # The search index follows set-based updates
+        res = self.client.get(CONTACT_URL, {'q': 'team'})
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_bulk_update_invalidates_etag(self):
+        """Test cached lists are invalidated by a bulk update."""
+        etag = self.client.get(CONTACT_URL)['ETag']
+        self.client.post(BULK_UPDATE_URL, {
+            'ids': [self.contacts[0].id], 'set': {'first_name': 'Jon'}},
+            format='json')
+
+        res = self.client.get(CONTACT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_bulk_update_invalid_field(self):
+        """Test only whitelisted, valid values can be set."""
+        for values in [{'emails': []}, {'first_name': 'x' * 101}]:
+            res = self.client.post(BULK_UPDATE_URL, {
+                'ids': [self.contacts[0].id], 'set': values}, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete(self):
+        """Test contacts and their children are deleted set-based."""
+        ids = [self.contacts[0].id, self.contacts[1].id, self.other.id,
+               self.contacts[0].id]
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BULK_DELETE_URL, {'ids': ids},
+                                   format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'id': ids[0], 'status': 'deleted'},
+            {'id': ids[1], 'status': 'deleted'},
+            {'id': self.other.id, 'status': 'not_found'}])
+        self.assertEqual(
+            list(Contact.objects.filter(user=self.user).values_list(
+                'id', flat=True)), [self.contacts[2].id])
+        self.assertEqual(Email.objects.count(), 1)
+        self.assertLess(len(queries), 15)
+
+    def test_bulk_delete_limit(self):
+        """Test a request names at most 1000 ids."""
+        res = self.client.post(BULK_DELETE_URL, {
+            'ids': list(range(1, 1002))}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Contact.objects.count(), 4)
+
+    @patch('core.bulk.MAX_BULK_IDS', 2)
+    def test_bulk_filter_limit(self):
+        """Test a filter matching more rows than allowed is refused."""
+        res = self.client.post(BULK_DELETE_URL, {
+            'filter': {'first_name__iexact': 'john'}}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('filter', res.data)
+        self.assertEqual(Contact.objects.count(), 4)
+
+
+class ContactSyncTests(APITransactionTestCase):
+    """Test the incremental sync of contacts
+
+    Writes are committed as they go, so each is stamped after the last.
+    """
+
+    def setUp(self):
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+        self.contacts = [Contact.objects.create(
+            user=self.user, first_name='Ada', last_name=f'Lovelace {n}')
+            for n in range(3)]
+        self.phone = PhoneNumber.objects.create(
+            contact=self.contacts[0], phone_number='555-0100')
+        Contact.objects.create(user=create_user('other@example.com'),
+                               first_name='Other', last_name='User')
+
+    def sync(self, since=None):
+        res = self.client.get(SYNC_URL, {'since': since} if since else {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_sync(self):
+        """Test a sync without watermark answers all the user's rows."""
+        data = self.sync()
+
+        # In write order, adding the phone number touched the first.
+        first, second, third = self.contacts
+        self.assertEqual([c['id'] for c in data['changed']],
+                         [second.id, third.id, first.id])
+        self.assertEqual(data['changed'][2]['phone_numbers'][0]
+                         ['phone_number'], '555-0100')
+        self.assertEqual(data['deleted'], [])
+        self.assertIsNone(data['next'])
+
+    def test_sync_pages(self):
+        """Test only the last page of a sync has the watermark."""
+        watermark = self.sync()['watermark']
+        deleted = self.contacts[0].id
+        self.contacts[0].delete()
+        self.contacts[1].save()
+        self.contacts[2].save()
+
+        res = self.client.get(SYNC_URL, {'since': watermark, 'page_size': 1})
+        self.assertEqual([c['id'] for c in res.data['changed']],
+                         [self.contacts[1].id])
+        self.assertEqual(res.data['deleted'], [deleted])
+        self.assertIsNone(res.data['watermark'])
+        # Written while paging: answered again by the next sync.
+        self.contacts[1].save()
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual([c['id'] for c in res.data['changed']],
+                         [self.contacts[2].id])
+        self.assertEqual(res.data['deleted'], [])
+        self.assertIsNone(res.data['watermark'])
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual([c['id'] for c in res.data['changed']],
+                         [self.contacts[1].id])
+        self.assertIsNone(res.data['next'])
+        self.assertEqual([c['id'] for c in self.sync(
+            res.data['watermark'])['changed']], [self.contacts[1].id])
+
+    def test_sync_nothing_new(self):
+        """Test a sync with nothing new runs one query."""
+        watermark = self.sync()['watermark']
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.sync(watermark)
+
+        self.assertEqual(data['changed'], [])
+        self.assertEqual(data['deleted'], [])
+        self.assertEqual(len(queries), 1)
+
+    def test_sync_changes(self):
+        """Test child writes and deletions since the watermark are synced."""
+        watermark = self.sync()['watermark']
+        self.phone.phone_number = '555-0199'
+        self.phone.save()
+        deleted = self.contacts[2].id
+        self.client.post(BULK_DELETE_URL, {'ids': [deleted]}, format='json')
+
+        data = self.sync(watermark)
+
+        self.assertEqual([c['id'] for c in data['changed']],
+                         [self.contacts[0].id])
+        self.assertEqual(data['changed'][0]['phone_numbers'][0]
+                         ['phone_number'], '555-0199')
+        self.assertEqual(data['deleted'], [deleted])
+        self.assertEqual(self.sync(data['watermark'])['changed'], [])
+
+    def test_sync_invalid_watermark(self):
+        """Test malformed and expired watermarks are refused."""
+        res = self.client.get(SYNC_URL, {'since': 'yesterday'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(SYNC_URL, {'since': '2000-01-01T00:00:00Z'})
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+
+class ContactAsyncAPITests(TestCase):
+    """Test the async contact list and retrieve views"""
+
+    def setUp(self):
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+        for name in ['John', 'Jane', 'Jack']:
+            contact = Contact.objects.create(
+                user=self.user, first_name=name, last_name='Doe')
+            Email.objects.create(
+                contact=contact, email=f'{name.lower()}@example.com')
+            PhoneNumber.objects.create(
+                contact=contact, phone_number='1234567890')
+        self.other = Contact.objects.create(
+            user=create_user(email='other@example.com'),
+            first_name='Other', last_name='User')
+
+    async def test_auth_required(self):
+        res = await self.async_client.get(ASYNC_CONTACT_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+        res = await self.async_client.get(
+            ASYNC_CONTACT_URL, headers={'Authorization': 'Token invalid'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_matches_sync_view(self):
+        """Test the async list renders like the sync list."""
+        sync_res = self.client.get(CONTACT_URL, headers=self.headers)
+        with CaptureQueriesContext(connection) as queries:
+            res = async_to_sync(self.async_client.get)(
+                ASYNC_CONTACT_URL, headers=self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['results'], sync_res.json()['results'])
+        # Version, contacts and children, the token is cached.
+        self.assertEqual(len(queries), 5)
+
+    async def test_list_pages(self):
+        res = await self.async_client.get(
+            ASYNC_CONTACT_URL, {'page_size': 2}, headers=self.headers)
+        first = [contact['first_name'] for contact in res.json()['results']]
+        self.assertEqual(first, ['Jack', 'Jane'])
+        self.assertIsNone(res.json()['previous'])
+
+        res = await self.async_client.get(
+            res.json()['next'], headers=self.headers)
+        second = [contact['first_name'] for contact in res.json()['results']]
+        self.assertEqual(second, ['John'])
+        self.assertIsNone(res.json()['next'])
+
+        res = await self.async_client.get(
+            res.json()['previous'], headers=self.headers)
+        self.assertEqual(
+            [contact['first_name'] for contact in res.json()['results']],
+            first)
+
+    async def test_search(self):
+        res = await self.async_client.get(
+            ASYNC_CONTACT_URL, {'q': 'jane'}, headers=self.headers)
+        self.assertEqual(
+            [contact['first_name'] for contact in res.json()['results']],
+            ['Jane'])
+
+    async def test_retrieve(self):
+        contact = await Contact.objects.filter(
+            user=self.user, first_name='John').aget()
+        res = await self.async_client.get(
+            async_contact_url(contact.id), headers=self.headers)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['emails'][0]['email'],
+                         'john@example.com')
+
+        res = await self.async_client.get(
+            async_contact_url(self.other.id), headers=self.headers)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_conditional_get(self):
+        res = await self.async_client.get(
+            ASYNC_CONTACT_URL, headers=self.headers)
+        res = await self.async_client.get(
+            ASYNC_CONTACT_URL,
+            headers={**self.headers, 'If-None-Match': res['ETag']})
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        contact = await Contact.objects.filter(user=self.user).afirst()
+        await sync_to_async(self.client.delete)(
+            f'{CONTACT_URL}{contact.id}/', headers=self.headers)
+        res = await self.async_client.get(
+            ASYNC_CONTACT_URL,
+            headers={**self.headers, 'If-None-Match': res['ETag']})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,193 @@
+"""
+Bulk import and export of contacts as NDJSON or CSV
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from core import export
+from core.models import Contact
+from core.planner import plan_queryset
+from .serializers import CHILD_MODELS, ContactSerializer, create_children
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+# CSV layout: list columns hold `;` separated values and every social
+# media link is written as `platform_name|link|tag`.
+CSV_FIELDS = ['first_name', 'last_name', 'emails', 'phone_numbers',
+              'social_media_links']
+# Columns an imported CSV header must have
+REQUIRED_CSV_FIELDS = ['first_name', 'last_name']
+LIST_SEPARATOR = ';'
+LINK_SEPARATOR = '|'
+LINK_FIELDS = ['platform_name', 'link', 'tag']
+
+INVALID_RECORD = 'Invalid record.'
+INVALID_ENCODING = 'Line is not valid UTF-8.'
+
+
+def _decode_lines(stream):
+    """Lazily decode a byte stream into text lines, None if not UTF-8"""
+    for line in stream:
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            yield None
+
+
+def _invalid(message):
+    """Return the record of a line that can't be imported"""
+    return serializers.ValidationError({'non_field_errors': [message]})
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(LIST_SEPARATOR)
+            if part.strip()]
+
+
+def read_ndjson(stream):
+    """Yield (line number, record) pairs from an NDJSON stream
+
+    Lines that are not UTF-8 JSON objects are yielded with a
+    ValidationError as their record.
+    """
+    for line_number, line in enumerate(_decode_lines(stream), start=1):
+        if line is None:
+            yield line_number, _invalid(INVALID_ENCODING)
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, (record if isinstance(record, dict)
+                            else _invalid(INVALID_RECORD))
+
+
+def read_csv(stream):
+    """Yield (line number, record) pairs from a CSV stream with a header
+
+    Rows with lines that are not UTF-8 are yielded with a ValidationError
+    as their record. Raises a ValidationError if the header lacks one of
+    REQUIRED_CSV_FIELDS.
+    """
+    undecodable = set()
+
+    def lines():
+        for line_number, line in enumerate(_decode_lines(stream), start=1):
+            if line is None:
+                # A row of its own, or part of the quoted field it's in
+                undecodable.add(line_number)
+                line = '\ufffd\n'
+            yield line
+
+    reader = csv.DictReader(lines())
+    fieldnames = reader.fieldnames
+    if fieldnames is None:
+        return
+    missing = [name for name in REQUIRED_CSV_FIELDS
+               if name not in fieldnames]
+    if missing:
+        raise serializers.ValidationError({'header': [
+            f'Missing column {name}.' for name in missing]})
+    last_line = reader.line_num
+    for row in reader:
+        first_line, last_line = last_line + 1, reader.line_num
+        if undecodable.intersection(range(first_line, last_line + 1)):
+            yield last_line, _invalid(INVALID_ENCODING)
+            continue
+        record = {
+            'first_name': row.get('first_name'),
+            'last_name': row.get('last_name'),
+            'emails': [{'email': email}
+                       for email in _split(row.get('emails'))],
+            'phone_numbers': [{'phone_number': phone_number}
+                              for phone_number in
+                              _split(row.get('phone_numbers'))],
+            'social_media_links': [
+                dict(zip(LINK_FIELDS, link.split(LINK_SEPARATOR)))
+                for link in _split(row.get('social_media_links'))],
+        }
+        yield reader.line_num, record
+
+
+def _write_batch(user, batch):
+    """Insert a batch of validated contacts and their children"""
+    children = [{name: data.pop(name, None) for name in CHILD_MODELS}
+                for data in batch]
+    contacts = Contact.objects.bulk_create(
+        [Contact(user=user, **data) for data in batch])
+    create_children(list(zip(contacts, children)))
+    return len(contacts)
+
+
+def import_contacts(user, records, batch_size=None):
+    """Validate and insert (line number, record) pairs in batches
+
+    Only one batch of records is held in memory at a time. Invalid rows
+    are skipped and reported, the others are inserted in one transaction:
+    an import that stops partway (e.g. on a bad CSV header or a lost
+    connection) creates nothing. Returns the number of created and failed
+    rows with the first errors per line.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    with transaction.atomic():
+        return _import_batches(user, iter(records), batch_size)
+
+
+def _import_batches(user, records, batch_size):
+    serializer = ContactSerializer()
+    result = {'created': 0, 'failed': 0, 'errors': []}
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+        batch = []
+        for line_number, record in chunk:
+            try:
+                if isinstance(record, serializers.ValidationError):
+                    raise record
+                batch.append(serializer.run_validation(record))
+            except serializers.ValidationError as exc:
+                result['failed'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append(
+                        {'line': line_number, 'errors': exc.detail})
+        if batch:
+            result['created'] += _write_batch(user, batch)
+    return result
+
+
+def to_csv_row(data):
+    """Flatten a serialized contact into a CSV_FIELDS row"""
+    return {
+        'first_name': data['first_name'],
+        'last_name': data['last_name'],
+        'emails': LIST_SEPARATOR.join(
+            item['email'] for item in data['emails']),
+        'phone_numbers': LIST_SEPARATOR.join(
+            item['phone_number'] for item in data['phone_numbers']),
+        'social_media_links': LIST_SEPARATOR.join(
+            LINK_SEPARATOR.join(item[name] for name in LINK_FIELDS)
+            for item in data['social_media_links']),
+    }
+
+
+def export_contacts(user, export_format):
+    """Stream all contacts of a user with their children"""
+    serializer = ContactSerializer()
+    queryset = plan_queryset(
+        Contact.objects.filter(user=user).order_by('id'), serializer)
+
+    def rows():
+        for contact in export.iterate(queryset):
+            data = serializer.to_representation(contact)
+            yield to_csv_row(data) if export_format == 'csv' else data
+
+    return export.stream_export(
+        rows(), export_format, 'contacts', fieldnames=CSV_FIELDS)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ContactViewSet
+from .views import ContactAsyncView, ContactViewSet
 
 app_name = 'contact'  # Define the app name here
 
@@ -9,4 +9,8 @@ router.register(r'contacts', ContactViewSet, basename='contact')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/contacts/', ContactAsyncView.as_view(),
+         name='contact-async-list'),
+    path('async/contacts/<int:pk>/', ContactAsyncView.as_view(),
+         name='contact-async-detail'),
 ]
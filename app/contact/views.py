@@ -1,17 +1,154 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from core.async_views import AsyncReadView
+from core.authentication import CachedTokenAuthentication
+from core.bulk import BulkActionsMixin
+from core.etags import ConditionalGetMixin
+from core.export import get_export_format
+from core.fieldsets import SparseFieldsetViewMixin
 from core.models import Contact
-from .serializers import ContactSerializer
-from rest_framework.authentication import TokenAuthentication
+from core.pagination import KeysetPagination, RankedKeysetPagination
+from core.planner import plan_queryset
+from core.readers import ValuesListMixin
+from core.sync import SyncMixin
+from . import dedupe, transfer
+from .documents import get_document_reader
+from .search import get_search_text, search_contacts
+from .serializers import (
+    ContactSerializer,
+    DuplicatesQuerySerializer,
+    MergeSerializer,
+)
 
 
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(ConditionalGetMixin, ValuesListMixin,
+                     SparseFieldsetViewMixin, BulkActionsMixin, SyncMixin,
+                     viewsets.ModelViewSet):
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]  # Updated to IsAuthenticated
+    pagination_class = KeysetPagination
+    etag_resource = 'contact'
+    bulk_update_fields = ['first_name', 'last_name']
+    bulk_filter_fields = ['first_name__iexact', 'last_name__iexact',
+                          'emails__email__iexact']
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        queryset = self.queryset.filter(
+            user=self.request.user).order_by('-id')
+        if self.search_text:
+            queryset = search_contacts(queryset, self.search_text)
+        if self.action not in ('list', 'retrieve'):
+            # Writes load the one row they change, unplanned
+            return queryset
+        return plan_queryset(queryset, self.get_serializer())
+
+    @property
+    def search_text(self):
+        """Return the `?q=` search of a list request"""
+        if self.action != 'list':
+            return None
+        return get_search_text(self.request)
+
+    @property
+    def paginator(self):
+        # Search results are ordered and paged by rank
+        if self.search_text and not hasattr(self, '_paginator'):
+            self._paginator = RankedKeysetPagination()
+        return super().paginator
+
+    def get_reader(self, serializer):
+        return (get_document_reader(serializer) or
+                super().get_reader(serializer))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_contacts(self, request):
+        """Import contacts from an NDJSON or CSV body
+
+        The body is read line by line and written in batches, send it as
+        `text/csv` or `application/x-ndjson`. Invalid rows are reported
+        and skipped; the valid ones are created in one transaction, none
+        are if the import fails (e.g. a CSV header without first_name or
+        last_name is a 400).
+        """
+        stream = request.stream or []
+        if request.content_type.startswith('text/csv'):
+            records = transfer.read_csv(stream)
+        else:
+            records = transfer.read_ndjson(stream)
+        result = transfer.import_contacts(request.user, records)
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_contacts(self, request):
+        """Stream all contacts as NDJSON or CSV (`?export_format=csv`)"""
+        return transfer.export_contacts(
+            request.user, get_export_format(request))
+
+    @action(detail=False, methods=['get'], url_path='duplicates')
+    def duplicates(self, request):
+        """Candidate duplicate pairs, best first
+
+        `?min_score=` (0 to 1, default 0.5) and `?limit=` (default 100).
+        """
+        params = DuplicatesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response({'results': dedupe.find_duplicates(
+            request.user, **params.validated_data)})
+
+    @action(detail=False, methods=['post'], url_path='merge')
+    def merge(self, request):
+        """Merge contacts into a target contact
+
+        The body is a `{"target": id, "sources": [id, ...]}` object or a
+        list of them, all merged in one transaction. Children are moved
+        to the targets and the sources deleted.
+        """
+        data = request.data if isinstance(request.data, list) \
+            else [request.data]
+        serializer = MergeSerializer(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        merges = [(merge['target'], merge['sources'])
+                  for merge in serializer.validated_data]
+        merged = dedupe.merge_contacts(request.user, merges)
+        contacts = self.queryset.filter(
+            user=request.user,
+            id__in=[target for target, _ in merges]).order_by('id')
+        return Response({
+            'merged': merged,
+            'contacts': ContactSerializer(plan_queryset(
+                contacts, ContactSerializer()), many=True).data,
+        })
+
+
+class ContactAsyncView(AsyncReadView):
+    """Async list (with `?q=` search) and retrieve of contacts"""
+    queryset = Contact.objects.all()
+    serializer_class = ContactSerializer
+    etag_resource = 'contact'
+
+    @property
+    def search_text(self):
+        if self.action != 'list':
+            return None
+        return get_search_text(self.request)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.search_text:
+            queryset = search_contacts(queryset, self.search_text)
+        return queryset
+
+    def get_reader(self, serializer):
+        return (get_document_reader(serializer) or
+                super().get_reader(serializer))
+
+    def get_paginator(self):
+        if self.search_text:
+            return RankedKeysetPagination()
+        return super().get_paginator()
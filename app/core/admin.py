@@ -1,12 +1,57 @@
 """
 Django Admin
+
+Changelists of the large tables neither count them in full nor load a
+row per foreign key: counts are estimated by the planner (see
+EstimatedCountPaginator), related rows are joined and searches are
+served by indexes.
 """
+import json
+from functools import cached_property
 
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
 from . import models
 
 
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting with the planner's estimate of the rows
+
+    Results the planner expects to be more than ADMIN_EXACT_COUNT_LIMIT
+    rows aren't counted, their estimate (from the table statistics) is
+    used, so the last pages of a list may be missing or empty.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        compiler = queryset.query.get_compiler(queryset.db)
+        sql, params = compiler.as_sql()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = plan[0]['Plan']['Plan Rows']
+        if estimate <= settings.ADMIN_EXACT_COUNT_LIMIT:
+            return queryset.count()
+        return estimate
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin of a table too large to count or to list without indexes"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Columns the changelist and change form don't show
+    deferred_fields = ()
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer(*self.deferred_fields)
+
+
 class UserAdmin(BaseUserAdmin):
     """Custom User Admin"""
     ordering = ['id']
@@ -33,9 +78,55 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+# Contacts are shown by name, without their trigger maintained columns
+CONTACT_DEFERRED_FIELDS = ('search_vector', 'document')
+CONTACT_CHILD_DEFERRED_FIELDS = tuple(
+    f'contact__{field}' for field in CONTACT_DEFERRED_FIELDS)
+
+
+@admin.register(models.Recipe)
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ('title', 'time_minutes', 'price', 'user')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(models.Contact)
+class ContactAdmin(LargeTableAdmin):
+    list_display = ('first_name', 'last_name', 'user')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    # icontains, served by the trigram indexes
+    search_fields = ('first_name', 'last_name')
+    deferred_fields = CONTACT_DEFERRED_FIELDS
+
+
+@admin.register(models.Email)
+class EmailAdmin(LargeTableAdmin):
+    list_display = ('email', 'contact')
+    list_select_related = ('contact',)
+    raw_id_fields = ('contact',)
+    # Prefixes, served by the pattern ops indexes
+    search_fields = ('^email',)
+    deferred_fields = CONTACT_CHILD_DEFERRED_FIELDS
+
+
+@admin.register(models.PhoneNumber)
+class PhoneNumberAdmin(LargeTableAdmin):
+    list_display = ('phone_number', 'contact')
+    list_select_related = ('contact',)
+    raw_id_fields = ('contact',)
+    search_fields = ('^phone_number',)
+    deferred_fields = CONTACT_CHILD_DEFERRED_FIELDS
+
+
+@admin.register(models.SocialMediaLink)
+class SocialMediaLinkAdmin(LargeTableAdmin):
+    list_display = ('link', 'platform_name', 'tag', 'contact')
+    list_select_related = ('contact',)
+    raw_id_fields = ('contact',)
+    search_fields = ('^link',)
+    deferred_fields = CONTACT_CHILD_DEFERRED_FIELDS
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Contact)
-admin.site.register(models.Email)
-admin.site.register(models.PhoneNumber)
-admin.site.register(models.SocialMediaLink)
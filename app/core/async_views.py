@@ -0,0 +1,160 @@
+"""
+Async (ASGI) views on Django's async ORM
+"""
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import CachedTokenAuthentication
+from .etags import aget_version, make_etag
+from .fieldsets import SparseFieldsetMixin, get_fieldset
+from .metrics import timer
+from .pagination import KeysetPagination
+from .planner import plan_queryset
+from .readers import get_reader
+
+
+class AsyncAPIView(View):
+    """Base of the async views: DRF request parsing, JSON and errors
+
+    Handlers are async and get a DRF Request. APIExceptions they raise
+    are answered like DRF's exception handler does. Like DRF views they
+    are exempt from CSRF checks, token authentication uses no cookies.
+    """
+    parser_classes = [JSONParser, FormParser, MultiPartParser]
+    authentication_class = CachedTokenAuthentication
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request = request = Request(
+            request, parsers=[parser() for parser in self.parser_classes])
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def authenticate(self, request):
+        """Authenticate the request token, return the user"""
+        result = await self.authentication_class().aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user = result[0]
+        return request.user
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data), status=status_code,
+            content_type=self.renderer.media_type)
+
+    def handle_exception(self, exc):
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {'detail': exc.detail}
+        response = self.render(data, exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = \
+                self.authentication_class().authenticate_header(self.request)
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+
+class AsyncReadView(AsyncAPIView):
+    """Async list and retrieve of the rows of the requesting user
+
+    Answers like the list/retrieve actions of a viewset with token auth,
+    ETags and keyset pagination, but awaits the database instead of
+    holding a worker thread. Rows are rendered by `get_reader()`, the
+    serializer's reader (see `core.readers`), if there is one, others are
+    planned (see `core.planner`) so serializing runs no query: a lazy
+    load would raise SynchronousOnlyOperation. Route it with and without
+    a `pk`.
+    """
+    http_method_names = ['get', 'head', 'options']
+    queryset = None
+    serializer_class = None
+    list_serializer_class = None
+    pagination_class = KeysetPagination
+    etag_resource = None
+
+    async def get(self, request, pk=None):
+        self.action = 'list' if pk is None else 'retrieve'
+        user = await self.authenticate(request)
+        etag = make_etag(
+            self.etag_resource, user.pk,
+            await aget_version(user.pk, self.etag_resource),
+            request.get_full_path(), self.renderer.media_type)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif pk is None:
+            response = self.render(await self.list(request))
+        else:
+            response = self.render(await self.retrieve(request, pk))
+        response['ETag'] = etag
+        return response
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user).order_by('-id')
+
+    def get_serializer(self):
+        serializer_class = self.serializer_class
+        if self.action == 'list' and self.list_serializer_class:
+            serializer_class = self.list_serializer_class
+        kwargs = {}
+        if issubclass(serializer_class, SparseFieldsetMixin):
+            kwargs = get_fieldset(self.request)
+        return serializer_class(
+            context={'request': self.request, 'view': self}, **kwargs)
+
+    def get_paginator(self):
+        return self.pagination_class()
+
+    def get_reader(self, serializer):
+        return get_reader(serializer)
+
+    async def list(self, request):
+        serializer = self.get_serializer()
+        reader = self.get_reader(serializer)
+        paginator = self.get_paginator()
+        if reader is None:
+            page = await paginator.apaginate_queryset(
+                plan_queryset(self.get_queryset(), serializer), request, self)
+            with timer():
+                results = [serializer.to_representation(obj)
+                           for obj in page]
+        else:
+            page = await paginator.apaginate_queryset(
+                reader.values(self.get_queryset()), request, self)
+            with timer():
+                results = await reader.arender(page)
+        return {
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': results,
+        }
+
+    async def retrieve(self, request, pk):
+        serializer = self.get_serializer()
+        reader = self.get_reader(serializer)
+        if reader is None:
+            queryset = plan_queryset(self.get_queryset(), serializer)
+        else:
+            queryset = reader.values(self.get_queryset())
+        try:
+            obj = await queryset.aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            raise exceptions.NotFound()
+        with timer():
+            if reader is None:
+                return serializer.to_representation(obj)
+            return (await reader.arender([obj]))[0]
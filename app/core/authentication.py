@@ -0,0 +1,155 @@
+"""
+Token authentication backed by an in-process cache
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+
+class TokenCache:
+    """Bounded LRU cache of token key -> (user, token) with a TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached (user, token) of a key or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Cache the (user, token) of a key"""
+        user, _ = value
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._user_keys.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a token key"""
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_user(self, user_id):
+        """Drop every token key of a user"""
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def stats(self):
+        """Return the cache size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = entry[1][0].pk
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_MAX_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication caching key -> user lookups
+
+    Entries are invalidated in this process when the token is deleted or
+    the user is saved (deactivation, password change...). Other processes
+    pick up such changes once the entry expires after TOKEN_CACHE_TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        # Requests get their own copy, the cached user is never mutated.
+        return copy.copy(user), token
+
+    async def aauthenticate(self, request):
+        """Async version of `authenticate()` for async views"""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_(
+                'Invalid token header. '
+                'Token string should not contain spaces.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(_(
+                'Invalid token header. '
+                'Token string should not contain invalid characters.'))
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        """Async version of `authenticate_credentials()`"""
+        cached = token_cache.get(key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related(
+                    'user').aget(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.'))
+            cached = token.user, token
+            token_cache.set(key, cached)
+        user, token = cached
+        return copy.copy(user), token
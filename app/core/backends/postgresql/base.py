@@ -0,0 +1,65 @@
+"""
+PostgreSQL backend taking its connections from a process wide pool
+"""
+from django.db.backends.postgresql import base, creation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from .pool import close_pools, get_pool
+
+POOL_DEFAULTS = {'min_size': 1, 'max_size': 10, 'timeout': 10.0}
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would block DROP DATABASE
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """psycopg2 backend with a connection pool per process
+
+    Configured like the pool of Django 5.1 with psycopg 3, through
+    OPTIONS['pool'] = {'min_size': ..., 'max_size': ..., 'timeout': ...}.
+    Django "closes" connections at the end of each request (with
+    CONN_MAX_AGE = 0), which returns them to the pool, and
+    CONN_HEALTH_CHECKS checks connections taken from the pool.
+    """
+    creation_class = DatabaseCreation
+    connection_pool = None
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_pool(self):
+        """Return the pool of the current connection settings"""
+        options = self.settings_dict['OPTIONS'].get('pool')
+        options = {**POOL_DEFAULTS,
+                   **(options if isinstance(options, dict) else {})}
+        conn_params = self.get_connection_params()
+        key = (conn_params.get('dbname'),
+               tuple(sorted((name, repr(value))
+                            for name, value in conn_params.items())))
+        return get_pool(key, **options)
+
+    def get_new_connection(self, conn_params):
+        # New connections get their isolation level from the parent,
+        # pooled ones keep the one they were opened with.
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get(
+                'isolation_level', IsolationLevel.READ_COMMITTED))
+        # The settings (test database NAME) may change before the
+        # connection is closed, remember where it goes back to.
+        self.connection_pool = self.get_pool()
+        return self.connection_pool.getconn(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params),
+            check=self.settings_dict['CONN_HEALTH_CHECKS'])
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.connection_pool.putconn(self.connection)
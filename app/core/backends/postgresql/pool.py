@@ -0,0 +1,210 @@
+"""
+Thread safe psycopg2 connection pool with wait and saturation stats
+"""
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became available within the pool timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of open connections shared by the threads of a process
+
+    `getconn()` hands out an idle connection, opens a new one while the
+    pool is below `max_size` or waits up to `timeout` seconds for one to
+    be returned. Connections idle for over `max_idle` seconds are closed
+    down to `min_size`.
+    """
+
+    def __init__(self, min_size=1, max_size=10, timeout=10.0, max_idle=600.0):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        # (connection, returned at) pairs, most recently returned last
+        self._idle = deque()
+        self._size = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self.requests = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.max_in_use = 0
+
+    def getconn(self, connect, check=False):
+        """Return a connection, opening it with `connect()` if needed
+
+        With `check` idle connections are tested with a `SELECT 1` and
+        replaced when they are no longer usable.
+        """
+        while True:
+            connection = self._checkout()
+            if connection is None:
+                try:
+                    return connect()
+                except BaseException:
+                    self._discard()
+                    raise
+            if not check or self._is_usable(connection):
+                return connection
+            self._discard(connection)
+
+    def putconn(self, connection):
+        """Return a connection, closing it if it is broken"""
+        usable = not connection.closed
+        if usable:
+            status = connection.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                usable = False
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    connection.rollback()
+                except psycopg2.Error:
+                    usable = False
+        if not usable:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def close(self):
+        """Close the idle connections"""
+        with self._condition:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for connection in idle:
+            connection.close()
+
+    def stats(self):
+        """Return the pool size, usage and wait counters"""
+        with self._condition:
+            in_use = self._size - len(self._idle)
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': in_use,
+                'waiting': self._waiting,
+                'saturation': in_use / self.max_size,
+                'max_in_use': self.max_in_use,
+                'requests': self.requests,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'wait_time': self.wait_time,
+                'max_wait_time': self.max_wait_time,
+            }
+
+    def _checkout(self):
+        """Take an idle connection or a slot for a new one (None)"""
+        stale = []
+        try:
+            with self._condition:
+                return self._wait_for_connection(stale)
+        finally:
+            for connection in stale:
+                connection.close()
+
+    def _wait_for_connection(self, stale):
+        start = time.monotonic()
+        waited = False
+        self.requests += 1
+        while True:
+            self._expire(stale)
+            if self._idle:
+                connection = self._idle.pop()[0]
+                break
+            if self._size < self.max_size:
+                self._size += 1
+                connection = None
+                break
+            remaining = start + self.timeout - time.monotonic()
+            if remaining <= 0:
+                self.timeouts += 1
+                self._record_wait(start)
+                raise PoolTimeout(
+                    f'No connection available within {self.timeout} '
+                    f'seconds (max_size={self.max_size}).')
+            if not waited:
+                self.waits += 1
+                waited = True
+            self._waiting += 1
+            try:
+                self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+        self._record_wait(start)
+        self.max_in_use = max(self.max_in_use, self._size - len(self._idle))
+        return connection
+
+    def _record_wait(self, start):
+        wait_time = time.monotonic() - start
+        self.wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def _expire(self, stale):
+        """Move connections idle for too long to `stale` (lock held)"""
+        deadline = time.monotonic() - self.max_idle
+        while (self._idle and self._size > self.min_size and
+               self._idle[0][1] < deadline):
+            stale.append(self._idle.popleft()[0])
+            self._size -= 1
+
+    def _discard(self, connection=None):
+        """Close a checked out connection and free its slot"""
+        if connection is not None and not connection.closed:
+            try:
+                connection.close()
+            except psycopg2.Error:
+                pass
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    @staticmethod
+    def _is_usable(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+
+def get_pool(key, **options):
+    """Return the process wide pool of a connection key"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(**options)
+        return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """Return the stats of every pool by database name"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {key[0]: pool.stats() for key, pool in pools}
@@ -0,0 +1,120 @@
+"""
+Set-based bulk update and delete actions for owner scoped viewsets
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+# Rows a single bulk request may name or match
+MAX_BULK_IDS = 1000
+
+
+class BulkSelectionSerializer(serializers.Serializer):
+    """Rows of a bulk action: an id list or a filter, not both"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False,
+        allow_empty=False, max_length=MAX_BULK_IDS)
+    filter = serializers.DictField(required=False, allow_empty=False)
+
+    def validate_filter(self, value):
+        allowed = self.context['filter_fields']
+        unknown = sorted(set(value) - set(allowed))
+        if unknown:
+            raise serializers.ValidationError(
+                [f'Unknown filter {name}.' for name in unknown])
+        return value
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError(
+                'Pass either ids or filter.')
+        return attrs
+
+
+class BulkUpdateSerializer(BulkSelectionSerializer):
+    """Rows of a bulk update and the values to set on all of them"""
+    set = serializers.DictField(allow_empty=False)
+
+
+class BulkActionsMixin:
+    """`bulk-update` and `bulk-delete` actions of a ModelViewSet
+
+    Both take `{"ids": [...]}` or `{"filter": {lookup: value}}` (one of
+    `bulk_filter_fields`), a bulk update also `{"set": {field: value}}`
+    (of `bulk_update_fields`, validated by the viewset's serializer).
+    Rows are those of the requesting user, at most MAX_BULK_IDS, written
+    with one UPDATE or DELETE statement per table in a transaction.
+    Answers the status of each id: updated, deleted or not_found.
+    """
+    bulk_filter_fields = ()
+    bulk_update_fields = ()
+
+    def get_bulk_queryset(self, selection):
+        queryset = self.queryset.filter(user=self.request.user)
+        if 'ids' in selection:
+            return queryset.filter(id__in=selection['ids'])
+        try:
+            # Through a subquery, as lookups across children join them
+            matches = queryset.filter(**selection['filter']).values('id')
+        except (TypeError, ValueError, ValidationError) as exc:
+            raise serializers.ValidationError({'filter': list(
+                getattr(exc, 'messages', [str(exc)]))})
+        return queryset.filter(id__in=matches)
+
+    def get_bulk_values(self, values):
+        unknown = sorted(set(values) - set(self.bulk_update_fields))
+        if unknown:
+            raise serializers.ValidationError({'set': [
+                f'{name} can\'t be bulk updated.' for name in unknown]})
+        serializer = self.get_serializer(data=values, partial=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def get_bulk_selection(self, serializer_class):
+        serializer = serializer_class(
+            data=self.request.data,
+            context={'filter_fields': self.bulk_filter_fields})
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def bulk_write(self, selection, write):
+        """Lock the selected rows, run `write(queryset)`, return their ids"""
+        with transaction.atomic():
+            # One more than allowed tells a filter matching too many rows
+            ids = list(self.get_bulk_queryset(selection).select_for_update()
+                       .order_by('id').values_list('id', flat=True)
+                       [:MAX_BULK_IDS + 1])
+            if len(ids) > MAX_BULK_IDS:
+                raise serializers.ValidationError({'filter': [
+                    f'Matches more than {MAX_BULK_IDS} rows.']})
+            if ids:
+                write(self.queryset.filter(id__in=ids))
+        return ids
+
+    def bulk_response(self, selection, ids, done):
+        found = set(ids)
+        return Response({
+            'count': len(ids),
+            'results': [{'id': pk,
+                         'status': done if pk in found else 'not_found'}
+                        for pk in dict.fromkeys(selection.get('ids', ids))],
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """Set the same values on the selected rows"""
+        selection = self.get_bulk_selection(BulkUpdateSerializer)
+        values = self.get_bulk_values(selection['set'])
+        ids = self.bulk_write(
+            selection, lambda queryset: queryset.update(**values))
+        return self.bulk_response(selection, ids, 'updated')
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Delete the selected rows and their children"""
+        selection = self.get_bulk_selection(BulkSelectionSerializer)
+        ids = self.bulk_write(
+            selection, lambda queryset: queryset.delete())
+        return self.bulk_response(selection, ids, 'deleted')
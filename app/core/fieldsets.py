@@ -0,0 +1,69 @@
+"""
+Sparse fieldsets (`?fields=`) and expansion (`?expand=`) of responses
+
+A serializer built with `fields`/`expand` drops the other fields before
+anything reads them, so the query planner (`core.planner`) and readers
+(`core.readers`) neither select their columns nor prefetch their rows.
+"""
+from rest_framework import serializers
+
+
+def _query_list(request, name):
+    """Return the comma separated values of a query parameter or None"""
+    if name not in request.query_params:
+        return None
+    return [value.strip()
+            for value in request.query_params[name].split(',')
+            if value.strip()]
+
+
+def get_fieldset(request):
+    """Return the `fields` and `expand` serializer kwargs of a request"""
+    return {'fields': _query_list(request, 'fields') or None,
+            'expand': _query_list(request, 'expand')}
+
+
+class SparseFieldsetMixin:
+    """Serializer rendering only the `fields` and `expand` it is given
+
+    Fields in `Meta.expandable_fields` (e.g. nested collections) are only
+    rendered when named in `expand` or `fields`, other fields when named
+    in `fields` (all of them when it is None). Without either kwarg every
+    field is rendered. Unknown names raise a ValidationError.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is None and expand is None:
+            return
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        readable = {name for name, field in self.fields.items()
+                    if not field.write_only}
+
+        errors = {}
+        unknown = set(fields or ()) - readable
+        if unknown:
+            errors['fields'] = [f'Unknown field {name}.'
+                                for name in sorted(unknown)]
+        unknown = set(expand or ()) - expandable
+        if unknown:
+            errors['expand'] = [f'{name} can\'t be expanded.'
+                                for name in sorted(unknown)]
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        keep = set(fields) if fields is not None else readable - expandable
+        keep |= set(expand or ())
+        for name in list(self.fields):
+            if name not in keep and not self.fields[name].write_only:
+                self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """`?fields=` and `?expand=` on the list and retrieve of a viewset"""
+    fieldset_actions = ('list', 'retrieve')
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.fieldset_actions:
+            kwargs.update(get_fieldset(self.request))
+        return super().get_serializer(*args, **kwargs)
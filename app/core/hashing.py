@@ -0,0 +1,197 @@
+"""
+Password hashing in a bounded thread pool with admission control
+
+PBKDF2 releases the GIL while it hashes, so hashing threads run next to
+the request threads. The pool bounds how many hashes run at once
+(HASHING_WORKERS) and how many may wait (HASHING_MAX_PENDING), beyond
+which sign-ins and sign-ups are answered with a 429 instead of queuing.
+Sign-ins check passwords in the pool through HashingPoolBackend, set in
+AUTHENTICATION_BACKENDS.
+"""
+import asyncio
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import authenticate, get_user_model, hashers
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_login_failed
+from django.core.exceptions import PermissionDenied
+from django.utils.translation import gettext as _
+from django.views.decorators.debug import sensitive_variables
+from rest_framework.exceptions import Throttled
+
+# Seconds clients are asked to wait when the pool is full
+RETRY_AFTER = 1
+
+
+class HashingPool:
+    """Thread pool running at most `max_pending` hashes at a time"""
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+
+    @property
+    def executor(self):
+        # Created per process, threads don't survive forking workers.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix='hashing')
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, func, *args):
+        """Run `func(*args)` in the pool, return its Future
+
+        Raises Throttled when `max_pending` calls are already running or
+        waiting.
+        """
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise Throttled(RETRY_AFTER, detail=_(
+                'Too many sign-ins in progress, retry shortly.'))
+        self.submitted += 1
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+        }
+
+
+hashing_pool = HashingPool(
+    settings.HASHING_WORKERS, settings.HASHING_MAX_PENDING)
+
+
+def _check_password(password, encoded):
+    """Return whether a password matches and its upgraded hash if any"""
+    upgraded = []
+    valid = hashers.check_password(
+        password, encoded,
+        setter=lambda raw: upgraded.append(hashers.make_password(raw)))
+    return valid, upgraded[0] if upgraded else None
+
+
+def make_password(password):
+    """`make_password()` in the hashing pool"""
+    return hashing_pool.run(hashers.make_password, password)
+
+
+async def amake_password(password):
+    """Async `make_password()` in the hashing pool"""
+    return await hashing_pool.arun(hashers.make_password, password)
+
+
+class HashingPoolBackend(ModelBackend):
+    """ModelBackend checking passwords in the hashing pool
+
+    An unknown email costs a hash too and outdated hashes are upgraded.
+    `aauthenticate()` awaits the pool, like the async backends of later
+    Django versions.
+    """
+
+    def authenticate(self, request, username=None, password=None,
+                     **kwargs):
+        model = get_user_model()
+        username = username or kwargs.get(model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = model._default_manager.get_by_natural_key(username)
+        except model.DoesNotExist:
+            hashing_pool.run(hashers.make_password, password)
+            return None
+        valid, upgraded = hashing_pool.run(
+            _check_password, password, user.password)
+        if upgraded:
+            user.password = upgraded
+            user.save(update_fields=['password'])
+        return user if valid and self.user_can_authenticate(user) else None
+
+    async def aauthenticate(self, request, username=None, password=None,
+                            **kwargs):
+        model = get_user_model()
+        username = username or kwargs.get(model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await model._default_manager.aget(
+                **{model.USERNAME_FIELD: username})
+        except model.DoesNotExist:
+            await hashing_pool.arun(hashers.make_password, password)
+            return None
+        valid, upgraded = await hashing_pool.arun(
+            _check_password, password, user.password)
+        if upgraded:
+            user.password = upgraded
+            await user.asave(update_fields=['password'])
+        return user if valid and self.user_can_authenticate(user) else None
+
+
+def authenticate_user(email, password, request=None):
+    """Return the user with these credentials or None
+
+    `authenticate()` with the configured AUTHENTICATION_BACKENDS, which
+    sends `user_login_failed` when none accepts them.
+    """
+    return authenticate(request, username=email, password=password)
+
+
+@sensitive_variables('credentials')
+async def aauthenticate_user(email, password, request=None):
+    """Async `authenticate_user()`
+
+    Backends with an `aauthenticate()` (HashingPoolBackend) are awaited,
+    the others run in a thread.
+    """
+    credentials = {'username': email, 'password': password}
+    for backend, backend_path in auth._get_backends(return_tuples=True):
+        try:
+            inspect.signature(backend.authenticate).bind(
+                request, **credentials)
+        except TypeError:
+            continue
+        method = getattr(backend, 'aauthenticate', None)
+        try:
+            if method is not None:
+                user = await method(request, **credentials)
+            else:
+                user = await sync_to_async(backend.authenticate)(
+                    request, **credentials)
+        except PermissionDenied:
+            break
+        if user is None:
+            continue
+        user.backend = backend_path
+        return user
+    await user_login_failed.asend(
+        sender=auth.__name__,
+        credentials=auth._clean_credentials(credentials), request=request)
+    return None
@@ -0,0 +1,239 @@
+"""
+Django command benchmarking the API endpoints against a stored baseline
+"""
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.metrics import percentile
+from core.models import Contact, Recipe
+from core.seeding import DEFAULT_PASSWORD, seed_users
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Suite:
+    """The benchmarked requests of a seeded user
+
+    Each scenario method makes the `n`-th request of its scenario and
+    returns the response, which must have the expected status.
+    """
+
+    def __init__(self, client, user):
+        self.client = client
+        self.user = user
+        self.contact = Contact.objects.filter(user=user).order_by('id')[0]
+        self.email = self.contact.emails.order_by('id').first()
+        self.recipe = Recipe.objects.filter(user=user).order_by('id')[0]
+
+    def scenarios(self):
+        """Return the scenarios by name with their expected status"""
+        return {
+            'contact-list': (self.contact_list, 200),
+            'contact-search': (self.contact_search, 200),
+            'contact-async-list': (self.contact_async_list, 200),
+            'contact-retrieve': (self.contact_retrieve, 200),
+            'contact-create': (self.contact_create, 201),
+            'contact-nested-update': (self.contact_nested_update, 200),
+            'recipe-list': (self.recipe_list, 200),
+            'recipe-retrieve': (self.recipe_retrieve, 200),
+            'recipe-create': (self.recipe_create, 201),
+            'recipe-update': (self.recipe_update, 200),
+            'user-create': (self.user_create, 201),
+            'user-login': (self.user_login, 200),
+            'user-me': (self.user_me, 200),
+        }
+
+    def contact_list(self, n):
+        return self.client.get(reverse('contact:contact-list'))
+
+    def contact_search(self, n):
+        return self.client.get(reverse('contact:contact-list'),
+                               {'q': f'first{n % 10}'})
+
+    def contact_async_list(self, n):
+        return self.client.get(reverse('contact:contact-async-list'))
+
+    def contact_retrieve(self, n):
+        return self.client.get(
+            reverse('contact:contact-detail', args=[self.contact.id]))
+
+    def contact_create(self, n):
+        return self.client.post(reverse('contact:contact-list'), {
+            'first_name': f'Bench{n}', 'last_name': 'Create',
+            'emails': [{'email': f'bench{n}@example.com'}],
+            'phone_numbers': [{'phone_number': f'+1666{n:07}'}],
+            'social_media_links': [{
+                'platform_name': 'web', 'tag': 'bench',
+                'link': f'https://example.com/bench/{n}'}],
+        }, format='json')
+
+    def contact_nested_update(self, n):
+        # Updates the first email, replaces the phone numbers and drops
+        # the links of the same contact each time.
+        url = reverse('contact:contact-detail', args=[self.contact.id])
+        emails = [{'email': f'update{n}@example.com'}]
+        if self.email is not None:
+            emails[0]['id'] = self.email.id
+        return self.client.put(url, {
+            'first_name': f'Bench{n}', 'last_name': 'Update',
+            'emails': emails,
+            'phone_numbers': [{'phone_number': f'+1777{n:07}'}],
+            'social_media_links': [],
+        }, format='json')
+
+    def recipe_list(self, n):
+        return self.client.get(reverse('recipe:recipe-list'))
+
+    def recipe_retrieve(self, n):
+        return self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]))
+
+    def recipe_create(self, n):
+        return self.client.post(reverse('recipe:recipe-list'), {
+            'title': f'Bench {n}', 'time_minutes': 10, 'price': '4.50'})
+
+    def recipe_update(self, n):
+        return self.client.patch(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]),
+            {'title': f'Bench {n}'})
+
+    def user_create(self, n):
+        return APIClient(**self.client.defaults).post(
+            reverse('user:create'), {
+                'email': f'bench-{self.user.id}-{n}@example.com',
+                'password': DEFAULT_PASSWORD, 'name': 'Bench'})
+
+    def user_login(self, n):
+        return APIClient(**self.client.defaults).post(
+            reverse('user:token'),
+            {'email': self.user.email, 'password': DEFAULT_PASSWORD})
+
+    def user_me(self, n):
+        return self.client.get(reverse('user:me'))
+
+
+def measure(func, status, iterations):
+    """Run a scenario, return its latency percentiles and query count
+
+    A first untimed request warms up caches (e.g. the token cache), the
+    query count is the highest of the timed requests.
+    """
+    func(0)
+    latencies = []
+    queries = 0
+    for n in range(1, iterations + 1):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = func(n)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code != status:
+            raise CommandError(
+                f'Got {response.status_code} instead of {status}: '
+                f'{response.content[:200]!r}')
+        queries = max(queries, len(captured))
+    latencies.sort()
+    return {
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queries': queries,
+    }
+
+
+def compare(result, baseline, tolerance):
+    """Return why a result regressed from its baseline, if it did"""
+    if baseline is None:
+        return 'new'
+    if result['queries'] > baseline['queries']:
+        return f'REGRESSION queries {baseline["queries"]}'
+    if result['p95_ms'] > baseline['p95_ms'] * (1 + tolerance):
+        return f'REGRESSION p95 {baseline["p95_ms"]}'
+    return 'ok'
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS
+             if host != '*' and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+class Command(BaseCommand):
+    """
+    Request the list, retrieve, create and update endpoints of contacts
+    and recipes and sign up, sign in and the profile of users, in
+    process, as a seeded user. Reports the latency percentiles and the
+    query count of each and compares them with the baseline file.
+
+    The command fails if a scenario runs more queries than its baseline
+    or its p95 is more than --tolerance slower. Everything is rolled back
+    at the end, --save-baseline stores the results as the new baseline.
+    """
+    help = 'Benchmark the API endpoints against a stored baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contacts', type=int, default=500,
+                            help='Contacts of the benchmark user.')
+        parser.add_argument('--channels', type=int, default=2)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--scenario', action='append',
+                            help='Run only these scenarios.')
+        parser.add_argument('--baseline', type=Path,
+                            default=DEFAULT_BASELINE)
+        parser.add_argument('--save-baseline', action='store_true')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed p95 slowdown, 0.5 for 50%%.')
+
+    def handle(self, *args, **options):
+        if min(options['contacts'], options['recipes'],
+               options['iterations']) < 1:
+            raise CommandError(
+                '--contacts, --recipes and --iterations must be > 0')
+        baseline = {}
+        if options['baseline'].exists() and not options['save_baseline']:
+            baseline = json.loads(options['baseline'].read_text())
+
+        results = {}
+        regressions = 0
+        self.stdout.write(
+            f'{"scenario":<22} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>7}  status')
+        with transaction.atomic():
+            user, = seed_users(
+                1, options['contacts'], options['channels'],
+                options['recipes'], prefix='benchmark')
+            client = APIClient(HTTP_HOST=_host())
+            client.credentials(
+                HTTP_AUTHORIZATION=f'Token {user.auth_token.key}')
+            scenarios = Suite(client, user).scenarios()
+
+            for name in options['scenario'] or scenarios:
+                if name not in scenarios:
+                    raise CommandError(f'Unknown scenario {name}')
+                func, status = scenarios[name]
+                result = results[name] = measure(
+                    func, status, options['iterations'])
+                verdict = compare(
+                    result, baseline.get(name), options['tolerance'])
+                regressions += verdict.startswith('REGRESSION')
+                self.stdout.write(
+                    f'{name:<22} {result["p50_ms"]:>8.1f} '
+                    f'{result["p95_ms"]:>8.1f} {result["p99_ms"]:>8.1f} '
+                    f'{result["queries"]:>7}  {verdict}')
+            transaction.set_rollback(True)
+
+        if options['save_baseline']:
+            options['baseline'].parent.mkdir(parents=True, exist_ok=True)
+            options['baseline'].write_text(
+                json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f'Saved the baseline to {options["baseline"]}')
+        elif regressions:
+            raise CommandError(f'{regressions} scenario(s) regressed')
@@ -0,0 +1,112 @@
+"""
+Django command comparing the throughput of the sync and async list views
+"""
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.metrics import percentile
+
+ENDPOINTS = {
+    'contact': ('contact:contact-list', 'contact:contact-async-list'),
+    'recipe': ('recipe:recipe-list', 'recipe:recipe-async-list'),
+}
+
+
+async def _fetch(host, port, path, token):
+    """GET a path over a fresh HTTP/1.1 connection, return the status"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write((
+            f'GET {path} HTTP/1.1\r\n'
+            f'Host: {host}\r\n'
+            f'Authorization: Token {token}\r\n'
+            f'Connection: close\r\n\r\n').encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+    return int(status_line.split()[1])
+
+
+async def run_load(url, token, total, concurrency):
+    """Request `url` `total` times from `concurrency` clients
+
+    Returns the wall time, the sorted latencies of successful requests
+    and the number of failed ones.
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    remaining = iter(range(total))
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                status = await _fetch(
+                    parts.hostname, parts.port or 80, path, token)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+class Command(BaseCommand):
+    """
+    Load a running server's sync and async list endpoints and report the
+    throughput and latency percentiles of both.
+
+    Run the server under an ASGI server (uvicorn) to compare them, sync
+    views are then run one at a time in Django's sync thread.
+    """
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--token', required=True,
+                            help='API token of the user to list for')
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='Base URL of the server')
+        parser.add_argument('--resource', choices=sorted(ENDPOINTS),
+                            default='contact')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--page-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be > 0')
+        query = (f'?page_size={options["page_size"]}'
+                 if options['page_size'] else '')
+
+        self.stdout.write(
+            f'{"view":<6} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} '
+            f'{"p99 ms":>8} {"errors":>7}')
+        for mode, name in zip(['sync', 'async'],
+                              ENDPOINTS[options['resource']]):
+            url = options['url'].rstrip('/') + reverse(name) + query
+            elapsed, latencies, errors = asyncio.run(run_load(
+                url, options['token'], options['requests'],
+                options['concurrency']))
+            self.stdout.write(
+                f'{mode:<6} {len(latencies) / elapsed:>9.1f} '
+                f'{self._ms(percentile(latencies, 0.5)):>8} '
+                f'{self._ms(percentile(latencies, 0.95)):>8} '
+                f'{self._ms(percentile(latencies, 0.99)):>8} '
+                f'{errors:>7}')
+
+    @staticmethod
+    def _ms(seconds):
+        return '-' if seconds is None else f'{seconds * 1000:.1f}'
@@ -0,0 +1,84 @@
+"""
+Django command comparing DRF serializers with their compiled readers
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from contact.serializers import ContactSerializer
+from core.planner import plan_queryset
+from core.readers import get_reader
+from core.seeding import seed_users
+from recipe.serializers import RecipeSerializer
+
+SERIALIZERS = {
+    'contact': ContactSerializer,
+    'recipe': RecipeSerializer,
+}
+
+
+def _best_of(repeat, func):
+    """Return the result and the fastest time of `repeat` calls"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+class Command(BaseCommand):
+    """
+    Render the same list with each serializer and its compiled reader
+    (see `core.readers`), check the JSON is identical and report the
+    fastest time of each.
+
+    The rows are created for a throwaway user in a transaction which is
+    rolled back at the end.
+    """
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--resource', choices=sorted(SERIALIZERS),
+                            action='append')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows and --repeat must be > 0')
+        renderer = JSONRenderer()
+
+        self.stdout.write(
+            f'{"resource":<8} {"rows":>6} {"drf ms":>9} {"reader ms":>9} '
+            f'{"speedup":>7}')
+        with transaction.atomic():
+            user, = seed_users(
+                1, contacts=options['rows'], channels=1,
+                recipes=options['rows'], prefix='benchmark-serializers')
+
+            for resource in options['resource'] or sorted(SERIALIZERS):
+                serializer_class = SERIALIZERS[resource]
+                serializer = serializer_class()
+                reader = get_reader(serializer)
+                queryset = serializer_class.Meta.model.objects.filter(
+                    user=user).order_by('-id')
+
+                drf, drf_time = _best_of(options['repeat'], lambda: (
+                    renderer.render(serializer_class(
+                        plan_queryset(queryset, serializer),
+                        many=True).data)))
+                fast, fast_time = _best_of(options['repeat'], lambda: (
+                    renderer.render(reader.render(
+                        list(reader.values(queryset))))))
+                if drf != fast:
+                    raise CommandError(
+                        f'{resource}: the reader output differs')
+                self.stdout.write(
+                    f'{resource:<8} {options["rows"]:>6} '
+                    f'{drf_time * 1000:>9.1f} {fast_time * 1000:>9.1f} '
+                    f'{drf_time / fast_time:>6.1f}x')
+            transaction.set_rollback(True)
@@ -0,0 +1,49 @@
+"""
+Django command merging the duplicate contacts of users
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.dedupe import dedupe_contacts
+
+
+class Command(BaseCommand):
+    """
+    Find the duplicate contacts of users (see `contact.dedupe`) and merge
+    those scoring at least --min-score into the oldest contact.
+    """
+    help = 'Merge duplicate contacts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', default=[],
+                            help='Email of a user to dedupe.')
+        parser.add_argument('--all', action='store_true',
+                            help='Dedupe every user.')
+        parser.add_argument('--min-score', type=float, default=0.9)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the merges without merging.')
+
+    def handle(self, *args, **options):
+        if not (options['user'] or options['all']):
+            raise CommandError('Pass --user or --all')
+        if not 0 < options['min_score'] <= 1:
+            raise CommandError('--min-score must be in ]0, 1]')
+        users = get_user_model().objects.order_by('id')
+        if not options['all']:
+            users = users.filter(email__in=options['user'])
+            missing = set(options['user']) - set(
+                users.values_list('email', flat=True))
+            if missing:
+                raise CommandError(
+                    f'Unknown user(s): {", ".join(sorted(missing))}')
+
+        for user in users.iterator():
+            start = time.perf_counter()
+            result = dedupe_contacts(
+                user, options['min_score'], dry_run=options['dry_run'])
+            self.stdout.write(
+                f'{user.email}: {result["pairs"]} pairs, '
+                f'{result["merges"]} merges, {result["merged"]} contacts '
+                f'merged in {time.perf_counter() - start:.1f}s')
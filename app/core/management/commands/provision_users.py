@@ -0,0 +1,68 @@
+"""
+Django command creating user accounts from a CSV file
+"""
+import csv
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.provisioning import provision_users
+
+
+class Command(BaseCommand):
+    """
+    Create a user and its token for each row of a CSV file with an
+    `email` and optionally a `name` and `password` column, hashing the
+    passwords in --workers processes. Emails already taken are skipped.
+
+    The tokens of the new users are printed with -v 2.
+    """
+    help = 'Create user accounts from a CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV file, - reads stdin.')
+        parser.add_argument('--workers', type=int,
+                            help='Hashing processes (default: '
+                                 'PROVISIONING_WORKERS).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be > 0')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be > 0')
+        accounts = self.read_accounts(options['file'])
+
+        start = time.perf_counter()
+        created, existing = provision_users(
+            accounts, workers=options['workers'],
+            batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+
+        if options['verbosity'] > 1:
+            for user in created:
+                self.stdout.write(f'{user.email} {user.auth_token.key}')
+        for email in existing:
+            self.stderr.write(f'{email} already exists, skipped')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(created)} users, skipped {len(existing)} '
+            f'in {elapsed:.1f}s'))
+
+    def read_accounts(self, path):
+        try:
+            if path == '-':
+                rows = list(csv.DictReader(sys.stdin))
+            else:
+                with open(path, newline='') as f:
+                    rows = list(csv.DictReader(f))
+        except OSError as exc:
+            raise CommandError(exc)
+        accounts = []
+        for line, row in enumerate(rows, start=2):
+            if not row.get('email'):
+                raise CommandError(f'Line {line}: missing email')
+            accounts.append({
+                'email': row['email'], 'name': row.get('name') or '',
+                'password': row.get('password') or None})
+        return accounts
@@ -0,0 +1,33 @@
+"""
+Django command deleting the tombstones past their retention
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """
+    Delete the tombstones of deleted contacts and recipes older than
+    --days (settings.SYNC_TOMBSTONE_DAYS by default). Syncs from older
+    watermarks are refused, so clients start over. Run it daily.
+    """
+    help = 'Delete expired sync tombstones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.SYNC_TOMBSTONE_DAYS)
+
+    def handle(self, *args, **options):
+        if options['days'] < settings.SYNC_TOMBSTONE_DAYS:
+            raise CommandError(
+                f'--days must be >= SYNC_TOMBSTONE_DAYS '
+                f'({settings.SYNC_TOMBSTONE_DAYS})')
+        deleted, _ = Tombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(days=options['days']),
+        ).delete()
+        self.stdout.write(f'{deleted} tombstones deleted')
@@ -0,0 +1,40 @@
+"""
+Django command checking and rebuilding the contact JSON documents
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.documents import (
+    REBUILD_BATCH_SIZE,
+    find_stale_documents,
+    rebuild_documents,
+)
+
+
+class Command(BaseCommand):
+    """
+    Compare the document of each contact (see `contact.documents`) with
+    its contact and children and rewrite those that differ. With --check
+    only report them, failing if there are any.
+    """
+    help = 'Check and rebuild the contact JSON documents.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Report stale documents without '
+                                 'rebuilding them.')
+        parser.add_argument('--batch-size', type=int,
+                            default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be > 0')
+        if options['check']:
+            stale = find_stale_documents(limit=100)
+            if stale:
+                raise CommandError(
+                    f'Stale documents, e.g. of contacts '
+                    f'{", ".join(map(str, stale[:10]))}')
+            self.stdout.write('Documents are up to date')
+            return
+        rebuilt = rebuild_documents(options['batch_size'])
+        self.stdout.write(f'{rebuilt} documents rebuilt')
@@ -0,0 +1,58 @@
+"""
+Django command generating synthetic users, contacts and recipes
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.seeding import DEFAULT_PASSWORD, seed_users
+
+
+class Command(BaseCommand):
+    """
+    Bulk create users, each with contacts (with emails, phone numbers and
+    social media links) and recipes, for benchmarks and load tests.
+
+    All users share the --password, their tokens are printed with -v 2.
+    """
+    help = 'Generate synthetic users, contacts and recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--contacts', type=int, default=100,
+                            help='Contacts per user.')
+        parser.add_argument('--channels', type=int, default=1,
+                            help='Emails, phone numbers and links per '
+                                 'contact.')
+        parser.add_argument('--recipes', type=int, default=100,
+                            help='Recipes per user.')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--prefix', default='seed',
+                            help='Prefix of the user emails.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        counts = [options[name] for name in
+                  ['users', 'contacts', 'channels', 'recipes']]
+        if min(counts) < 0 or options['users'] < 1:
+            raise CommandError('--users must be > 0, counts >= 0')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be > 0')
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = seed_users(
+                options['users'], options['contacts'], options['channels'],
+                options['recipes'], password=options['password'],
+                prefix=options['prefix'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+
+        if options['verbosity'] > 1:
+            for user in users:
+                self.stdout.write(f'{user.email} {user.auth_token.key}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users with '
+            f'{options["contacts"]} contacts '
+            f'({options["channels"]} channels of each kind) and '
+            f'{options["recipes"]} recipes each in {elapsed:.1f}s'))
@@ -0,0 +1,154 @@
+"""
+Django command to run the app with a production multi-process server
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from gunicorn.app.base import BaseApplication
+
+from core.backends.postgresql.pool import close_pools
+
+POOL_ENGINE = 'core.backends.postgresql'
+# Threads of a sync worker when connections aren't pooled
+DEFAULT_THREADS = 4
+
+
+def plan_workers(cpu_count, max_connections, pool_size=None, asgi=False):
+    """Return the (workers, threads) to run
+
+    2 * CPUs + 1 workers, each with a thread per pooled connection (or
+    DEFAULT_THREADS persistent connections). ASGI workers run each
+    request's sync code in a thread of its own, so their connections are
+    only bounded by a pool. Workers (and threads) are reduced until the
+    connections they can open fit in `max_connections`, a pool larger
+    than that is refused.
+    """
+    if asgi and pool_size is None:
+        raise CommandError(
+            '--asgi needs DB_POOL: without a pool each concurrent request '
+            'opens a connection of its own.')
+    if pool_size is not None and pool_size > max_connections:
+        raise CommandError(
+            f'The pool of a worker ({pool_size} connections) exceeds '
+            f'--max-db-connections ({max_connections}).')
+    threads = 1 if asgi else min(pool_size or DEFAULT_THREADS,
+                                 max_connections)
+    workers = min(2 * cpu_count + 1,
+                  max_connections // connections_per_worker(
+                      threads, pool_size))
+    return workers, threads
+
+
+def connections_per_worker(threads, pool_size=None):
+    """Return the connections a worker may open"""
+    return pool_size or threads
+
+
+def _pool_size():
+    database = settings.DATABASES['default']
+    if database['ENGINE'] != POOL_ENGINE:
+        return None
+    return database['OPTIONS'].get('pool', {}).get('max_size', 10)
+
+
+def _close_connections(server, worker):
+    # Forked workers must not share the master's database sockets
+    connections.close_all()
+    close_pools()
+
+
+class ServeApplication(BaseApplication):
+    """gunicorn application serving the Django WSGI or ASGI app"""
+
+    def __init__(self, options, asgi=False):
+        self.options = options
+        self.asgi = asgi
+        super().__init__()
+
+    def load_config(self):
+        for name, value in self.options.items():
+            self.cfg.set(name, value)
+
+    def load(self):
+        if self.asgi:
+            from app.asgi import application
+        else:
+            from app.wsgi import application
+        return application
+
+
+class Command(BaseCommand):
+    """
+    Run the app with gunicorn
+
+    The app is loaded once before forking the workers, which are
+    recycled after --max-requests requests (with jitter). SIGTERM stops
+    accepting connections and lets requests in progress finish within
+    --graceful-timeout seconds.
+    """
+    help = 'Run the app with a production multi-process server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bind', default=os.environ.get('BIND', '0.0.0.0:8000'))
+        parser.add_argument(
+            '--asgi', action='store_true',
+            help='Serve the ASGI app with uvicorn workers (async views).')
+        parser.add_argument(
+            '--workers', type=int,
+            default=int(os.environ.get('WEB_CONCURRENCY', 0)) or None)
+        parser.add_argument('--threads', type=int, default=None)
+        parser.add_argument(
+            '--max-db-connections', type=int,
+            default=int(os.environ.get('DB_MAX_CONNECTIONS', 100)),
+            help='Connections the server may open in total.')
+        parser.add_argument('--max-requests', type=int, default=1000)
+        parser.add_argument('--max-requests-jitter', type=int, default=100)
+        parser.add_argument('--timeout', type=int, default=30)
+        parser.add_argument('--graceful-timeout', type=int, default=30)
+        parser.add_argument('--keep-alive', type=int, default=5)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Print the server configuration and exit.')
+
+    def handle(self, *args, **options):
+        if options['max_db_connections'] < 1:
+            raise CommandError('--max-db-connections must be > 0')
+        pool_size = _pool_size()
+        workers, threads = plan_workers(
+            os.cpu_count() or 1, options['max_db_connections'],
+            pool_size, options['asgi'])
+        workers = options['workers'] or workers
+        threads = options['threads'] or threads
+        if workers < 1 or threads < 1:
+            raise CommandError('--workers and --threads must be > 0')
+        total = workers * connections_per_worker(threads, pool_size)
+        if total > options['max_db_connections']:
+            raise CommandError(
+                f'{workers} workers may open {total} connections, more '
+                f'than --max-db-connections '
+                f'({options["max_db_connections"]}).')
+
+        config = {
+            'bind': options['bind'],
+            'workers': workers,
+            'worker_class': ('uvicorn.workers.UvicornWorker'
+                             if options['asgi'] else 'gthread'),
+            'threads': threads,
+            'preload_app': True,
+            'max_requests': options['max_requests'],
+            'max_requests_jitter': options['max_requests_jitter'],
+            'timeout': options['timeout'],
+            'graceful_timeout': options['graceful_timeout'],
+            'keepalive': options['keep_alive'],
+            'accesslog': '-',
+            'pre_fork': _close_connections,
+        }
+        self.stdout.write(', '.join(
+            f'{name}={value}' for name, value in config.items()
+            if name != 'pre_fork'))
+        if options['dry_run']:
+            return
+        ServeApplication(config, asgi=options['asgi']).run()
@@ -0,0 +1,230 @@
+"""
+Per-request query and latency metrics
+
+RequestMetricsMiddleware counts the SQL queries of each request and times
+them, the serialization and the whole request. It answers with a
+`Server-Timing` header, logs requests slower than SLOW_REQUEST_MS with
+their SQL and keeps the last REQUEST_METRICS_WINDOW samples of each view,
+of which `view_stats()` gives the percentiles.
+"""
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async)
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# SQL statements kept per request for the slow request log
+MAX_LOGGED_QUERIES = 100
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    index = max(math.ceil(fraction * len(values)) - 1, 0)
+    return values[index]
+
+
+class RequestMetrics:
+    """Queries and timings (in seconds) of a request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.total_time = 0.0
+        self.sql = []
+        self._serializing = False
+
+    def server_timing(self):
+        """Return the value of the Server-Timing header"""
+        return (f'db;dur={self.db_time * 1000:.1f};'
+                f'desc="{self.queries} queries", '
+                f'serialize;dur={self.serialize_time * 1000:.1f}, '
+                f'total;dur={self.total_time * 1000:.1f}')
+
+
+def _install_recorder():
+    """Record the queries of the current thread's connections until the
+    returned stack is closed"""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(_record_query))
+    return stack
+
+
+def _record_query(execute, sql, params, many, context):
+    # A no-op outside measured requests, e.g. of nested test clients
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.db_time += elapsed
+        if len(metrics.sql) < MAX_LOGGED_QUERIES:
+            metrics.sql.append((elapsed, sql))
+
+
+@contextmanager
+def timer():
+    """Add the time of a block to the request's serialization time
+
+    Queries run by the block (e.g. of children) count as database time
+    only and nested blocks aren't counted twice.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics._serializing:
+        yield
+        return
+    metrics._serializing = True
+    db_time = metrics.db_time
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._serializing = False
+        metrics.serialize_time += (time.perf_counter() - start -
+                                   (metrics.db_time - db_time))
+
+
+class TimedSerializerMixin:
+    """Counts a serializer's `to_representation()` as serialization time"""
+
+    def to_representation(self, instance):
+        with timer():
+            return super().to_representation(instance)
+
+
+class ViewMetrics:
+    """Rolling samples of the requests of each view"""
+
+    def __init__(self, window):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, view, metrics):
+        sample = (metrics.total_time, metrics.db_time,
+                  metrics.serialize_time, metrics.queries)
+        with self._lock:
+            samples = self._samples.get(view)
+            if samples is None:
+                samples = self._samples[view] = deque(maxlen=self.window)
+            samples.append(sample)
+            self._counts[view] = self._counts.get(view, 0) + 1
+
+    def stats(self):
+        """Return the percentiles of the samples of each view"""
+        with self._lock:
+            views = {view: list(samples)
+                     for view, samples in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for view, samples in sorted(views.items()):
+            total, db, serialize, queries = (
+                sorted(values) for values in zip(*samples))
+            result[view] = {
+                'requests': counts[view],
+                'samples': len(samples),
+                'total_ms': self._percentiles(total, 1000),
+                'db_ms': self._percentiles(db, 1000),
+                'serialize_ms': self._percentiles(serialize, 1000),
+                'queries': self._percentiles(queries),
+            }
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    @staticmethod
+    def _percentiles(values, scale=1):
+        return {
+            name: round(percentile(values, fraction) * scale, 3)
+            for name, fraction in [('p50', 0.5), ('p95', 0.95),
+                                   ('p99', 0.99)]}
+
+
+view_metrics = ViewMetrics(settings.REQUEST_METRICS_WINDOW)
+
+
+class RequestMetricsMiddleware:
+    """Measure each request, see the module docstring
+
+    Streamed responses are measured until the view returns them. Async
+    requests are measured without being adapted to a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with _install_recorder():
+                response = self.get_response(request)
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            # The async ORM queries on the request's thread sensitive
+            # thread, whose connections are instrumented there.
+            recorder = await sync_to_async(_install_recorder)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(recorder.close)()
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        response['Server-Timing'] = metrics.server_timing()
+        match = request.resolver_match
+        if match is not None:
+            view_metrics.add(f'{request.method} {match.view_name}', metrics)
+        if metrics.total_time * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow_request(request, response, metrics)
+        return response
+
+    def log_slow_request(self, request, response, metrics):
+        logger.warning(
+            'Slow request %s %s (%d): %.1f ms, %d queries in %.1f ms, '
+            'serialization %.1f ms\n%s',
+            request.method, request.get_full_path(), response.status_code,
+            metrics.total_time * 1000, metrics.queries,
+            metrics.db_time * 1000, metrics.serialize_time * 1000,
+            '\n'.join(f'  {elapsed * 1000:.1f} ms  {sql}'
+                      for elapsed, sql in metrics.sql))
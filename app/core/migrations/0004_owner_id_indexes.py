@@ -0,0 +1,24 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:24
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0003_contact_socialmedialink_phonenumber_email'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='contact',
+            index=models.Index(fields=['user', '-id'], name='contact_user_id_desc_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+        ),
+    ]
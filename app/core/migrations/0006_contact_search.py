@@ -0,0 +1,128 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:30
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import (
+    BtreeGinExtension,
+    TrigramExtension,
+)
+from django.db import migrations
+
+# tsvector of a contact from its names and the emails, phone numbers and
+# tags of its children. Emails are also indexed by domain and split on `@`
+# and `.`, phone numbers as digits only, so prefix searches on them match.
+SEARCH_VECTOR_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION core_contact_search_vector(
+    bigint, text, text) RETURNS tsvector
+LANGUAGE sql STABLE AS $$
+    SELECT
+        setweight(to_tsvector('simple',
+            coalesce($2, '') || ' ' || coalesce($3, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(
+                email || ' ' || split_part(email, '@', 2) || ' ' ||
+                translate(email, '@.', '  '), ' ')
+            FROM core_email WHERE contact_id = $1), '')), 'B')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(
+                phone_number || ' ' ||
+                regexp_replace(phone_number, '\D', '', 'g'), ' ')
+            FROM core_phonenumber WHERE contact_id = $1), '')), 'B')
+        || setweight(to_tsvector('simple', coalesce((
+            SELECT string_agg(tag, ' ')
+            FROM core_socialmedialink WHERE contact_id = $1), '')), 'C')
+$$;
+"""
+
+CONTACT_TRIGGER = """
+CREATE OR REPLACE FUNCTION core_contact_before_write() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := core_contact_search_vector(
+        NEW.id, NEW.first_name, NEW.last_name);
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER core_contact_before_write
+BEFORE INSERT OR UPDATE OF first_name, last_name ON core_contact
+FOR EACH ROW EXECUTE FUNCTION core_contact_before_write();
+"""
+
+# Statement level, so a bulk write of children refreshes each of their
+# contacts once.
+CHILDREN_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_contact_children_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE core_contact SET search_vector = core_contact_search_vector(
+            id, first_name, last_name)
+        WHERE id IN (SELECT contact_id FROM new_rows);
+    ELSIF TG_OP = 'UPDATE' THEN
+        UPDATE core_contact SET search_vector = core_contact_search_vector(
+            id, first_name, last_name)
+        WHERE id IN (SELECT contact_id FROM new_rows
+                     UNION SELECT contact_id FROM old_rows);
+    ELSE
+        UPDATE core_contact SET search_vector = core_contact_search_vector(
+            id, first_name, last_name)
+        WHERE id IN (SELECT contact_id FROM old_rows);
+    END IF;
+    RETURN NULL;
+END
+$$;
+"""
+
+CHILD_TABLES = ['core_email', 'core_phonenumber', 'core_socialmedialink']
+
+CHILD_TRIGGERS = ''.join(f"""
+CREATE TRIGGER {table}_inserted AFTER INSERT ON {table}
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION core_contact_children_changed();
+
+CREATE TRIGGER {table}_updated AFTER UPDATE ON {table}
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION core_contact_children_changed();
+
+CREATE TRIGGER {table}_deleted AFTER DELETE ON {table}
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION core_contact_children_changed();
+""" for table in CHILD_TABLES)
+
+DROP_TRIGGERS = ''.join(f"""
+DROP TRIGGER IF EXISTS {table}_inserted ON {table};
+DROP TRIGGER IF EXISTS {table}_updated ON {table};
+DROP TRIGGER IF EXISTS {table}_deleted ON {table};
+""" for table in CHILD_TABLES) + """
+DROP TRIGGER IF EXISTS core_contact_before_write ON core_contact;
+DROP FUNCTION IF EXISTS core_contact_children_changed();
+DROP FUNCTION IF EXISTS core_contact_before_write();
+DROP FUNCTION IF EXISTS core_contact_search_vector(bigint, text, text);
+"""
+
+BACKFILL = """
+UPDATE core_contact SET search_vector = core_contact_search_vector(
+    id, first_name, last_name);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_resourceversion'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        BtreeGinExtension(),
+        migrations.AddField(
+            model_name='contact',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            SEARCH_VECTOR_FUNCTION + CONTACT_TRIGGER + CHILDREN_FUNCTION +
+            CHILD_TRIGGERS + BACKFILL,
+            DROP_TRIGGERS,
+        ),
+    ]
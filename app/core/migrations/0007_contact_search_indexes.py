@@ -0,0 +1,30 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:30
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_contact_search'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'search_vector'], name='contact_search_vector_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(models.F('user'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('first_name'), name='gin_trgm_ops'), name='contact_first_name_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='contact',
+            index=django.contrib.postgres.indexes.GinIndex(models.F('user'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('last_name'), name='gin_trgm_ops'), name='contact_last_name_trgm_idx'),
+        ),
+    ]
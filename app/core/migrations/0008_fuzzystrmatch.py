@@ -0,0 +1,16 @@
+# Generated by Django 5.0.4 on 2026-10-18 12:30
+
+from django.contrib.postgres.operations import CreateExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """soundex() for the name blocking key of contact deduplication"""
+
+    dependencies = [
+        ('core', '0007_contact_search_indexes'),
+    ]
+
+    operations = [
+        CreateExtension('fuzzystrmatch'),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:36
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+from django.conf import settings
+from django.db import migrations, models
+
+# updated_at of a row is the start of the transaction writing it, whatever
+# the statement (save(), queryset.update(), raw SQL). Writes to the
+# children of a contact touch it too: core_contact_children_changed()
+# (migration 0006) updates their contacts.
+TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_touch_updated_at() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END
+$$;
+"""
+
+TOUCHED_TABLES = ['core_contact', 'core_email', 'core_phonenumber',
+                  'core_socialmedialink', 'core_recipe']
+
+TOUCH_TRIGGERS = ''.join(f"""
+CREATE TRIGGER {table}_touch BEFORE UPDATE ON {table}
+FOR EACH ROW EXECUTE FUNCTION core_touch_updated_at();
+""" for table in TOUCHED_TABLES)
+
+# Statement level, so a bulk delete records its rows with one INSERT
+TOMBSTONE_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_record_tombstones() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO core_tombstone (user_id, resource, object_id, deleted_at)
+    SELECT user_id, TG_ARGV[0], id, now() FROM old_rows;
+    RETURN NULL;
+END
+$$;
+"""
+
+TOMBSTONE_TABLES = {'core_contact': 'contact', 'core_recipe': 'recipe'}
+
+TOMBSTONE_TRIGGERS = ''.join(f"""
+CREATE TRIGGER {table}_tombstones AFTER DELETE ON {table}
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION core_record_tombstones('{resource}');
+""" for table, resource in TOMBSTONE_TABLES.items())
+
+DROP_TRIGGERS = ''.join(f"""
+DROP TRIGGER IF EXISTS {table}_touch ON {table};
+""" for table in TOUCHED_TABLES) + ''.join(f"""
+DROP TRIGGER IF EXISTS {table}_tombstones ON {table};
+""" for table in TOMBSTONE_TABLES) + """
+DROP FUNCTION IF EXISTS core_record_tombstones();
+DROP FUNCTION IF EXISTS core_touch_updated_at();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_fuzzystrmatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='updated_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+        migrations.AddField(
+            model_name='email',
+            name='updated_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+        migrations.AddField(
+            model_name='phonenumber',
+            name='updated_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+        migrations.AddField(
+            model_name='socialmedialink',
+            name='updated_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), editable=False),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'resource', 'deleted_at'], name='tombstone_user_deleted_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ),
+        migrations.RunSQL(
+            TOUCH_FUNCTION + TOUCH_TRIGGERS + TOMBSTONE_FUNCTION +
+            TOMBSTONE_TRIGGERS,
+            DROP_TRIGGERS,
+        ),
+    ]
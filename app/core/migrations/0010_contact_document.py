@@ -0,0 +1,118 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:41
+
+import importlib
+
+from django.db import migrations, models
+
+contact_search = importlib.import_module('core.migrations.0006_contact_search')
+
+# JSON of a contact as ContactSerializer renders it, children by id
+DOCUMENT_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_contact_document(
+    bigint, text, text) RETURNS jsonb
+LANGUAGE sql STABLE AS $$
+    SELECT jsonb_build_object(
+        'id', $1,
+        'first_name', $2,
+        'last_name', $3,
+        'emails', coalesce((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', id, 'email', email) ORDER BY id)
+            FROM core_email WHERE contact_id = $1), '[]'),
+        'phone_numbers', coalesce((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', id, 'phone_number', phone_number) ORDER BY id)
+            FROM core_phonenumber WHERE contact_id = $1), '[]'),
+        'social_media_links', coalesce((
+            SELECT jsonb_agg(jsonb_build_object(
+                'id', id, 'platform_name', platform_name, 'link', link,
+                'tag', tag) ORDER BY id)
+            FROM core_socialmedialink WHERE contact_id = $1), '[]'))
+$$;
+"""
+
+# The search vector triggers of migration 0006, also writing the document
+CONTACT_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_contact_before_write() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := core_contact_search_vector(
+        NEW.id, NEW.first_name, NEW.last_name);
+    NEW.document := core_contact_document(
+        NEW.id, NEW.first_name, NEW.last_name);
+    RETURN NEW;
+END
+$$;
+"""
+
+# Transition tables only exist for the operations that have them
+CHILDREN_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_contact_children_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    ids bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        ids := ARRAY(SELECT contact_id FROM new_rows);
+    ELSIF TG_OP = 'UPDATE' THEN
+        ids := ARRAY(SELECT contact_id FROM new_rows
+                     UNION SELECT contact_id FROM old_rows);
+    ELSE
+        ids := ARRAY(SELECT contact_id FROM old_rows);
+    END IF;
+    UPDATE core_contact SET
+        search_vector = core_contact_search_vector(
+            id, first_name, last_name),
+        document = core_contact_document(id, first_name, last_name)
+    WHERE id = ANY(ids);
+    RETURN NULL;
+END
+$$;
+"""
+
+# Batches by id range, each its own statement, so rows are only locked
+# for a batch (like the rebuild_contact_documents command)
+BACKFILL = """
+UPDATE core_contact
+SET document = core_contact_document(id, first_name, last_name)
+WHERE id >= %s AND id < %s
+"""
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_documents(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT min(id), max(id) FROM core_contact')
+        low, high = cursor.fetchone()
+        for start in range(low or 0, (high or -1) + 1, BACKFILL_BATCH_SIZE):
+            cursor.execute(BACKFILL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+RESTORE_FUNCTIONS = """
+DROP TRIGGER IF EXISTS core_contact_before_write ON core_contact;
+""" + contact_search.CONTACT_TRIGGER + contact_search.CHILDREN_FUNCTION + """
+DROP FUNCTION IF EXISTS core_contact_document(bigint, text, text);
+"""
+
+
+class Migration(migrations.Migration):
+    # Each backfill batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='document',
+            field=models.JSONField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            DOCUMENT_FUNCTION + CONTACT_FUNCTION + CHILDREN_FUNCTION,
+            RESTORE_FUNCTIONS,
+        ),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
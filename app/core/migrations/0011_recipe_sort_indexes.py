@@ -0,0 +1,30 @@
+# Generated by Django 5.0.4 on 2026-10-18 13:52
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_contact_document'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'time_minutes', 'id'], name='recipe_user_time_minutes_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(models.F('user'), django.db.models.functions.comparison.Collate(django.db.models.functions.text.Upper('title'), 'C'), models.F('id'), name='recipe_user_title_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:02
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_recipe_sort_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='email',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='text_pattern_ops'), name='email_prefix_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='phonenumber',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('phone_number'), name='text_pattern_ops'), name='phonenumber_prefix_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='socialmedialink',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('link'), name='text_pattern_ops'), name='socialmedialink_prefix_idx'),
+        ),
+    ]
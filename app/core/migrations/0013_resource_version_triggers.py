@@ -0,0 +1,94 @@
+# Generated by Django 5.0.4 on 2026-10-18 14:15
+
+from django.db import migrations
+
+# The ETag versions of a resource (see core.etags) are bumped once per
+# statement writing its table, for each user whose rows it writes. Writes
+# to the children of a contact update it (migrations 0006 and 0010), so
+# bump the contacts' version too.
+VERSION_FUNCTION = """
+CREATE OR REPLACE FUNCTION core_bump_resource_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    ids bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        ids := ARRAY(SELECT user_id FROM new_rows);
+    ELSIF TG_OP = 'UPDATE' THEN
+        ids := ARRAY(SELECT user_id FROM new_rows
+                     UNION SELECT user_id FROM old_rows);
+    ELSE
+        ids := ARRAY(SELECT user_id FROM old_rows);
+    END IF;
+    -- Ordered, so concurrent statements lock the versions in one order
+    INSERT INTO core_resourceversion (user_id, resource, version)
+    SELECT DISTINCT user_id, TG_ARGV[0], 1 FROM unnest(ids) AS user_id
+    ORDER BY user_id
+    ON CONFLICT (user_id, resource)
+    DO UPDATE SET version = core_resourceversion.version + 1;
+    RETURN NULL;
+END
+$$;
+"""
+
+VERSIONED_TABLES = {'core_contact': 'contact', 'core_recipe': 'recipe'}
+
+VERSION_TRIGGERS = ''.join(f"""
+CREATE TRIGGER {table}_version_inserted AFTER INSERT ON {table}
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION core_bump_resource_version('{resource}');
+
+CREATE TRIGGER {table}_version_updated AFTER UPDATE ON {table}
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION core_bump_resource_version('{resource}');
+
+CREATE TRIGGER {table}_version_deleted AFTER DELETE ON {table}
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION core_bump_resource_version('{resource}');
+""" for table, resource in VERSIONED_TABLES.items())
+
+DROP_TRIGGERS = ''.join(f"""
+DROP TRIGGER IF EXISTS {table}_version_inserted ON {table};
+DROP TRIGGER IF EXISTS {table}_version_updated ON {table};
+DROP TRIGGER IF EXISTS {table}_version_deleted ON {table};
+""" for table in VERSIONED_TABLES) + """
+DROP FUNCTION IF EXISTS core_bump_resource_version();
+"""
+
+# Deleting a user deletes its versions and then its rows, whose triggers
+# bump new versions. The database deletes those with the user.
+CASCADE_VERSIONS = """
+DO $$
+DECLARE
+    name text;
+BEGIN
+    SELECT conname INTO name FROM pg_constraint
+    WHERE conrelid = 'core_resourceversion'::regclass AND contype = 'f';
+    EXECUTE format('ALTER TABLE core_resourceversion DROP CONSTRAINT %I',
+                   name);
+END
+$$;
+ALTER TABLE core_resourceversion
+ADD CONSTRAINT core_resourceversion_user_id_fk FOREIGN KEY (user_id)
+REFERENCES core_user (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED;
+"""
+
+RESTRICT_VERSIONS = """
+ALTER TABLE core_resourceversion
+DROP CONSTRAINT core_resourceversion_user_id_fk;
+ALTER TABLE core_resourceversion
+ADD CONSTRAINT core_resourceversion_user_id_fk FOREIGN KEY (user_id)
+REFERENCES core_user (id) DEFERRABLE INITIALLY DEFERRED;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_channel_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CASCADE_VERSIONS, RESTRICT_VERSIONS),
+        migrations.RunSQL(VERSION_FUNCTION + VERSION_TRIGGERS, DROP_TRIGGERS),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.4 on 2026-10-18 17:10
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# The contact_id indexes of the foreign keys, superseded by the
+# (contact_id, id) ones
+FK_INDEXES = {
+    'email': ('core_email', 'core_email_contact_id_e669088b'),
+    'phonenumber': ('core_phonenumber',
+                    'core_phonenumber_contact_id_94bf60cb'),
+    'socialmedialink': ('core_socialmedialink',
+                        'core_socialmedialink_contact_id_0d8774c5'),
+}
+RELATED_NAMES = {
+    'email': 'emails',
+    'phonenumber': 'phone_numbers',
+    'socialmedialink': 'social_media_links',
+}
+
+
+def drop_fk_index(model_name):
+    table, index = FK_INDEXES[model_name]
+    return migrations.SeparateDatabaseAndState(
+        database_operations=[migrations.RunSQL(
+            f'DROP INDEX CONCURRENTLY IF EXISTS {index}',
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} '
+            f'ON {table} (contact_id)',
+        )],
+        state_operations=[migrations.AlterField(
+            model_name=model_name,
+            name='contact',
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name=RELATED_NAMES[model_name],
+                to='core.contact'),
+        )],
+    )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_sync_keyset_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='email',
+            index=models.Index(fields=['contact', 'id'], name='email_contact_id_idx'),
+        ),
+        drop_fk_index('email'),
+        AddIndexConcurrently(
+            model_name='phonenumber',
+            index=models.Index(fields=['contact', 'id'], name='phonenumber_contact_id_idx'),
+        ),
+        drop_fk_index('phonenumber'),
+        AddIndexConcurrently(
+            model_name='socialmedialink',
+            index=models.Index(fields=['contact', 'id'], name='socialmedialink_contact_id_idx'),
+        ),
+        drop_fk_index('socialmedialink'),
+    ]
@@ -1,25 +1,37 @@
 import uuid
 
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Collate, Now, Upper
 from django.contrib.auth.models import (
     AbstractUser,
     BaseUserManager,
 )
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 
 
 class UserManager(BaseUserManager):
     """Custom user manager"""
 
-    def create_user(self, email, password=None, **extra_fields):
-        """Create and save a user"""
+    def create_user(self, email, password=None, password_hash=None,
+                    **extra_fields):
+        """Create and save a user
+
+        `password_hash` is a password already hashed with make_password(),
+        e.g. by core.hashing, which is stored instead of hashing `password`.
+        """
         if not email:
             raise ValueError('Users must have an email address')
         if 'username' not in extra_fields or not extra_fields['username']:
             extra_fields['username'] = str(uuid.uuid4())
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        if password_hash is not None:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -61,6 +73,29 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.URLField(max_length=255, blank=True)
+    # Set on insert and by triggers on update (see migration 0009)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    class Meta:
+        indexes = [
+            # Owner scoped listing: WHERE user_id = ? ORDER BY id DESC
+            models.Index(fields=['user', '-id'],
+                         name='recipe_user_id_desc_idx'),
+            # Sync: WHERE user_id = ? AND (updated_at, id) > (?, ?)
+            # ORDER BY updated_at, id
+            models.Index(fields=['user', 'updated_at', 'id'],
+                         name='recipe_user_sync_idx'),
+            # Sorted and range filtered listing (see recipe.filters):
+            # WHERE user_id = ? [AND price >= ?] ORDER BY price, id
+            models.Index(fields=['user', 'price', 'id'],
+                         name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'],
+                         name='recipe_user_time_minutes_idx'),
+            # Case insensitive title prefixes and order, byte-wise so
+            # LIKE 'PREFIX%' is an index range
+            models.Index(F('user'), Collate(Upper('title'), 'C'), F('id'),
+                         name='recipe_user_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -72,36 +107,160 @@ class Contact(models.Model):
         related_name='contacts')
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
+    # Names, emails, phone numbers and tags of the contact, maintained by
+    # database triggers (see migration 0006).
+    search_vector = SearchVectorField(null=True, editable=False)
+    # JSON of the contact and its children as ContactSerializer renders
+    # them, maintained by database triggers (see migration 0010).
+    document = models.JSONField(null=True, editable=False)
+    # Set on insert and by triggers on update of the contact or its
+    # children (see migration 0009)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    class Meta:
+        indexes = [
+            # Owner scoped listing: WHERE user_id = ? ORDER BY id DESC
+            models.Index(fields=['user', '-id'],
+                         name='contact_user_id_desc_idx'),
+            # Sync: WHERE user_id = ? AND (updated_at, id) > (?, ?)
+            # ORDER BY updated_at, id
+            models.Index(fields=['user', 'updated_at', 'id'],
+                         name='contact_user_sync_idx'),
+            # Owner scoped full-text and fuzzy name search (btree_gin)
+            GinIndex(fields=['user', 'search_vector'],
+                     name='contact_search_vector_idx'),
+            GinIndex(F('user'),
+                     OpClass(Upper('first_name'), name='gin_trgm_ops'),
+                     name='contact_first_name_trgm_idx'),
+            GinIndex(F('user'),
+                     OpClass(Upper('last_name'), name='gin_trgm_ops'),
+                     name='contact_last_name_trgm_idx'),
+        ]
 
     def __str__(self):
         return f'{self.first_name}, {self.last_name}'
 
 
 class Email(models.Model):
+    # Indexed by (contact, id), see Meta.indexes
     contact = models.ForeignKey(
         Contact, related_name='emails',
-        on_delete=models.CASCADE)
+        on_delete=models.CASCADE, db_index=False)
     email = models.EmailField()
+    # Set on insert and by triggers on update (see migration 0009)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    class Meta:
+        indexes = [
+            # Children of a page: WHERE contact_id IN (...)
+            # ORDER BY contact_id, id
+            models.Index(fields=['contact', 'id'],
+                         name='email_contact_id_idx'),
+            # Admin prefix search: UPPER(email) LIKE 'PREFIX%'
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'),
+                         name='email_prefix_idx'),
+        ]
 
     def __str__(self):
         return f'{self.email}({self.contact.first_name}, {self.contact.last_name})'
 
 
 class PhoneNumber(models.Model):
+    # Indexed by (contact, id), see Meta.indexes
     contact = models.ForeignKey(
         Contact, related_name='phone_numbers',
-        on_delete=models.CASCADE)
+        on_delete=models.CASCADE, db_index=False)
     phone_number = models.CharField(max_length=20)
+    # Set on insert and by triggers on update (see migration 0009)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    class Meta:
+        indexes = [
+            # Children of a page: WHERE contact_id IN (...)
+            # ORDER BY contact_id, id
+            models.Index(fields=['contact', 'id'],
+                         name='phonenumber_contact_id_idx'),
+            # Admin prefix search: UPPER(phone_number) LIKE 'PREFIX%'
+            models.Index(
+                OpClass(Upper('phone_number'), name='text_pattern_ops'),
+                name='phonenumber_prefix_idx'),
+        ]
 
     def __str__(self):
         return f'{self.phone_number}({self.contact.first_name}, {self.contact.last_name})'
 
 class SocialMediaLink(models.Model):
+    # Indexed by (contact, id), see Meta.indexes
     contact = models.ForeignKey(
         Contact, related_name='social_media_links',
-        on_delete=models.CASCADE)
+        on_delete=models.CASCADE, db_index=False)
     platform_name = models.CharField(max_length=100)
     link = models.URLField()
     tag = models.CharField(max_length=100)
+    # Set on insert and by triggers on update (see migration 0009)
+    updated_at = models.DateTimeField(db_default=Now(), editable=False)
+
+    class Meta:
+        indexes = [
+            # Children of a page: WHERE contact_id IN (...)
+            # ORDER BY contact_id, id
+            models.Index(fields=['contact', 'id'],
+                         name='socialmedialink_contact_id_idx'),
+            # Admin prefix search: UPPER(link) LIKE 'PREFIX%'
+            models.Index(OpClass(Upper('link'), name='text_pattern_ops'),
+                         name='socialmedialink_prefix_idx'),
+        ]
     def __str__(self):
         return f'{self.link}({self.contact.first_name}, {self.contact.last_name})'
+
+
+class Tombstone(models.Model):
+    """Deleted contact or recipe, kept for the sync of offline clients
+
+    Written by triggers on delete (see migration 0009) and pruned after
+    settings.SYNC_TOMBSTONE_DAYS by the prune_tombstones command.
+    """
+    # No constraint: rows deleted with their user are recorded before the
+    # user is deleted. Tombstones of deleted users are left to pruning.
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False,
+        related_name='+')
+    resource = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        indexes = [
+            # Sync: WHERE user_id = ? AND resource = ? AND deleted_at >= ?
+            models.Index(fields=['user', 'resource', 'deleted_at'],
+                         name='tombstone_user_deleted_at_idx'),
+            models.Index(fields=['deleted_at'],
+                         name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.resource} {self.object_id}'
+
+
+class ResourceVersion(models.Model):
+    """Per user version of a resource, bumped by every write to it
+
+    Bumped by database triggers on the resource's table (see migration
+    0013), so writes of the ORM, SQL, the admin and commands all count.
+    """
+    # The constraint also cascades in the database (migration 0013): the
+    # rows of a deleted user bump versions after its own were deleted.
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='resource_versions')
+    resource = models.CharField(max_length=50)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'resource'],
+                name='unique_resource_version_per_user'),
+        ]
+
+    def __str__(self):
+        return f'{self.resource}@{self.version}'
@@ -0,0 +1,183 @@
+"""
+Pagination for the API list endpoints
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Field, Func, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class Row(Func):
+    """Row constructor, compared column by column"""
+    function = 'ROW'
+    output_field = Field()
+
+
+class KeysetPagination(CursorPagination):
+    """Opaque cursor (keyset) pagination on the `-id` ordering
+
+    A page is fetched with `WHERE id < <cursor> ORDER BY id DESC LIMIT n`,
+    so no COUNT(*) or OFFSET is run, every page costs the same and rows
+    inserted meanwhile don't shift the following pages.
+
+    Pages are fetched by `get_page_queryset()` and read by `set_page()`,
+    which lets async views await the query with `apaginate_queryset()`.
+    """
+    ordering = '-id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async `paginate_queryset()` fetching the page with the async ORM"""
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """Return the queryset of the requested page and one more row"""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.cursor_state = (0, False, None)
+        else:
+            self.cursor_state = tuple(self.cursor)
+        offset, reverse, current_position = self.cursor_state
+
+        if reverse:
+            queryset = queryset.order_by(
+                *[order[1:] if order.startswith('-') else '-' + order
+                  for order in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            order = self.ordering[0]
+            is_reversed = order.startswith('-')
+            order_attr = order.lstrip('-')
+            if self.cursor.reverse != is_reversed:
+                kwargs = {order_attr + '__lt': current_position}
+            else:
+                kwargs = {order_attr + '__gt': current_position}
+            queryset = queryset.filter(**kwargs)
+
+        return queryset[offset:offset + self.page_size + 1]
+
+    def set_page(self, results):
+        """Set the page and links from the rows of `get_page_queryset()`"""
+        offset, reverse, current_position = self.cursor_state
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            # The page was fetched in reverse order
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class SortedKeysetPagination(KeysetPagination):
+    """Forward only keyset pagination over (key, id)
+
+    For lists ordered by a non unique annotation `key`, ties broken by
+    id in the same direction. The cursor holds the key and id of the last
+    row of the page, the next page starts after them with a row
+    comparison, `WHERE (key, id) < (k, i)` when descending, which is a
+    range of an index on (owner, key, id). Rows may be instances or
+    `.values()` dicts.
+    """
+    key = None
+    descending = True
+
+    def __init__(self, key=None, descending=None):
+        if key is not None:
+            self.key = key
+        if descending is not None:
+            self.descending = descending
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            output_field = queryset.query.annotations[self.key].output_field
+            try:
+                value, pk = cursor.position.rsplit(':', 1)
+                value, pk = output_field.to_python(value), int(pk)
+            except (AttributeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            after = LessThan if self.descending else GreaterThan
+            queryset = queryset.filter(after(
+                Row(F(self.key), F('pk')), Row(Value(value), Value(pk))))
+        order = '-' if self.descending else ''
+        return queryset.order_by(
+            order + self.key, order + 'pk')[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.has_next = len(results) > self.page_size
+        self.has_previous = False
+        self.page = results[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        if isinstance(last, dict):
+            value, pk = last[self.key], last['id']
+        else:
+            value, pk = getattr(last, self.key), last.pk
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False, position=f'{value}:{pk}'))
+
+    def get_previous_link(self):
+        return None
+
+
+class RankedKeysetPagination(SortedKeysetPagination):
+    """Forward only keyset pagination over (-rank, -id)
+
+    For ranked search results: the queryset must be annotated with an
+    exact (numeric) `rank`.
+    """
+    key = 'rank'
@@ -0,0 +1,126 @@
+"""
+Queryset planner for (nested) model serializers
+
+Looks at the fields a serializer is going to render and adds the matching
+``select_related``/``prefetch_related`` calls and ``.only()`` column pruning
+to a queryset, so rendering a page costs a fixed number of queries.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+_plans = {}
+
+
+class QueryPlan:
+    """Relations and columns needed to render a serializer"""
+
+    def __init__(self):
+        self.only = set()
+        self.select_related = set()
+        self.prefetches = []
+        # Set when a field reads something we can't map to a column,
+        # in which case no column pruning is done.
+        self.load_all = False
+
+    def apply(self, queryset):
+        """Apply the plan to a queryset"""
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetches:
+            queryset = queryset.prefetch_related(*self.prefetches)
+        if not self.load_all:
+            queryset = queryset.only(*sorted(self.only))
+        return queryset
+
+
+def _serializer_fields(serializer):
+    """Return the readable fields of a serializer instance"""
+    return [field for field in serializer.fields.values()
+            if not field.write_only]
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _build_plan(model, fields, prefix=''):
+    plan = QueryPlan()
+    plan.only.add(prefix + model._meta.pk.name)
+
+    for field in fields:
+        if field.source == '*':
+            plan.load_all = True
+            continue
+        name, _, rest = field.source.partition('.')
+        model_field = _model_field(model, name)
+
+        if model_field is None:
+            # Properties and methods may touch any column.
+            plan.load_all = True
+        elif isinstance(field, (serializers.ListSerializer,
+                                serializers.ManyRelatedField)):
+            plan.prefetches.append(
+                _prefetch(model_field, field, prefix + name))
+        elif model_field.is_relation and '.' in rest:
+            plan.load_all = True
+        elif model_field.is_relation and (
+                rest or isinstance(field, serializers.BaseSerializer)):
+            # Forward FK / one-to-one rendered through a nested serializer
+            # or a dotted source: join it in the same query.
+            plan.select_related.add(prefix + name)
+            nested_fields = [] if rest else _serializer_fields(field)
+            nested = _build_plan(
+                model_field.related_model, nested_fields,
+                prefix + name + '__')
+            if rest:
+                nested.only.add(prefix + name + '__' + rest)
+            plan.only.update(nested.only)
+            plan.select_related.update(nested.select_related)
+            plan.prefetches.extend(nested.prefetches)
+            plan.load_all = plan.load_all or nested.load_all
+        elif model_field.concrete:
+            plan.only.add(prefix + name)
+        else:
+            plan.load_all = True
+    return plan
+
+
+def _prefetch(model_field, field, lookup):
+    """Build the Prefetch for a many=True field"""
+    related = model_field.related_model
+    # Children by id, in the same order whatever renders them
+    queryset = related._default_manager.order_by(related._meta.pk.name)
+    child = getattr(field, 'child', None) or \
+        getattr(field, 'child_relation', None)
+
+    if isinstance(child, serializers.ModelSerializer):
+        child_plan = _build_plan(related, _serializer_fields(child))
+        if model_field.one_to_many:
+            # The reverse FK column is needed to attach rows to parents,
+            # ordering by it first reads the (parent, id) index in order.
+            child_plan.only.add(model_field.field.name)
+            queryset = queryset.order_by(
+                model_field.field.name, related._meta.pk.name)
+        queryset = child_plan.apply(queryset)
+    return Prefetch(lookup, queryset=queryset)
+
+
+def get_plan(serializer):
+    """Return the (cached) query plan for a serializer instance"""
+    fields = _serializer_fields(serializer)
+    key = (type(serializer),
+           tuple(sorted(field.field_name for field in fields)))
+    plan = _plans.get(key)
+    if plan is None:
+        plan = _build_plan(serializer.Meta.model, fields)
+        _plans[key] = plan
+    return plan
+
+
+def plan_queryset(queryset, serializer):
+    """Prefetch, join and prune columns for rendering `serializer`"""
+    return get_plan(serializer).apply(queryset)
@@ -0,0 +1,107 @@
+"""
+Bulk provisioning of user accounts with their tokens
+
+For onboarding thousands of accounts at once: passwords are hashed in a
+process pool, PBKDF2 being CPU bound, then the users and their tokens
+are written with `bulk_create` in batches. Accounts with an email that
+is already taken are skipped, the others are created in one transaction.
+"""
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model, hashers
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+# Accounts provisioned by one request of the staff endpoint
+MAX_PROVISION_USERS = 1000
+
+
+def _worker_context():
+    # Not forked: callers, e.g. gthread workers, have threads (holding
+    # locks) and database sockets that children must not inherit. Workers
+    # set Django up from the inherited DJANGO_SETTINGS_MODULE.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def hash_passwords(passwords, workers=None):
+    """Return the `make_password()` hashes of `passwords`, in order
+
+    Hashes run in `workers` processes (PROVISIONING_WORKERS by default),
+    a single worker hashes in this process. A missing (None) password
+    gets an unusable hash, which costs nothing.
+    """
+    passwords = list(passwords)
+    workers = min(workers or settings.PROVISIONING_WORKERS,
+                  sum(password is not None for password in passwords))
+    if workers <= 1:
+        return [hashers.make_password(password) for password in passwords]
+    hashes = [hashers.make_password(None) if password is None else None
+              for password in passwords]
+    todo = [n for n, password in enumerate(passwords) if password is not None]
+    with ProcessPoolExecutor(
+            workers, mp_context=_worker_context(),
+            initializer=django.setup) as executor:
+        results = executor.map(
+            hashers.make_password, [passwords[n] for n in todo],
+            chunksize=max(1, len(todo) // (4 * workers)))
+        for n, password_hash in zip(todo, results):
+            hashes[n] = password_hash
+    return hashes
+
+
+def provision_users(accounts, workers=None, batch_size=1000):
+    """Create users and their tokens, return (created, existing)
+
+    `accounts` are dicts with an `email` and optionally a `name` and a
+    `password`, accounts without one can't sign in until it's set.
+    `created` are the new users, each with its `auth_token`, `existing`
+    the normalized emails that were already taken.
+    """
+    model = get_user_model()
+    accounts = {
+        model.objects.normalize_email(account['email']): account
+        for account in accounts}
+    emails = list(accounts)
+    existing = _taken(emails, batch_size)
+    emails = [email for email in emails if email not in existing]
+    hashes = dict(zip(emails, hash_passwords(
+        [accounts[email].get('password') for email in emails], workers)))
+
+    while True:
+        try:
+            with transaction.atomic():
+                created = model.objects.bulk_create([
+                    model(email=email, name=accounts[email].get('name', ''),
+                          username=str(uuid.uuid4()),
+                          password=hashes[email])
+                    for email in emails], batch_size=batch_size)
+                tokens = Token.objects.bulk_create(
+                    [Token(user=user, key=Token.generate_key())
+                     for user in created], batch_size=batch_size)
+            break
+        except IntegrityError:
+            # Emails taken since they were checked (e.g. by sign-ups)
+            taken = _taken(emails, batch_size)
+            if not taken:
+                raise
+            existing |= taken
+            emails = [email for email in emails if email not in taken]
+    for user, token in zip(created, tokens):
+        user.auth_token = token
+    return created, sorted(existing)
+
+
+def _taken(emails, batch_size):
+    """Return the emails of `emails` that users have"""
+    taken = set()
+    for start in range(0, len(emails), batch_size):
+        taken.update(get_user_model().objects.filter(
+            email__in=emails[start:start + batch_size]).values_list(
+                'email', flat=True))
+    return taken
@@ -0,0 +1,258 @@
+"""
+Compiled read path for (nested) model serializers
+
+Renders list pages from ``.values()`` rows instead of model instances and
+serializer field calls: a serializer is compiled once into the columns to
+select, the conversions its fields apply and the child relations to fetch.
+Children of a page are fetched with one query per relation and grouped in
+a single pass. The output is the same as ``serializer.data``.
+
+Serializers with fields that can't be compiled (methods, dotted sources,
+forward relations, custom representations...) have no reader and are
+rendered by DRF as usual.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from .metrics import timer
+
+# Field representations that return database values unchanged, with the
+# model fields they hold for.
+PASSTHROUGH = {
+    serializers.CharField.to_representation:
+        (models.CharField, models.TextField),
+    serializers.IntegerField.to_representation: (models.IntegerField,),
+    serializers.BooleanField.to_representation: (models.BooleanField,),
+}
+
+# Fields whose representation only depends on the value and settings
+CONVERTED = (
+    serializers.DecimalField,
+    serializers.FloatField,
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DurationField,
+    serializers.UUIDField,
+)
+
+_readers = {}
+
+
+class NotCompilable(Exception):
+    """A serializer field has no compiled equivalent"""
+
+
+class Relation:
+    """A reverse foreign key rendered by a nested `many=True` serializer"""
+
+    def __init__(self, model, fk_column, reader):
+        self.model = model
+        self.fk_column = fk_column
+        self.reader = reader
+
+    def get_queryset(self, ids):
+        # Children by id, like the prefetches of the serializer path
+        return self.model._default_manager.filter(
+            **{self.fk_column + '__in': ids}).order_by(
+            self.fk_column, self.model._meta.pk.attname).values(
+            self.fk_column, *self.reader.columns)
+
+    def group(self, ids, rows, items):
+        """Return the rendered children of each parent id"""
+        groups = {pk: [] for pk in ids}
+        for row, item in zip(rows, items):
+            groups[row[self.fk_column]].append(item)
+        return groups
+
+
+class ValuesReader:
+    """Renders `.values()` rows like a model serializer"""
+
+    def __init__(self, model):
+        self.pk_column = model._meta.pk.attname
+        self.columns = [self.pk_column]
+        # (field name, column, converter) in serializer field order,
+        # children have no column.
+        self.fields = []
+        self.relations = {}
+
+    def values(self, queryset):
+        """Return the values queryset of the rows to render
+
+        Selected annotations (e.g. a search `rank` read by pagination)
+        are kept in the rows.
+        """
+        return queryset.prefetch_related(None).values(
+            *self.columns, *queryset.query.annotation_select)
+
+    def render(self, rows):
+        """Return the representations of `rows`, fetching their children"""
+        ids = [row[self.pk_column] for row in rows]
+        children = {}
+        for name, relation in self.relations.items():
+            child_rows = list(relation.get_queryset(ids)) if ids else []
+            children[name] = relation.group(
+                ids, child_rows, relation.reader.render(child_rows))
+        return [self._build(row, children) for row in rows]
+
+    async def arender(self, rows):
+        """Async `render()` fetching the children with the async ORM"""
+        ids = [row[self.pk_column] for row in rows]
+        children = {}
+        for name, relation in self.relations.items():
+            child_rows = ([row async for row in relation.get_queryset(ids)]
+                          if ids else [])
+            children[name] = relation.group(
+                ids, child_rows, await relation.reader.arender(child_rows))
+        return [self._build(row, children) for row in rows]
+
+    def _build(self, row, children):
+        item = {}
+        for name, column, convert in self.fields:
+            if column is None:
+                item[name] = children[name][row[self.pk_column]]
+                continue
+            value = row[column]
+            if convert is not None and value is not None:
+                value = convert(value)
+            item[name] = value
+        return item
+
+
+class DocumentReader:
+    """Renders rows from a JSON column holding their representation
+
+    The column (e.g. maintained by database triggers) holds every field
+    the serializer may render, rows are projected on the `fields` of the
+    serializer, so nothing is fetched but the page. A field given as a
+    `(name, fields)` pair is a list of children, projected on their
+    `fields` too: jsonb doesn't keep the order of object keys, the
+    projection restores the serializer's.
+    """
+
+    def __init__(self, model, column, fields):
+        self.pk_column = model._meta.pk.attname
+        self.column = column
+        self.fields = fields
+
+    def values(self, queryset):
+        """Return the values queryset of the rows to render"""
+        return queryset.prefetch_related(None).values(
+            self.pk_column, self.column,
+            *queryset.query.annotation_select)
+
+    def render(self, rows):
+        return [self._project(row[self.column], self.fields)
+                for row in rows]
+
+    async def arender(self, rows):
+        return self.render(rows)
+
+    @classmethod
+    def _project(cls, document, fields):
+        item = {}
+        for field in fields:
+            if isinstance(field, tuple):
+                name, child_fields = field
+                item[name] = [cls._project(child, child_fields)
+                              for child in document[name]]
+            else:
+                item[field] = document[field]
+        return item
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        raise NotCompilable(name)
+
+
+def _converter(field, model_field):
+    """Return the conversion of a column to its representation"""
+    method = type(field).to_representation
+    if isinstance(model_field, PASSTHROUGH.get(method, ())):
+        return None
+    if isinstance(field, CONVERTED):
+        return field.to_representation
+    raise NotCompilable(field.field_name)
+
+
+def _compile(serializer):
+    model = serializer.Meta.model
+    reader = ValuesReader(model)
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or '.' in field.source:
+            raise NotCompilable(field.field_name)
+        model_field = _model_field(model, field.source)
+
+        if isinstance(field, serializers.ListSerializer):
+            if not (model_field.one_to_many and isinstance(
+                    field.child, serializers.ModelSerializer)):
+                raise NotCompilable(field.field_name)
+            reader.relations[field.field_name] = Relation(
+                model_field.related_model, model_field.field.attname,
+                _compile(field.child))
+            reader.fields.append((field.field_name, None, None))
+        elif model_field.concrete and not model_field.is_relation:
+            if model_field.attname not in reader.columns:
+                reader.columns.append(model_field.attname)
+            reader.fields.append((field.field_name, model_field.attname,
+                                  _converter(field, model_field)))
+        else:
+            raise NotCompilable(field.field_name)
+    return reader
+
+
+def get_reader(serializer):
+    """Return the (cached) reader of a serializer instance or None"""
+    key = (type(serializer), tuple(
+        name for name, field in serializer.fields.items()
+        if not field.write_only))
+    if key not in _readers:
+        try:
+            _readers[key] = _compile(serializer)
+        except NotCompilable:
+            _readers[key] = None
+    return _readers[key]
+
+
+class ValuesListMixin:
+    """List and retrieve of a ModelViewSet rendered by a reader
+
+    The reader is the serializer's unless `get_reader()` is overridden,
+    the serializer renders when there is none. Objects are retrieved
+    without object level permission checks.
+    """
+
+    def get_reader(self, serializer):
+        return get_reader(serializer)
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_reader(self.get_serializer())
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with timer():
+            results = reader.render(list(queryset) if page is None else page)
+        if page is None:
+            return Response(results)
+        return self.get_paginated_response(results)
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = self.get_reader(self.get_serializer())
+        if reader is None:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            reader.values(self.filter_queryset(self.get_queryset())),
+            **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        with timer():
+            return Response(reader.render([row])[0])
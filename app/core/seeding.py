@@ -0,0 +1,69 @@
+"""
+Bulk creation of synthetic users, contacts and recipes
+
+For benchmarks and load tests: rows are written with `bulk_create` in
+batches, every user gets the same (hashed once) password and a token.
+"""
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+
+from .models import Contact, Email, PhoneNumber, Recipe, SocialMediaLink
+
+DEFAULT_PASSWORD = 'seed-pass-123'
+
+
+def seed_users(users, contacts=0, channels=0, recipes=0,
+               password=DEFAULT_PASSWORD, prefix='seed', batch_size=1000):
+    """Create `users` users with their contacts and recipes, return them
+
+    Each contact gets `channels` emails, phone numbers and social media
+    links. Emails are `<prefix>-<run>-<n>@example.com`, `run` being
+    random, so seeding again doesn't collide with earlier runs.
+    """
+    run = uuid.uuid4().hex[:8]
+    password_hash = make_password(password)
+    created = get_user_model().objects.bulk_create([
+        get_user_model()(
+            email=f'{prefix}-{run}-{n}@example.com', name=f'Seed User {n}',
+            username=str(uuid.uuid4()), password=password_hash)
+        for n in range(users)], batch_size=batch_size)
+    Token.objects.bulk_create(
+        [Token(user=user, key=Token.generate_key()) for user in created],
+        batch_size=batch_size)
+
+    for user in created:
+        seed_contacts(user, contacts, channels, batch_size)
+        Recipe.objects.bulk_create((
+            Recipe(user=user, title=f'Recipe {n}', time_minutes=n % 120 + 1,
+                   price=Decimal(n % 10000) / 100,
+                   description=f'Synthetic recipe {n}',
+                   link=f'https://example.com/recipes/{n}')
+            for n in range(recipes)), batch_size=batch_size)
+    return created
+
+
+def seed_contacts(user, contacts, channels, batch_size=1000):
+    """Create `contacts` contacts of a user with `channels` of each kind"""
+    created = Contact.objects.bulk_create((
+        Contact(user=user, first_name=f'First{n}', last_name=f'Last{n}')
+        for n in range(contacts)), batch_size=batch_size)
+    Email.objects.bulk_create((
+        Email(contact=contact, email=f'contact{contact.id}-{n}@example.com')
+        for contact in created for n in range(channels)),
+        batch_size=batch_size)
+    PhoneNumber.objects.bulk_create((
+        PhoneNumber(contact=contact,
+                    phone_number=f'+1555{contact.id % 10 ** 7:07}{n % 10}')
+        for contact in created for n in range(channels)),
+        batch_size=batch_size)
+    SocialMediaLink.objects.bulk_create((
+        SocialMediaLink(contact=contact, platform_name='web',
+                        link=f'https://example.com/{contact.id}/{n}',
+                        tag=f'tag{n}')
+        for contact in created for n in range(channels)),
+        batch_size=batch_size)
+    return created
@@ -0,0 +1,21 @@
+"""
+Signal handlers of the core app
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token from the cache"""
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_saved_user(sender, instance, **kwargs):
+    """Drop cached tokens of a user that may be deactivated or changed"""
+    token_cache.invalidate_user(instance.pk)
@@ -0,0 +1,155 @@
+"""
+Incremental sync (`updated_since`) of owner scoped resources
+
+Rows carry an `updated_at` set by triggers to the start of the writing
+transaction and deletions leave a `Tombstone`. A client syncs with the
+watermark of its previous sync and gets the rows written and the ids
+deleted since, plus the next watermark. Rows are answered in pages by
+(updated_at, id), the watermark with the last one.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.metrics import timer
+from core.pagination import SortedKeysetPagination
+from core.planner import plan_queryset
+from core.readers import get_reader
+
+# The watermark is the start of the oldest transaction open when the sync
+# runs (the app's role can see those of its own sessions): rows committed
+# later are stamped after it, so none is skipped. Rows are fetched only
+# when there are any, a sync with nothing new is this one statement.
+SYNC_SQL = """
+WITH watermark AS (
+    SELECT least(now(), min(xact_start)) AS at FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_type = 'client backend'
+)
+SELECT watermark.at,
+    EXISTS(SELECT FROM {table}
+           WHERE user_id = %(user_id)s AND updated_at >= %(since)s),
+    ARRAY(SELECT object_id FROM core_tombstone
+          WHERE user_id = %(user_id)s AND resource = %(resource)s
+            AND deleted_at >= %(deleted_since)s
+          ORDER BY object_id)
+FROM watermark
+"""
+
+
+class WatermarkExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = _('Watermark older than the kept deletions, '
+                       'sync again without it.')
+    default_code = 'watermark_expired'
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    """Query parameters of a sync
+
+    `watermark` is set by the links to the following pages, which
+    continue the sync of the first.
+    """
+    since = serializers.DateTimeField(required=False)
+    watermark = serializers.DateTimeField(required=False)
+
+    def validate_since(self, value):
+        kept = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+        if value < kept:
+            raise WatermarkExpired()
+        return value
+
+
+class SyncPagination(SortedKeysetPagination):
+    """Forward keyset pagination over (updated_at, id)
+
+    Pages are ranges of the (user, updated_at, id) index. Rows written
+    while a client pages may be answered twice, never skipped.
+    """
+    key = 'sync_at'
+    descending = False
+    page_size = settings.SYNC_PAGE_SIZE
+    max_page_size = settings.SYNC_PAGE_SIZE
+
+
+def get_changes(user, model, resource, since=None):
+    """Return the watermark, whether rows changed and the deleted ids
+
+    Without `since` every row is changed and none deleted.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(SYNC_SQL.format(table=model._meta.db_table), {
+            'user_id': user.pk,
+            'resource': resource,
+            'since': since or '-infinity',
+            'deleted_since': since or 'infinity',
+        })
+        return cursor.fetchone()
+
+
+class SyncMixin:
+    """`sync` action of a ModelViewSet of owner scoped rows
+
+    `GET sync/?since=<watermark>` answers the rows (as the serializer
+    renders them) written and the ids of the rows deleted since the
+    watermark, with the watermark of the next sync. Without `since` all
+    rows are answered. Rows come in pages of `?page_size=` rows, the
+    `next` link of a page continues the sync, the last page has no
+    `next` but the `watermark`. Deleted ids are answered by the first
+    page. Rows may be answered again by the next sync, and watermarks
+    older than settings.SYNC_TOMBSTONE_DAYS are refused (410).
+    Tombstones are recorded under the viewset's `etag_resource`.
+    """
+
+    @action(detail=False, methods=['get'], url_path='sync')
+    def sync(self, request):
+        params = SyncQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since = params.validated_data.get('since')
+        # The watermark of the first page holds for the following ones:
+        # rows of transactions open then may be stamped before the pages.
+        watermark = params.validated_data.get('watermark')
+        if watermark is None:
+            watermark, changed, deleted = get_changes(
+                request.user, self.queryset.model, self.etag_resource,
+                since)
+        else:
+            changed, deleted = True, []
+        watermark = serializers.DateTimeField().to_representation(watermark)
+
+        results, next_link = [], None
+        if changed:
+            paginator = SyncPagination()
+            queryset = self.queryset.filter(user=request.user).annotate(
+                sync_at=F('updated_at'))
+            if since is not None:
+                queryset = queryset.filter(updated_at__gte=since)
+            serializer = self.get_serializer()
+            reader = get_reader(serializer)
+            queryset = plan_queryset(queryset, serializer)
+            if reader is not None:
+                rows = paginator.paginate_queryset(
+                    reader.values(queryset), request, self)
+                with timer():
+                    results = reader.render(rows)
+            else:
+                results = self.get_serializer(paginator.paginate_queryset(
+                    queryset, request, self), many=True).data
+            next_link = paginator.get_next_link()
+            if next_link is not None:
+                next_link = replace_query_param(
+                    next_link, 'watermark', watermark)
+        return Response({
+            'watermark': None if next_link else watermark,
+            'next': next_link,
+            'changed': results,
+            'deleted': deleted,
+        })
@@ -1,10 +1,17 @@
 """
 Tests for admin
 """
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Contact, Email, PhoneNumber, Recipe, SocialMediaLink
+
+CHANGELISTS = ['recipe', 'contact', 'email', 'phonenumber',
+               'socialmedialink']
 
 
 class AdminSiteTests(TestCase):
@@ -43,3 +50,78 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+
+class LargeTableAdminTests(TestCase):
+    """Test the changelists of the contact and recipe tables"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@test.com', password='password123')
+        self.client.force_login(self.admin_user)
+
+    def create_rows(self, count):
+        for n in range(count):
+            contact = Contact.objects.create(
+                user=self.admin_user, first_name=f'First{n}',
+                last_name=f'Last{n}')
+            Email.objects.create(contact=contact,
+                                 email=f'contact{n}@example.com')
+            PhoneNumber.objects.create(contact=contact,
+                                       phone_number=f'555010{n}')
+            SocialMediaLink.objects.create(
+                contact=contact, platform_name='Web', tag='personal',
+                link=f'https://example.com/{n}')
+            Recipe.objects.create(user=self.admin_user, title=f'Recipe {n}',
+                                  time_minutes=5, price='1.00')
+
+    def get_changelist(self, model, **params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(
+                reverse(f'admin:core_{model}_changelist'), params)
+        self.assertEqual(res.status_code, 200)
+        return res, [query['sql'] for query in queries]
+
+    def test_changelist_queries_per_row(self):
+        """Test changelists join the related rows instead of loading
+        them row by row"""
+        self.create_rows(1)
+        counts = {model: len(self.get_changelist(model)[1])
+                  for model in CHANGELISTS}
+        self.create_rows(3)
+
+        for model in CHANGELISTS:
+            res, queries = self.get_changelist(model)
+            self.assertEqual(len(queries), counts[model], model)
+            self.assertEqual(res.context['cl'].result_count, 4)
+
+    def test_changelist_search(self):
+        """Test searches find rows by prefix or name"""
+        self.create_rows(2)
+
+        for model, text in [('contact', 'last1'), ('email', 'contact1@'),
+                            ('phonenumber', '5550101'),
+                            ('socialmedialink', 'https://example.com/1')]:
+            res, _ = self.get_changelist(model, q=text)
+            self.assertEqual(res.context['cl'].result_count, 1, model)
+
+    def test_contact_columns_deferred(self):
+        """Test the trigger maintained contact columns aren't loaded"""
+        self.create_rows(1)
+
+        for model in ['contact', 'email']:
+            _, queries = self.get_changelist(model)
+            self.assertFalse(any('"document"' in sql for sql in queries))
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_large_changelist_counts_are_estimated(self):
+        """Test lists estimated to be large aren't counted"""
+        self.create_rows(3)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_email')
+
+        res, queries = self.get_changelist('email')
+
+        self.assertFalse(any('COUNT(' in sql for sql in queries))
+        self.assertGreater(res.context['cl'].result_count, 0)
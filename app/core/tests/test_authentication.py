@@ -0,0 +1,115 @@
+"""
+Tests for the cached token authentication
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import TokenCache, token_cache
+
+RECIPES_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+
+
+class FakeUser:
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class TokenCacheTests(SimpleTestCase):
+    """Test the bounded LRU/TTL token cache"""
+
+    def test_evicts_least_recently_used(self):
+        """Test the least recently used key is evicted first"""
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.set('a', (FakeUser(1), 'a'))
+        cache.set('b', (FakeUser(2), 'b'))
+        cache.get('a')
+        cache.set('c', (FakeUser(3), 'c'))
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    @patch('core.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are not returned after the TTL"""
+        cache = TokenCache(max_size=10, ttl=60)
+        patched_monotonic.return_value = 100
+        cache.set('a', (FakeUser(1), 'a'))
+        patched_monotonic.return_value = 159
+        self.assertIsNotNone(cache.get('a'))
+        patched_monotonic.return_value = 161
+        self.assertIsNone(cache.get('a'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['size'], 0)
+
+    def test_invalidate_user(self):
+        """Test every key of a user can be dropped"""
+        cache = TokenCache(max_size=10, ttl=60)
+        cache.set('a', (FakeUser(1), 'a'))
+        cache.set('b', (FakeUser(1), 'b'))
+        cache.set('c', (FakeUser(2), 'c'))
+        cache.invalidate_user(1)
+
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests through the token cache"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_query(self):
+        """Test the token lookup runs once"""
+        self.client.get(RECIPES_URL)
+        hits = token_cache.stats()['hits']
+        # The ETag version lookup and the recipes, no token lookup
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
+
+    def test_deleted_token_is_rejected(self):
+        """Test a cached token stops working once deleted"""
+        self.client.get(RECIPES_URL)
+        self.token.delete()
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test a cached user stops working once deactivated"""
+        self.client.get(RECIPES_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """Test changing the password through the API drops the entry"""
+        self.client.get(ME_URL)
+        res = self.client.patch(ME_URL, {'password': 'newpass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(token_cache.stats()['size'], 0)
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.stats()['size'], 1)
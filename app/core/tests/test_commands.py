@@ -1,9 +1,13 @@
-from unittest.mock import patch
+from io import StringIO
+from unittest.mock import AsyncMock, patch
 from psycopg2 import OperationalError as Psycopg2Error
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import SimpleTestCase
 
+from core.management.commands.serve import plan_workers
+
 
 class TestCommands(SimpleTestCase):
     """
@@ -34,3 +38,86 @@ class TestCommands(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('core.management.commands.benchmark_async._fetch',
+           new_callable=AsyncMock)
+    def test_benchmark_async(self, patched_fetch):
+        """
+        Test benchmarking the sync and async list views
+        """
+        patched_fetch.side_effect = [200] * 7 + [500] + [200] * 8
+        out = StringIO()
+
+        call_command('benchmark_async', token='key', requests=8,
+                     concurrency=3, page_size=10, stdout=out)
+
+        self.assertEqual(patched_fetch.call_count, 16)
+        patched_fetch.assert_called_with(
+            '127.0.0.1', 8000, '/api/contact/async/contacts/?page_size=10',
+            'key')
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[1].split()[0], 'sync')
+        self.assertEqual(lines[1].split()[-1], '1')
+        self.assertEqual(lines[2].split()[0], 'async')
+        self.assertEqual(lines[2].split()[-1], '0')
+
+    def test_plan_workers(self):
+        """
+        Test sizing the server from CPUs and database connections
+        """
+        self.assertEqual(plan_workers(4, 100), (9, 4))
+        self.assertEqual(plan_workers(4, 100, pool_size=20), (5, 20))
+        self.assertEqual(plan_workers(4, 100, pool_size=10, asgi=True),
+                         (9, 1))
+        self.assertEqual(plan_workers(4, 3), (1, 3))
+
+    def test_plan_workers_over_the_connections(self):
+        """
+        Test pools over the connection budget and ASGI without a pool
+        are refused
+        """
+        with self.assertRaisesMessage(CommandError, 'exceeds'):
+            plan_workers(64, 10, pool_size=20)
+        with self.assertRaisesMessage(CommandError, 'DB_POOL'):
+            plan_workers(4, 100, asgi=True)
+
+    @patch('core.management.commands.serve.ServeApplication')
+    @patch('os.cpu_count', return_value=2)
+    def test_serve(self, patched_cpu_count, patched_application):
+        """
+        Test the server is started preloaded with recycled workers
+        """
+        call_command('serve', max_requests=500, stdout=StringIO())
+
+        config = patched_application.call_args.args[0]
+        self.assertEqual(config['workers'], 5)
+        self.assertEqual(config['worker_class'], 'gthread')
+        self.assertTrue(config['preload_app'])
+        self.assertEqual(config['max_requests'], 500)
+        patched_application.return_value.run.assert_called_once_with()
+
+    @patch('core.management.commands.serve.ServeApplication')
+    def test_serve_dry_run(self, patched_application):
+        """
+        Test printing the server configuration without starting it
+        """
+        out = StringIO()
+
+        with patch('core.management.commands.serve._pool_size',
+                   return_value=10):
+            call_command('serve', asgi=True, workers=3, dry_run=True,
+                         stdout=out)
+
+        self.assertIn('workers=3', out.getvalue())
+        self.assertIn('worker_class=uvicorn.workers.UvicornWorker',
+                      out.getvalue())
+        patched_application.assert_not_called()
+
+    def test_serve_over_the_connections(self):
+        """
+        Test workers set over the connection budget are refused
+        """
+        with self.assertRaisesMessage(CommandError, '40 connections'):
+            call_command('serve', workers=10, threads=4,
+                         max_db_connections=20, dry_run=True,
+                         stdout=StringIO())
@@ -0,0 +1,132 @@
+"""
+Tests for ETag / conditional GET support
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Contact, Email, Recipe, ResourceVersion
+
+CONTACTS_URL = reverse('contact:contact-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def contact_url(contact_id):
+    return reverse('contact:contact-detail', args=[contact_id])
+
+
+class ConditionalGetTests(TestCase):
+    """Test list/retrieve answer 304 until a write happens"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.contact = Contact.objects.create(
+            user=self.user, first_name='Jane', last_name='Doe')
+        self.email = Email.objects.create(
+            contact=self.contact, email='jane@example.com')
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_not_modified_skips_queryset(self):
+        """Test a current ETag gets a 304 from a single version lookup"""
+        res = self.get(CONTACTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.get(CONTACTS_URL, etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertFalse(res.content)
+
+    def test_etag_depends_on_url(self):
+        """Test list pages and details get their own ETags"""
+        list_etag = self.get(CONTACTS_URL)['ETag']
+        detail_etag = self.get(contact_url(self.contact.id))['ETag']
+
+        self.assertNotEqual(list_etag, detail_etag)
+        res = self.get(contact_url(self.contact.id), list_etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_nested_update_changes_etag(self):
+        """Test updating a contact's children invalidates its ETags"""
+        list_etag = self.get(CONTACTS_URL)['ETag']
+        detail_etag = self.get(contact_url(self.contact.id))['ETag']
+
+        self.client.patch(
+            contact_url(self.contact.id),
+            {'emails': [{'id': self.email.id, 'email': 'new@example.com'}]},
+            format='json')
+
+        res = self.get(CONTACTS_URL, list_etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], list_etag)
+        res = self.get(contact_url(self.contact.id), detail_etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['emails'][0]['email'], 'new@example.com')
+
+    def test_writes_are_scoped_to_resource_and_user(self):
+        """Test recipe writes and other users keep contact ETags valid"""
+        etag = self.get(CONTACTS_URL)['ETag']
+
+        self.client.post(RECIPES_URL, {
+            'title': 'Soup', 'time_minutes': 5, 'price': Decimal('1.00')})
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='testpass123')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        other_client.post(CONTACTS_URL, {
+            'first_name': 'John', 'last_name': 'Doe'}, format='json')
+
+        res = self.get(CONTACTS_URL, etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_recipe_delete_changes_etag(self):
+        """Test deleting a recipe invalidates the recipe list ETag"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('1.00'))
+        etag = self.get(RECIPES_URL)['ETag']
+
+        self.client.delete(reverse('recipe:recipe-detail', args=[recipe.id]))
+
+        res = self.get(RECIPES_URL, etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_writes_outside_the_api_change_etag(self):
+        """Test ORM writes, like those of the admin and commands, and
+        writes to children invalidate the ETags"""
+        writes = [
+            lambda: Contact.objects.filter(pk=self.contact.pk).update(
+                first_name='Ann'),
+            lambda: Email.objects.create(
+                contact=self.contact, email='ann@example.com'),
+            lambda: Email.objects.filter(pk=self.email.pk).delete(),
+            lambda: Contact.objects.create(
+                user=self.user, first_name='John', last_name='Doe'),
+        ]
+        for write in writes:
+            etag = self.get(CONTACTS_URL)['ETag']
+            write()
+            res = self.get(CONTACTS_URL, etag)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_user_with_rows_can_be_deleted(self):
+        """Test versions bumped while deleting a user are deleted too"""
+        Recipe.objects.create(user=self.user, title='Soup', time_minutes=5,
+                              price=Decimal('1.00'))
+
+        self.user.delete()
+
+        self.assertFalse(Contact.objects.exists())
+        self.assertFalse(ResourceVersion.objects.exists())
@@ -0,0 +1,104 @@
+"""
+Tests for password hashing in the hashing pool
+"""
+import threading
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.signals import user_login_failed
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import Throttled
+
+from core import hashing
+from core.hashing import HashingPool
+
+
+class HashingPoolTests(SimpleTestCase):
+    """Test the hashing pool admission"""
+
+    def test_rejects_calls_beyond_max_pending(self):
+        pool = HashingPool(workers=1, max_pending=1)
+        release = threading.Event()
+        running = pool.submit(release.wait)
+
+        with self.assertRaises(Throttled):
+            pool.submit(str, 'x')
+        release.set()
+        running.result()
+
+        self.assertEqual(pool.run(str, 'x'), 'x')
+        self.assertEqual(pool.stats()['submitted'], 2)
+        self.assertEqual(pool.stats()['rejected'], 1)
+
+    async def test_arun(self):
+        pool = HashingPool(workers=1, max_pending=1)
+
+        self.assertEqual(await pool.arun(str, 'x'), 'x')
+        self.assertEqual(await pool.arun(str, 'y'), 'y')
+
+
+class AuthenticateUserTests(TestCase):
+    """Test checking credentials in the hashing pool"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='pass123')
+
+    def test_authenticate_user(self):
+        self.assertEqual(
+            hashing.authenticate_user('test@example.com', 'pass123'),
+            self.user)
+        self.assertIsNone(
+            hashing.authenticate_user('test@example.com', 'wrong'))
+        self.assertIsNone(
+            hashing.authenticate_user('other@example.com', 'pass123'))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(
+            hashing.authenticate_user('test@example.com', 'pass123'))
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ])
+    def test_outdated_hashes_are_upgraded(self):
+        hashing.authenticate_user('test@example.com', 'pass123')
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertTrue(check_password('pass123', self.user.password))
+
+    def test_failed_sign_ins_are_signalled(self):
+        failures = []
+
+        def receiver(credentials, **kwargs):
+            failures.append(credentials)
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        hashing.authenticate_user('test@example.com', 'wrong')
+        async_to_sync(hashing.aauthenticate_user)(
+            'other@example.com', 'pass123')
+
+        self.assertEqual([credentials['username'] for credentials in failures],
+                         ['test@example.com', 'other@example.com'])
+        self.assertNotIn('pass123', failures[1].values())
+
+    def test_async_authenticate_user(self):
+        aauthenticate = async_to_sync(hashing.aauthenticate_user)
+        user = aauthenticate('test@example.com', 'pass123')
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(user.backend, 'core.hashing.HashingPoolBackend')
+        self.assertIsNone(aauthenticate('test@example.com', 'wrong'))
+
+    @override_settings(AUTHENTICATION_BACKENDS=[
+        'django.contrib.auth.backends.ModelBackend'])
+    def test_configured_backends_are_used(self):
+        for authenticate in [hashing.authenticate_user,
+                             async_to_sync(hashing.aauthenticate_user)]:
+            user = authenticate('test@example.com', 'pass123')
+            self.assertEqual(
+                user.backend, 'django.contrib.auth.backends.ModelBackend')
@@ -0,0 +1,147 @@
+"""
+Tests for the request metrics middleware and endpoint
+"""
+import re
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.metrics import RequestMetrics, ViewMetrics, view_metrics
+from core.models import Contact, Email
+
+CONTACTS_URL = reverse('contact:contact-list')
+ASYNC_CONTACTS_URL = reverse('contact:contact-async-list')
+METRICS_URL = reverse('metrics')
+
+SERVER_TIMING = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", '
+    r'serialize;dur=([\d.]+), total;dur=([\d.]+)')
+
+
+class ViewMetricsTests(SimpleTestCase):
+    """Test the rolling percentiles of a view"""
+
+    def test_percentiles_of_the_window(self):
+        metrics = ViewMetrics(window=100)
+        for i in range(150):
+            sample = RequestMetrics()
+            sample.total_time = (i + 1) / 1000
+            sample.queries = i % 4
+            metrics.add('GET contact:contact-list', sample)
+
+        stats = metrics.stats()['GET contact:contact-list']
+
+        self.assertEqual(stats['requests'], 150)
+        self.assertEqual(stats['samples'], 100)
+        self.assertEqual(stats['total_ms'],
+                         {'p50': 100, 'p95': 145, 'p99': 149})
+        self.assertEqual(stats['queries']['p99'], 3)
+
+
+# Children are prefetched and serialized rather than read from documents
+@override_settings(CONTACT_DOCUMENTS=False)
+class RequestMetricsTests(TestCase):
+    """Test requests are measured"""
+
+    def setUp(self):
+        view_metrics.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            contact = Contact.objects.create(
+                user=self.user, first_name=f'Jane{i}', last_name='Doe')
+            Email.objects.create(contact=contact, email=f'{i}@example.com')
+
+    def test_server_timing_header(self):
+        """Test responses carry their query count and timings"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(CONTACTS_URL)
+
+        match = SERVER_TIMING.fullmatch(res['Server-Timing'])
+        self.assertIsNotNone(match, res['Server-Timing'])
+        self.assertEqual(int(match[1]), len(queries))
+        self.assertGreater(float(match[2]), 0)
+        self.assertGreaterEqual(float(match[3]), float(match[2]))
+
+    def test_async_requests_are_measured(self):
+        """Test async views are measured like sync ones"""
+        token = Token.objects.create(user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            res = async_to_sync(self.async_client.get)(
+                ASYNC_CONTACTS_URL,
+                headers={'Authorization': f'Token {token.key}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        match = SERVER_TIMING.fullmatch(res['Server-Timing'])
+        self.assertIsNotNone(match, res['Server-Timing'])
+        self.assertEqual(int(match[1]), len(queries))
+
+    def test_connection_wrappers_are_restored(self):
+        """Test requests leave the execute wrappers of connections as
+        they found them"""
+        def wrapper(execute, *args):
+            return execute(*args)
+
+        token = Token.objects.create(user=self.user)
+        with connection.execute_wrapper(wrapper):
+            self.client.get(CONTACTS_URL)
+            async_to_sync(self.async_client.get)(
+                ASYNC_CONTACTS_URL,
+                headers={'Authorization': f'Token {token.key}'})
+            self.assertEqual(connection.execute_wrappers, [wrapper])
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_asgi_chain_is_not_adapted(self):
+        """Test the middleware doesn't put async requests on a thread"""
+        # Adaptations are logged in debug mode
+        with override_settings(DEBUG=True), \
+                self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    def test_slow_requests_are_logged_with_their_sql(self):
+        """Test requests over SLOW_REQUEST_MS are logged"""
+        with override_settings(SLOW_REQUEST_MS=0), \
+                self.assertLogs('core.metrics', 'WARNING') as logs:
+            self.client.get(CONTACTS_URL)
+
+        self.assertIn(f'Slow request GET {CONTACTS_URL} (200)',
+                      logs.output[0])
+        self.assertIn('FROM "core_email"', logs.output[0])
+
+    def test_fast_requests_are_not_logged(self):
+        """Test requests under SLOW_REQUEST_MS are not logged"""
+        with override_settings(SLOW_REQUEST_MS=60000), \
+                self.assertNoLogs('core.metrics', 'WARNING'):
+            self.client.get(CONTACTS_URL)
+
+    def test_metrics_requires_staff(self):
+        """Test the metrics endpoint is for staff users only"""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_per_view(self):
+        """Test staff read the percentiles of each view"""
+        self.client.get(CONTACTS_URL)
+        self.client.get(CONTACTS_URL)
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        stats = res.data['views']['GET contact:contact-list']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(set(stats['total_ms']), {'p50', 'p95', 'p99'})
+        self.assertEqual(set(res.data),
+                         {'views', 'token_cache', 'db_pools', 'hashing'})
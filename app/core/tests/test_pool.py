@@ -0,0 +1,162 @@
+"""
+Tests for the pooled PostgreSQL backend
+"""
+import threading
+from unittest.mock import patch
+
+import psycopg2
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from psycopg2 import extensions
+
+from core.backends.postgresql.base import DatabaseWrapper
+from core.backends.postgresql.pool import ConnectionPool, PoolTimeout
+
+
+class FakeInfo:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    autocommit = True
+
+    def __init__(self):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the connection pool"""
+
+    def setUp(self):
+        self.pool = ConnectionPool(min_size=1, max_size=2, timeout=0.05)
+
+    def test_reuses_returned_connections(self):
+        first = self.pool.getconn(FakeConnection)
+        self.pool.putconn(first)
+
+        self.assertIs(self.pool.getconn(FakeConnection), first)
+        stats = self.pool.stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['in_use'], 1)
+        self.assertEqual(stats['saturation'], 0.5)
+        self.assertEqual(stats['requests'], 2)
+
+    def test_times_out_when_exhausted(self):
+        self.pool.getconn(FakeConnection)
+        self.pool.getconn(FakeConnection)
+
+        with self.assertRaises(PoolTimeout):
+            self.pool.getconn(FakeConnection)
+        stats = self.pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreaterEqual(stats['max_wait_time'], 0.05)
+        self.assertEqual(stats['saturation'], 1)
+
+    def test_waits_for_a_returned_connection(self):
+        self.pool.timeout = 5
+        first = self.pool.getconn(FakeConnection)
+        self.pool.getconn(FakeConnection)
+        timer = threading.Timer(0.05, self.pool.putconn, [first])
+        timer.start()
+
+        self.assertIs(self.pool.getconn(FakeConnection), first)
+        timer.join()
+        self.assertEqual(self.pool.stats()['waits'], 1)
+
+    def test_rolls_back_or_discards_returned_connections(self):
+        in_transaction = self.pool.getconn(FakeConnection)
+        in_transaction.info.transaction_status = \
+            extensions.TRANSACTION_STATUS_INTRANS
+        broken = self.pool.getconn(FakeConnection)
+        broken.info.transaction_status = \
+            extensions.TRANSACTION_STATUS_UNKNOWN
+
+        self.pool.putconn(in_transaction)
+        self.pool.putconn(broken)
+
+        self.assertEqual(in_transaction.rollbacks, 1)
+        self.assertTrue(broken.closed)
+        self.assertEqual(self.pool.stats()['size'], 1)
+
+    def test_failed_connect_frees_the_slot(self):
+        def connect():
+            raise psycopg2.OperationalError
+
+        with self.assertRaises(psycopg2.OperationalError):
+            self.pool.getconn(connect)
+        self.assertEqual(self.pool.stats()['size'], 0)
+
+    def test_health_check_replaces_dead_connections(self):
+        dead = self.pool.getconn(FakeConnection)
+        self.pool.putconn(dead)
+
+        with patch.object(ConnectionPool, '_is_usable', return_value=False):
+            fresh = self.pool.getconn(FakeConnection, check=True)
+        self.assertIsNot(fresh, dead)
+        self.assertTrue(dead.closed)
+        self.assertEqual(self.pool.stats()['size'], 1)
+
+    def test_closes_idle_connections_above_min_size(self):
+        first = self.pool.getconn(FakeConnection)
+        second = self.pool.getconn(FakeConnection)
+        self.pool.putconn(first)
+        self.pool.putconn(second)
+        self.pool.max_idle = 0
+
+        self.assertIs(self.pool.getconn(FakeConnection), second)
+        self.assertTrue(first.closed)
+        self.assertEqual(self.pool.stats()['size'], 1)
+
+
+class PooledBackendTests(TestCase):
+    """Test the pooled database backend"""
+
+    def setUp(self):
+        settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'core.backends.postgresql',
+            'CONN_HEALTH_CHECKS': True,
+            # A pool of its own, apart from the one of the test run
+            'OPTIONS': {'pool': {'max_size': 1},
+                        'application_name': 'pooled_backend_test'},
+        }
+        self.wrapper = DatabaseWrapper(settings_dict)
+
+    def tearDown(self):
+        self.wrapper.close()
+        self.wrapper.get_pool().close()
+
+    def backend_pid(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_connections_are_reused(self):
+        pid = self.backend_pid()
+        self.wrapper.close()
+
+        self.assertEqual(self.backend_pid(), pid)
+        stats = self.wrapper.get_pool().stats()
+        self.assertEqual(stats['max_size'], 1)
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_open_transaction_is_rolled_back(self):
+        self.wrapper.set_autocommit(False)
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE pooled_test (id int)')
+        self.wrapper.close()
+
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pooled_test')")
+            self.assertIsNone(cursor.fetchone()[0])
@@ -0,0 +1,104 @@
+"""
+Tests for bulk user provisioning and the provision_users command
+"""
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model, hashers
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.provisioning import hash_passwords, provision_users
+
+
+class ProvisioningTests(TestCase):
+    """Test hashing passwords and creating users in bulk"""
+
+    def test_hash_passwords_in_processes(self):
+        """Test hashes from the process pool match their passwords"""
+        passwords = ['first-pass', None, 'second-pass', 'third-pass']
+
+        hashes = hash_passwords(passwords, workers=2)
+
+        self.assertEqual(len(hashes), 4)
+        self.assertFalse(hashers.is_password_usable(hashes[1]))
+        for password, encoded in zip(passwords, hashes):
+            if password is not None:
+                self.assertTrue(hashers.check_password(password, encoded))
+
+    def test_provision_users(self):
+        """Test users are created with tokens, taken emails skipped"""
+        get_user_model().objects.create_user(
+            'taken@example.com', 'testpass123')
+
+        created, existing = provision_users([
+            {'email': 'new@EXAMPLE.com', 'name': 'New',
+             'password': 'newpass123'},
+            {'email': 'taken@example.com', 'password': 'otherpass'},
+            {'email': 'nopass@example.com'},
+        ], workers=1, batch_size=1)
+
+        self.assertEqual(existing, ['taken@example.com'])
+        self.assertEqual([user.email for user in created],
+                         ['new@example.com', 'nopass@example.com'])
+        user = get_user_model().objects.get(email='new@example.com')
+        self.assertEqual(user.name, 'New')
+        self.assertTrue(user.check_password('newpass123'))
+        self.assertEqual(user.auth_token.key, created[0].auth_token.key)
+        self.assertFalse(get_user_model().objects.get(
+            email='nopass@example.com').has_usable_password())
+
+    def test_emails_taken_while_provisioning(self):
+        """Test emails taken after the check are skipped, not errors"""
+        get_user_model().objects.create_user(
+            'taken@example.com', 'testpass123')
+
+        # The sign-up happens between the check and the insert
+        with patch('core.provisioning._taken',
+                   side_effect=[set(), {'taken@example.com'}]):
+            created, existing = provision_users([
+                {'email': 'new@example.com'},
+                {'email': 'taken@example.com'},
+            ], workers=1)
+
+        self.assertEqual(existing, ['taken@example.com'])
+        self.assertEqual([user.email for user in created],
+                         ['new@example.com'])
+        self.assertEqual(get_user_model().objects.count(), 2)
+
+
+class ProvisionUsersCommandTests(TestCase):
+    """Test the provision_users command"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'users.csv'
+
+    def test_provision_users_from_csv(self):
+        """Test a user is created per row and its token printed"""
+        self.path.write_text('email,name,password\n'
+                             'a@example.com,A,apass123\n'
+                             'b@example.com,,\n')
+        out = StringIO()
+
+        call_command('provision_users', str(self.path), workers=1,
+                     verbosity=2, stdout=out)
+
+        user = get_user_model().objects.get(email='a@example.com')
+        self.assertTrue(user.check_password('apass123'))
+        self.assertIn(f'a@example.com {user.auth_token.key}',
+                      out.getvalue())
+        self.assertIn('Created 2 users, skipped 0', out.getvalue())
+
+    def test_missing_email(self):
+        """Test rows without an email are refused"""
+        self.path.write_text('email,name\n,Nobody\n')
+
+        with self.assertRaisesMessage(CommandError, 'Line 2'):
+            call_command('provision_users', str(self.path),
+                         stdout=StringIO())
+        self.assertFalse(get_user_model().objects.exists())
@@ -0,0 +1,176 @@
+"""
+Query plan regression tests for the owner scoped list endpoints
+"""
+from decimal import Decimal
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Contact, Email, PhoneNumber, Recipe, SocialMediaLink
+from core.tests.utils import QueryPlanTestCase, walk_plan
+from recipe.filters import ORDERINGS
+
+CONTACTS_URL = reverse('contact:contact-list')
+CONTACTS_EXPORT_URL = reverse('contact:contact-export-contacts')
+CONTACTS_SYNC_URL = reverse('contact:contact-sync')
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_EXPORT_URL = reverse('recipe:recipe-export-recipes')
+RECIPES_STATS_URL = reverse('recipe:recipe-stats')
+ADMIN_SEARCHES = [
+    ('admin:core_email_changelist', '1@example', 'email'),
+    ('admin:core_phonenumber_changelist', '555', 'phone_number'),
+    ('admin:core_socialmedialink_changelist', 'https://example', 'link'),
+]
+
+USERS = 10
+ROWS_PER_USER = 120
+
+
+class OwnerScopedPlanTests(QueryPlanTestCase):
+    """Test list queries use the (user_id, id DESC) indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [get_user_model().objects.create_user(
+            email=f'user{i}@example.com', password='testpass123')
+            for i in range(USERS)]
+        cls.user = users[0]
+        # Rows of different owners are interleaved like in production,
+        # so the primary key order alone doesn't group a user's rows.
+        contacts = Contact.objects.bulk_create(
+            Contact(user=user, first_name=f'John {i}', last_name='Doe')
+            for i in range(ROWS_PER_USER) for user in users)
+        Email.objects.bulk_create(
+            Email(contact=contact, email=f'{contact.id}@example.com')
+            for contact in contacts)
+        PhoneNumber.objects.bulk_create(
+            PhoneNumber(contact=contact, phone_number='1234567890')
+            for contact in contacts)
+        SocialMediaLink.objects.bulk_create(
+            SocialMediaLink(contact=contact, platform_name='Twitter',
+                            link='https://twitter.com/johndoe',
+                            tag='personal')
+            for contact in contacts)
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'Recipe {i}', time_minutes=i,
+                   price=Decimal('5.00'))
+            for i in range(ROWS_PER_USER) for user in users)
+        cls.analyze(Contact, Email, PhoneNumber, SocialMediaLink, Recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_contact_list_plans(self):
+        """Test contact list pages and prefetches are index scans"""
+        res = self.assertIndexedQueries(self.client.get, CONTACTS_URL)
+        self.assertIndexedQueries(self.client.get, res.data['next'])
+
+    def test_contact_search_plans(self):
+        """Test contact search pages are scoped by the owner indexes"""
+        for text in ['john', 'jhon doe', '1@example', '12345']:
+            res = self.assertIndexedQueries(
+                self.client.get, CONTACTS_URL, {'q': text}, allow_sort=True)
+            self.assertTrue(res.data['results'])
+        res = self.assertIndexedQueries(
+            self.client.get, CONTACTS_URL, {'q': 'john'}, allow_sort=True)
+        self.assertIndexedQueries(
+            self.client.get, res.data['next'], allow_sort=True)
+
+    def test_contact_search_predicates_are_indexed(self):
+        """Test the search conditions are served by the GIN indexes"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(CONTACTS_URL, {'q': 'jhon'})
+        sql, = [query['sql'] for query in queries
+                if 'search_vector' in query['sql']]
+        # Small owners are searched through their rows, drop the owner
+        # indexes (rolled back with the test) to see the GIN index paths.
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX contact_user_id_desc_idx')
+            cursor.execute('DROP INDEX core_contact_user_id_2570c512')
+            cursor.execute('DROP INDEX contact_user_sync_idx')
+        conditions = [node.get('Index Cond', '')
+                      for node in walk_plan(self.explain(sql))]
+        self.assertTrue(any('search_vector @@' in condition
+                            for condition in conditions))
+        for name in ['first_name', 'last_name']:
+            self.assertTrue(any(f'upper(({name})::text) %' in condition
+                                for condition in conditions))
+
+    @skipIf(connection.settings_dict['DISABLE_SERVER_SIDE_CURSORS'],
+            'Exports read the whole result without server-side cursors')
+    def test_contact_export_plans(self):
+        """Test the contact export is an index scan"""
+        res = self.client.get(CONTACTS_EXPORT_URL)
+        self.assertIndexedQueries(lambda: b''.join(res.streaming_content))
+
+    def test_contact_sync_plans(self):
+        """Test sync pages are ranges of the (user_id, updated_at, id)
+        index"""
+        res = self.assertIndexedQueries(
+            self.client.get, CONTACTS_SYNC_URL, {'page_size': 50})
+        self.assertIndexedQueries(self.client.get, res.data['next'])
+
+    def test_recipe_list_plans(self):
+        """Test recipe list pages are index scans"""
+        res = self.assertIndexedQueries(self.client.get, RECIPES_URL)
+        self.assertIndexedQueries(self.client.get, res.data['next'])
+
+    def test_recipe_filter_and_sort_plans(self):
+        """Test each recipe filter and sort combination is indexed"""
+        filters = [{}, {'min_price': '1.00', 'max_price': '9.00'},
+                   {'min_time': 10, 'max_time': 60}, {'title': 'recipe 1'},
+                   {'min_price': '1.00', 'min_time': 10,
+                    'title': 'Recipe'}]
+        for params in filters:
+            for ordering in ORDERINGS:
+                with self.subTest(ordering=ordering, **params):
+                    res = self.assertIndexedQueries(
+                        self.client.get, RECIPES_URL,
+                        {'ordering': ordering, 'page_size': 5, **params})
+                    self.assertTrue(res.data['results'])
+                    if res.data['next']:
+                        self.assertIndexedQueries(
+                            self.client.get, res.data['next'])
+
+    def test_recipe_stats_plan(self):
+        """Test recipe statistics aggregate an index scan of the owner"""
+        cache.clear()
+        self.assertIndexedQueries(self.client.get, RECIPES_STATS_URL)
+
+    @skipIf(connection.settings_dict['DISABLE_SERVER_SIDE_CURSORS'],
+            'Exports read the whole result without server-side cursors')
+    def test_recipe_export_plans(self):
+        """Test the recipe export is an index scan"""
+        res = self.client.get(RECIPES_EXPORT_URL)
+        self.assertIndexedQueries(lambda: b''.join(res.streaming_content))
+
+    def test_admin_search_plans(self):
+        """Test admin changelist searches are served by the indexes"""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testpass123')
+        self.client.force_login(admin)
+        # Searches matching few of the rows, like searches of large tables
+        contact = Contact.objects.filter(user=self.user).first()
+        PhoneNumber.objects.create(contact=contact, phone_number='5550100')
+        SocialMediaLink.objects.create(
+            contact=contact, platform_name='Web', tag='personal',
+            link='https://example.com/johndoe')
+        for url, text, column in ADMIN_SEARCHES:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    res = self.client.get(reverse(url), {'q': text})
+                self.assertContains(res, text)
+                sql = [query['sql'] for query in queries
+                       if ' LIKE ' in query['sql'] and
+                       query['sql'].startswith('SELECT')][-1]
+                conditions = [node.get('Index Cond', '')
+                              for node in walk_plan(self.explain(sql))]
+                self.assertTrue(
+                    any(f'upper(({column})::text) ~>=~' in condition
+                        for condition in conditions), conditions)
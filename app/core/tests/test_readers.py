@@ -0,0 +1,101 @@
+"""
+Tests for the compiled serializer readers
+"""
+from decimal import Decimal
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from contact.serializers import ContactSerializer
+from core.models import Contact, Email, PhoneNumber, Recipe, SocialMediaLink
+from core.planner import plan_queryset
+from core.readers import get_reader
+from recipe.serializers import RecipeDetailsSerializer, RecipeSerializer
+
+
+class ContactNameSerializer(serializers.ModelSerializer):
+    name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Contact
+        fields = ['id', 'name']
+
+    def get_name(self, contact):
+        return f'{contact.first_name} {contact.last_name}'
+
+
+class ReaderTests(TestCase):
+    """Test readers render the same JSON as their serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123')
+        jane = Contact.objects.create(
+            user=self.user, first_name='Jane', last_name='Doe')
+        Email.objects.create(contact=jane, email='jane@example.com')
+        Email.objects.create(contact=jane, email='jane@example.org')
+        PhoneNumber.objects.create(contact=jane, phone_number='+15551234')
+        SocialMediaLink.objects.create(
+            contact=jane, platform_name='GitHub',
+            link='https://github.com/jane', tag='dev')
+        Contact.objects.create(
+            user=self.user, first_name='John', last_name='Ünicode "quoted"')
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10,
+            price=Decimal('5.50'), description='Hot')
+        Recipe.objects.create(
+            user=self.user, title='Bread', time_minutes=60,
+            price=Decimal('2'), link='https://example.com/bread')
+
+    def assertSameJSON(self, serializer_class):
+        serializer = serializer_class()
+        reader = get_reader(serializer)
+        queryset = serializer_class.Meta.model.objects.filter(
+            user=self.user).order_by('-id')
+        expected = JSONRenderer().render(serializer_class(
+            plan_queryset(queryset, serializer), many=True).data)
+
+        rows = list(reader.values(plan_queryset(queryset, serializer)))
+        with self.assertNumQueries(len(reader.relations)):
+            self.assertEqual(
+                JSONRenderer().render(reader.render(rows)), expected)
+        self.assertEqual(JSONRenderer().render(
+            async_to_sync(reader.arender)(rows)), expected)
+
+    def test_contact_parity(self):
+        """Test contacts with and without children render the same"""
+        self.assertSameJSON(ContactSerializer)
+
+    def test_recipe_parity(self):
+        """Test recipes (decimal prices, blank links) render the same"""
+        self.assertSameJSON(RecipeSerializer)
+        self.assertSameJSON(RecipeDetailsSerializer)
+
+    def test_empty_page(self):
+        """Test rendering no rows runs no query"""
+        reader = get_reader(ContactSerializer())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(reader.render([]), [])
+
+    def test_uncompilable_serializer(self):
+        """Test serializers with method fields have no reader"""
+        self.assertIsNone(get_reader(ContactNameSerializer()))
+
+    def test_benchmark_serializers(self):
+        """Test the benchmark checks parity and leaves no rows behind"""
+        out = StringIO()
+
+        call_command('benchmark_serializers', rows=20, repeat=1, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]],
+                         ['contact', 'recipe'])
+        self.assertEqual(Contact.objects.count(), 2)
+        self.assertFalse(get_user_model().objects.filter(
+            email__startswith='benchmark-serializers').exists())
@@ -0,0 +1,84 @@
+"""
+Tests for the synthetic data seeder and the benchmark suite
+"""
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Contact, Email, PhoneNumber, Recipe, SocialMediaLink
+from core.seeding import DEFAULT_PASSWORD
+
+SCENARIOS = ['contact-list', 'contact-nested-update', 'recipe-create']
+
+
+class SeedDataTests(TestCase):
+    """Test the seed_data command"""
+
+    def test_seed_data(self):
+        """Test users are created with their contacts and recipes"""
+        call_command('seed_data', users=3, contacts=4, channels=2,
+                     recipes=5, prefix='load', stdout=StringIO())
+
+        users = get_user_model().objects.filter(email__startswith='load-')
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Contact.objects.count(), 12)
+        self.assertEqual(Email.objects.count(), 24)
+        self.assertEqual(PhoneNumber.objects.count(), 24)
+        self.assertEqual(SocialMediaLink.objects.count(), 24)
+        self.assertEqual(Recipe.objects.count(), 15)
+        user = users.first()
+        self.assertTrue(user.check_password(DEFAULT_PASSWORD))
+        self.assertTrue(user.auth_token.key)
+
+    def test_seed_data_twice(self):
+        """Test seeding again doesn't collide with earlier users"""
+        for _ in range(2):
+            call_command('seed_data', users=2, contacts=0, recipes=0,
+                         stdout=StringIO())
+
+        self.assertEqual(get_user_model().objects.count(), 4)
+
+
+class BenchmarkTests(TestCase):
+    """Test the benchmark command"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.baseline = Path(directory.name) / 'baseline.json'
+
+    def benchmark(self, **options):
+        out = StringIO()
+        call_command('benchmark', contacts=3, recipes=3, iterations=2,
+                     scenario=SCENARIOS, baseline=self.baseline,
+                     stdout=out, **options)
+        return out.getvalue().splitlines()
+
+    def test_save_and_compare_baseline(self):
+        """Test results are saved, then compared with the baseline"""
+        self.benchmark(save_baseline=True)
+        baseline = json.loads(self.baseline.read_text())
+
+        self.assertEqual(sorted(baseline), sorted(SCENARIOS))
+        self.assertEqual(set(baseline['contact-list']),
+                         {'p50_ms', 'p95_ms', 'p99_ms', 'queries'})
+        lines = self.benchmark(tolerance=1000)
+        self.assertEqual([line.split()[-1] for line in lines[1:]],
+                         ['ok'] * len(SCENARIOS))
+        self.assertEqual(Contact.objects.count(), 0)
+
+    def test_query_regression_fails(self):
+        """Test running more queries than the baseline fails"""
+        self.benchmark(save_baseline=True)
+        baseline = json.loads(self.baseline.read_text())
+        baseline['contact-list']['queries'] -= 1
+        self.baseline.write_text(json.dumps(baseline))
+
+        with self.assertRaisesMessage(CommandError, '1 scenario(s)'):
+            self.benchmark(tolerance=1000)
@@ -0,0 +1,133 @@
+"""
+Tests for the updated_at and tombstone triggers and the sync watermark
+"""
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from core.models import Contact, Email, PhoneNumber, Recipe, Tombstone
+from core.sync import get_changes
+
+
+def create_user(email='user@example.com'):
+    return get_user_model().objects.create_user(email, 'testpass123')
+
+
+class SyncTriggerTests(TransactionTestCase):
+    """Test the triggers run outside of a test transaction, so now()
+    advances with each write."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.contact = Contact.objects.create(
+            user=self.user, first_name='Ada', last_name='Lovelace')
+
+    def updated_at(self, instance):
+        return type(instance).objects.values_list(
+            'updated_at', flat=True).get(pk=instance.pk)
+
+    def test_updated_at_set_on_write(self):
+        """Test inserts and any kind of update stamp the row."""
+        created = self.updated_at(self.contact)
+        self.assertEqual(self.contact.updated_at, created)
+
+        Contact.objects.filter(pk=self.contact.pk).update(first_name='Ava')
+        updated = self.updated_at(self.contact)
+        self.assertGreater(updated, created)
+
+        self.contact.save()
+        self.assertGreater(self.updated_at(self.contact), updated)
+
+    def test_child_writes_touch_contact(self):
+        """Test writes to emails and phone numbers touch their contact."""
+        before = self.updated_at(self.contact)
+        email = Email.objects.create(contact=self.contact,
+                                     email='ada@example.com')
+        after_insert = self.updated_at(self.contact)
+        self.assertGreater(after_insert, before)
+
+        PhoneNumber.objects.bulk_create([
+            PhoneNumber(contact=self.contact, phone_number='555-0100')])
+        after_bulk = self.updated_at(self.contact)
+        self.assertGreater(after_bulk, after_insert)
+
+        email.delete()
+        self.assertGreater(self.updated_at(self.contact), after_bulk)
+
+    def test_deletes_leave_tombstones(self):
+        """Test contacts and recipes deleted in any way are recorded."""
+        recipes = [Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='1.00')
+            for _ in range(2)]
+        Email.objects.create(contact=self.contact, email='ada@example.com')
+        pk = self.contact.pk
+
+        self.contact.delete()
+        Recipe.objects.filter(user=self.user).delete()
+
+        self.assertEqual(
+            sorted(Tombstone.objects.filter(user=self.user).values_list(
+                'resource', 'object_id')),
+            [('contact', pk)] +
+            [('recipe', recipe.pk) for recipe in recipes])
+
+    def test_get_changes(self):
+        """Test rows and tombstones since a watermark are reported."""
+        watermark, changed, deleted = get_changes(
+            self.user, Contact, 'contact')
+        self.assertTrue(changed)
+        self.assertEqual(deleted, [])
+
+        watermark, changed, deleted = get_changes(
+            self.user, Contact, 'contact', watermark)
+        self.assertFalse(changed)
+
+        pk = self.contact.pk
+        self.contact.delete()
+        _, changed, deleted = get_changes(
+            self.user, Contact, 'contact', watermark)
+        self.assertFalse(changed)
+        self.assertEqual(deleted, [pk])
+
+    def test_watermark_held_back_by_open_transaction(self):
+        """Test rows of a transaction open during a sync aren't skipped."""
+        other = connections.create_connection('default')
+        try:
+            other.set_autocommit(False)
+            with other.cursor() as cursor:
+                cursor.execute('SELECT now()')
+                started = cursor.fetchone()[0]
+            watermark, _, _ = get_changes(self.user, Contact, 'contact')
+            self.assertLessEqual(watermark, started)
+        finally:
+            other.close()
+
+        # The closed backend may linger in pg_stat_activity a moment.
+        for _ in range(100):
+            watermark, _, _ = get_changes(self.user, Contact, 'contact')
+            if watermark > started:
+                break
+            time.sleep(0.01)
+        self.assertGreater(watermark, started)
+
+    def test_prune_tombstones(self):
+        """Test tombstones past the retention are deleted."""
+        pk = self.contact.pk
+        self.contact.delete()
+        Tombstone.objects.create(
+            user=self.user, resource='contact', object_id=0,
+            deleted_at=timezone.now() - timedelta(days=31))
+
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+
+        self.assertIn('1 tombstones deleted', out.getvalue())
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)),
+            [pk])
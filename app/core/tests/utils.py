@@ -0,0 +1,85 @@
+"""
+Helpers for query plan tests
+"""
+import json
+import re
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+# Plan nodes that mean a table or result is scanned/sorted in full.
+FORBIDDEN_NODES = {'Seq Scan', 'Sort', 'Incremental Sort'}
+
+# Server-side cursors (QuerySet.iterator()) are logged as DECLARE ... FOR
+# and explained as such, since cursors are planned for fast first rows.
+DECLARE_CURSOR = re.compile(r'^DECLARE .+? CURSOR .*?FOR SELECT ',
+                            re.DOTALL)
+
+
+def walk_plan(node):
+    """Yield the nodes of an EXPLAIN (FORMAT JSON) plan"""
+    yield node
+    for child in node.get('Plans', []):
+        yield from walk_plan(child)
+
+
+class QueryPlanTestCase(TestCase):
+    """Base class asserting the plans of the queries an endpoint runs
+
+    Test tables are tiny, where PostgreSQL rightly prefers sequential
+    scans and sorts, so plans are made with sequential scans disabled
+    and the random_page_cost of SSD-backed production databases. A query
+    without a usable index still gets a sequential scan or a sort.
+    """
+
+    @classmethod
+    def analyze(cls, *models):
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL random_page_cost = 1.1')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def assertIndexedPlan(self, sql, owner_column='user_id',
+                          allow_sort=False):
+        """Assert a query has no full scan/sort and scopes by index
+
+        `allow_sort` permits sorting the rows found by an index, as ranked
+        search results are.
+        """
+        forbidden = FORBIDDEN_NODES - {'Sort'} if allow_sort \
+            else FORBIDDEN_NODES
+        for node in walk_plan(self.explain(sql)):
+            self.assertNotIn(
+                node['Node Type'], forbidden,
+                f'{node["Node Type"]} in plan of: {sql}')
+            # The owner filter must be part of the index condition,
+            # not a filter applied to rows read by another index.
+            self.assertNotIn(
+                owner_column, node.get('Filter', ''),
+                f'{owner_column} is filtered, not indexed, in: {sql}')
+
+    def assertIndexedQueries(self, request, *args, allow_sort=False,
+                             **kwargs):
+        """Run a request and assert the plan of each SELECT it runs"""
+        with CaptureQueriesContext(connection) as queries:
+            response = request(*args, **kwargs)
+        selects = []
+        for query in queries:
+            sql = query['sql'].strip()
+            if (sql.upper().startswith('SELECT') or
+                    DECLARE_CURSOR.match(sql)):
+                selects.append(sql)
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertIndexedPlan(sql, allow_sort=allow_sort)
+        return response
@@ -0,0 +1,25 @@
+"""
+Internal views of the core app
+"""
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .authentication import CachedTokenAuthentication, token_cache
+from .backends.postgresql.pool import pool_stats
+from .hashing import hashing_pool
+from .metrics import view_metrics
+
+
+class MetricsView(APIView):
+    """Request percentiles per view and cache/pool counters, staff only"""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'views': view_metrics.stats(),
+            'token_cache': token_cache.stats(),
+            'db_pools': pool_stats(),
+            'hashing': hashing_pool.stats(),
+        })
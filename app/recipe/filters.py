@@ -0,0 +1,57 @@
+"""
+Filters and sort orders of the recipe list
+
+Every order is served by an index on (user_id, key, id), see the Recipe
+model, and a range filter on the sort key is part of its index scan.
+Titles are filtered by prefix and sorted case insensitively, byte-wise.
+"""
+from django.db.models import F
+from django.db.models.functions import Collate, Upper
+
+from core.pagination import SortedKeysetPagination
+
+# Default order, paged by KeysetPagination on the primary key
+DEFAULT_ORDERING = '-id'
+
+# Sort keys, annotated as `sort_key` and paged by SortedKeysetPagination
+SORT_KEYS = {
+    'price': F('price'),
+    'time_minutes': F('time_minutes'),
+    # Matches the expression of recipe_user_title_idx
+    'title': Collate(Upper('title'), 'C'),
+}
+
+ORDERINGS = [DEFAULT_ORDERING] + [
+    direction + name for name in SORT_KEYS for direction in ('', '-')]
+
+
+def filter_recipes(queryset, min_price=None, max_price=None, min_time=None,
+                   max_time=None, title=None, **kwargs):
+    """Filter recipes by price and time ranges and title prefix"""
+    ranges = {'price__gte': min_price, 'price__lte': max_price,
+              'time_minutes__gte': min_time, 'time_minutes__lte': max_time}
+    queryset = queryset.filter(**{lookup: value
+                                  for lookup, value in ranges.items()
+                                  if value is not None})
+    if title:
+        queryset = queryset.alias(
+            title_key=SORT_KEYS['title']).filter(
+            title_key__startswith=title.upper())
+    return queryset
+
+
+def sort_recipes(queryset, ordering=DEFAULT_ORDERING):
+    """Order recipes, annotated with their `sort_key` unless by default"""
+    if ordering == DEFAULT_ORDERING:
+        return queryset.order_by(DEFAULT_ORDERING)
+    name = ordering.lstrip('-')
+    return queryset.annotate(sort_key=SORT_KEYS[name]).order_by(
+        ordering[:-len(name)] + 'sort_key', ordering[:-len(name)] + 'id')
+
+
+def get_paginator(ordering=DEFAULT_ORDERING):
+    """Return the paginator of an ordering, None for the default one"""
+    if ordering == DEFAULT_ORDERING:
+        return None
+    return SortedKeysetPagination(
+        'sort_key', descending=ordering.startswith('-'))
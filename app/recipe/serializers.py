@@ -2,10 +2,15 @@
 Serializers for recipes API
 """
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetMixin
+from core.metrics import TimedSerializerMixin
 from core.models import Recipe
+from .filters import DEFAULT_ORDERING, ORDERINGS
+from .stats import DEFAULT_TIME_BUCKETS, MAX_TIME_BUCKETS
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, SparseFieldsetMixin,
+                       serializers.ModelSerializer):
     """ Serializer for recipe objects """
 
     class Meta:
@@ -25,3 +30,46 @@ class RecipeDetailsSerializer(RecipeSerializer):
 
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + ['description']
+
+
+class RecipeStatsQuerySerializer(serializers.Serializer):
+    """ Query parameters of the recipe statistics """
+    time_buckets = serializers.CharField(
+        required=False,
+        help_text='Comma separated upper bounds of the time buckets.')
+
+    def validate_time_buckets(self, value):
+        """ Parse the bucket bounds, increasing whole minutes """
+        try:
+            buckets = [int(bound) for bound in value.split(',')
+                       if bound.strip()]
+        except ValueError:
+            raise serializers.ValidationError(
+                'Bucket bounds must be whole minutes.')
+        if not buckets or len(buckets) > MAX_TIME_BUCKETS:
+            raise serializers.ValidationError(
+                f'Pass 1 to {MAX_TIME_BUCKETS} bucket bounds.')
+        if min(buckets) < 0 or any(
+                low >= high for low, high in zip(buckets, buckets[1:])):
+            raise serializers.ValidationError(
+                'Bucket bounds must be positive and increasing.')
+        return buckets
+
+    def validate(self, attrs):
+        attrs.setdefault('time_buckets', DEFAULT_TIME_BUCKETS)
+        return attrs
+
+
+class RecipeListQuerySerializer(serializers.Serializer):
+    """ Filter and sort query parameters of the recipe list """
+    min_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(
+        max_digits=5, decimal_places=2, required=False)
+    min_time = serializers.IntegerField(required=False)
+    max_time = serializers.IntegerField(required=False)
+    title = serializers.CharField(
+        required=False, max_length=255,
+        help_text='Case insensitive prefix of the title.')
+    ordering = serializers.ChoiceField(
+        choices=ORDERINGS, default=DEFAULT_ORDERING)
@@ -0,0 +1,101 @@
+"""
+Price and time statistics of a user's recipes
+
+Computed by one aggregate query over the user's rows and cached by the
+user's recipe version (see `core.etags`), so a dashboard reload costs a
+cache lookup until a recipe is written or RECIPE_STATS_CACHE_TTL passed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from core.models import Recipe
+
+# Percentiles of the price reported as p25, p50...
+PRICE_PERCENTILES = [25, 50, 75, 90, 95, 99]
+# Upper bounds (exclusive) of the time_minutes histogram buckets, the
+# last bucket has no upper bound.
+DEFAULT_TIME_BUCKETS = [15, 30, 60, 120]
+MAX_TIME_BUCKETS = 20
+
+STATS_SQL = """
+SELECT count(*),
+    min(price), max(price), round(avg(price), 2),
+    (percentile_cont(%(percentiles)s::float8[])
+        WITHIN GROUP (ORDER BY price))::numeric(10, 2)[],
+    min(time_minutes), max(time_minutes), round(avg(time_minutes), 1),
+    {histogram}
+FROM {table}
+WHERE user_id = %(user_id)s
+"""
+
+BUCKET_SQL = 'count(*) FILTER (WHERE {condition})'
+
+
+def _histogram_sql(buckets):
+    """Return one count per bucket of the time_minutes histogram"""
+    bounds = [None] + list(buckets) + [None]
+    columns = []
+    for low, high in zip(bounds, bounds[1:]):
+        conditions = []
+        if low is not None:
+            conditions.append(f'time_minutes >= {int(low)}')
+        if high is not None:
+            conditions.append(f'time_minutes < {int(high)}')
+        columns.append(BUCKET_SQL.format(
+            condition=' AND '.join(conditions)))
+    return ',\n    '.join(columns), list(zip(bounds, bounds[1:]))
+
+
+def _decimal(value):
+    return None if value is None else str(value)
+
+
+def compute_recipe_stats(user, buckets=DEFAULT_TIME_BUCKETS):
+    """Return the statistics of a user's recipes in one query
+
+    Buckets of the histogram hold the recipes with `from` <=
+    time_minutes < `to`, prices are rendered like RecipeSerializer does.
+    """
+    histogram_sql, ranges = _histogram_sql(buckets)
+    with connection.cursor() as cursor:
+        cursor.execute(STATS_SQL.format(
+            table=Recipe._meta.db_table, histogram=histogram_sql), {
+            'user_id': user.pk,
+            'percentiles': [p / 100 for p in PRICE_PERCENTILES],
+        })
+        row = cursor.fetchone()
+    (count, min_price, max_price, avg_price, percentiles,
+     min_time, max_time, avg_time), counts = row[:8], row[8:]
+    return {
+        'count': count,
+        'price': {
+            'min': _decimal(min_price),
+            'max': _decimal(max_price),
+            'avg': _decimal(avg_price),
+            'percentiles': {
+                f'p{p}': _decimal(value) for p, value in zip(
+                    PRICE_PERCENTILES,
+                    percentiles or [None] * len(PRICE_PERCENTILES))},
+        },
+        'time_minutes': {
+            'min': min_time,
+            'max': max_time,
+            'avg': None if avg_time is None else float(avg_time),
+            'histogram': [{'from': low, 'to': high, 'count': n}
+                          for (low, high), n in zip(ranges, counts)],
+        },
+    }
+
+
+def get_recipe_stats(user, version, buckets=DEFAULT_TIME_BUCKETS):
+    """Return the cached statistics of a version of a user's recipes"""
+    # One entry per user and buckets, replaced once a write bumped the
+    # version, and dropped after a while if nobody asks again.
+    key = 'recipe-stats:{}:{}'.format(user.pk, ','.join(map(str, buckets)))
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    stats = compute_recipe_stats(user, buckets)
+    cache.set(key, (version, stats), timeout=settings.RECIPE_STATS_CACHE_TTL)
+    return stats
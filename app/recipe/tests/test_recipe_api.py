@@ -1,13 +1,20 @@
 """
 Test recipe
 """
-
+import json
 from decimal import Decimal
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITransactionTestCase
 
 from core.models import Recipe
 from ..serializers import (
@@ -16,6 +23,12 @@ from ..serializers import (
 )
 
 RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export-recipes')
+ASYNC_RECIPES_URL = reverse('recipe:recipe-async-list')
+BULK_UPDATE_URL = reverse('recipe:recipe-bulk-update')
+BULK_DELETE_URL = reverse('recipe:recipe-bulk-delete')
+SYNC_URL = reverse('recipe:recipe-sync')
+STATS_URL = reverse('recipe:recipe-stats')
 
 
 def detail_url(recipe_id):
@@ -23,6 +36,11 @@ def detail_url(recipe_id):
     return reverse('recipe:recipe-detail', args=[recipe_id])
 
 
+def async_detail_url(recipe_id):
+    """ Return async recipe details URL """
+    return reverse('recipe:recipe-async-detail', args=[recipe_id])
+
+
 def create_recipe(user, **params):
     """ Test recipe creation  """
     defaults = {
@@ -76,7 +94,7 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """" Test retrieving recipes for authenticated user """
@@ -91,7 +109,107 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_list_recipes_prunes_columns(self):
+        """ Test listing recipes does not load the description """
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe_queries = [query['sql'] for query in queries
+                          if 'FROM "core_recipe"' in query['sql']]
+        self.assertEqual(len(recipe_queries), 1)
+        self.assertNotIn('description', recipe_queries[0])
+
+    def test_list_recipes_sparse_fields(self):
+        """ Test ?fields= prunes the rendered fields and selected columns """
+        recipe = create_recipe(user=self.user, title='Soup')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'],
+                         [{'id': recipe.id, 'title': 'Soup'}])
+        recipe_sql = [query['sql'] for query in queries
+                      if 'FROM "core_recipe"' in query['sql']][0]
+        self.assertNotIn('price', recipe_sql)
+
+        res = self.client.get(detail_url(recipe.id),
+                              {'fields': 'description'})
+        self.assertEqual(res.data, {'description': recipe.description})
+
+        res = self.client.get(RECIPES_URL, {'fields': 'description'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_recipes(self):
+        """ Test price and time ranges and title prefixes filter lists """
+        soup = create_recipe(user=self.user, title='Soup', time_minutes=10,
+                             price=Decimal('2.00'))
+        create_recipe(user=self.user, title='Stew', time_minutes=90,
+                      price=Decimal('8.00'))
+        salad = create_recipe(user=self.user, title='salad',
+                              time_minutes=5, price=Decimal('4.00'))
+
+        for params, expected in [
+                ({'max_price': '4.00'}, [salad, soup]),
+                ({'min_price': '3', 'max_time': 60}, [salad]),
+                ({'min_time': 10}, None),
+                ({'title': 'S'}, None),
+                ({'title': 'sA'}, [salad]),
+                ({'title': '%'}, [])]:
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            if expected is not None:
+                self.assertEqual([r['id'] for r in res.data['results']],
+                                 [r.id for r in expected], params)
+        res = self.client.get(RECIPES_URL, {'min_time': 10})
+        self.assertEqual(len(res.data['results']), 2)
+
+        res = self.client.get(RECIPES_URL, {'min_price': 'cheap'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sort_recipes_pages(self):
+        """ Test sorted lists page through ties by id """
+        prices = ['3.00', '1.00', '3.00', '2.00', '3.00', '1.00']
+        recipes = [create_recipe(user=self.user, title=f'Recipe {i}',
+                                 price=Decimal(price))
+                   for i, price in enumerate(prices)]
+
+        for ordering, key in [('price', lambda r: (r.price, r.id)),
+                              ('-price', lambda r: (-r.price, -r.id)),
+                              ('-title', None)]:
+            ids, url, params = [], RECIPES_URL, {
+                'ordering': ordering, 'page_size': 2}
+            while url:
+                res = self.client.get(url, params)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                ids += [r['id'] for r in res.data['results']]
+                url, params = res.data['next'], None
+            if key is None:
+                expected = sorted(recipes, key=lambda r: r.title.upper(),
+                                  reverse=True)
+            else:
+                expected = sorted(recipes, key=key)
+            self.assertEqual(ids, [r.id for r in expected], ordering)
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'description'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_recipes(self):
+        """ Test streaming the recipes of the user as CSV """
+        create_recipe(user=self.user, title='First', description='One')
+        create_recipe(user=self.user, title='Second')
+        other = create_user(email='other@example.com', password='test123')
+        create_recipe(user=other, title='Other')
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            lines[0], 'id,title,time_minutes,price,link,description')
+        self.assertEqual(len(lines), 3)
+        self.assertIn(',First,22,5.24,', lines[1])
+        self.assertTrue(lines[1].endswith(',One'))
 
     def test_get_recipe_details(self):
         """ Test retrieving recipe details """
@@ -189,3 +307,205 @@ class PrivateRecipeApiTests(TestCase):
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_bulk_update_recipes(self):
+        """ Test bulk update by ids reports each id """
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        other = create_recipe(user=create_user(email='sam@am.com',
+                                               password='test123a'))
+        ids = [recipes[0].id, recipes[1].id, other.id]
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BULK_UPDATE_URL, {
+                'ids': ids, 'set': {'price': '9.50'}}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual(res.data['results'], [
+            {'id': ids[0], 'status': 'updated'},
+            {'id': ids[1], 'status': 'updated'},
+            {'id': other.id, 'status': 'not_found'}])
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('price', flat=True)),
+            [Decimal('5.24'), Decimal('5.24'), Decimal('9.50'),
+             Decimal('9.50')])
+        self.assertEqual(sum('UPDATE "core_recipe"' in query['sql']
+                             for query in queries), 1)
+
+    def test_bulk_update_recipes_invalid(self):
+        """ Test invalid bulk updates change nothing """
+        recipe = create_recipe(user=self.user)
+        for payload in [
+                {'ids': [recipe.id], 'set': {'price': 'free'}},
+                {'ids': [recipe.id], 'set': {'user': 1}},
+                {'filter': {'user': 1}, 'set': {'title': 'x'}},
+                {'filter': {'price__lte': 'x'}, 'set': {'title': 'x'}},
+                {'ids': [recipe.id], 'filter': {'title': 'Test Recipe'},
+                 'set': {'title': 'x'}},
+                {'set': {'title': 'x'}}]:
+            res = self.client.post(BULK_UPDATE_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Test Recipe')
+
+    def test_bulk_delete_recipes_by_filter(self):
+        """ Test bulk delete by filter only deletes the user's recipes """
+        quick = create_recipe(user=self.user, time_minutes=5)
+        slow = create_recipe(user=self.user, time_minutes=60)
+        other = create_recipe(user=create_user(email='sam@am.com',
+                                               password='test123a'),
+                              time_minutes=5)
+
+        res = self.client.post(BULK_DELETE_URL, {
+            'filter': {'time_minutes__lte': 10}}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'],
+                         [{'id': quick.id, 'status': 'deleted'}])
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('id', flat=True)),
+            sorted([slow.id, other.id]))
+
+
+class RecipeStatsApiTests(TestCase):
+    """ Test the recipe statistics """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@sample.com', password='test123456')
+        self.client.force_authenticate(self.user)
+        for minutes, price in [(5, '1.00'), (20, '2.00'), (25, '3.00'),
+                               (90, '10.00')]:
+            create_recipe(user=self.user, time_minutes=minutes,
+                          price=Decimal(price))
+        create_recipe(user=create_user(email='sam@am.com',
+                                       password='test123a'),
+                      time_minutes=500, price=Decimal('99.00'))
+
+    def test_recipe_stats(self):
+        """ Test statistics are computed over the user's recipes """
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 4)
+        price = res.data['price']
+        self.assertEqual((price['min'], price['max'], price['avg']),
+                         ('1.00', '10.00', '4.00'))
+        self.assertEqual(price['percentiles']['p50'], '2.50')
+        self.assertEqual(res.data['time_minutes']['avg'], 35.0)
+        self.assertEqual(res.data['time_minutes']['histogram'], [
+            {'from': None, 'to': 15, 'count': 1},
+            {'from': 15, 'to': 30, 'count': 2},
+            {'from': 30, 'to': 60, 'count': 0},
+            {'from': 60, 'to': 120, 'count': 1},
+            {'from': 120, 'to': None, 'count': 0}])
+
+    def test_recipe_stats_buckets(self):
+        """ Test the histogram buckets are configurable """
+        res = self.client.get(STATS_URL, {'time_buckets': '10,100'})
+        self.assertEqual(
+            [b['count'] for b in res.data['time_minutes']['histogram']],
+            [1, 3, 0])
+
+        for buckets in ['a', '30,10', '-5', ',']:
+            res = self.client.get(STATS_URL, {'time_buckets': buckets})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipe_stats_cached_until_write(self):
+        """ Test statistics are cached until a recipe is written """
+        etag = self.client.get(STATS_URL)['ETag']
+        with self.assertNumQueries(1):
+            res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['count'], 4)
+        res = self.client.get(STATS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(RECIPES_URL, {
+            'title': 'New', 'time_minutes': 40, 'price': '4.00'})
+
+        with patch('recipe.stats.cache.set', wraps=cache.set) as cache_set:
+            res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['count'], 5)
+        self.assertEqual(
+            res.data['time_minutes']['histogram'][2]['count'], 1)
+        # The entry of the older version is replaced and expires
+        key, _ = cache_set.call_args.args
+        self.assertEqual(cache.get(key)[1], res.data)
+        self.assertEqual(cache_set.call_args.kwargs['timeout'],
+                         settings.RECIPE_STATS_CACHE_TTL)
+        self.assertEqual(len(cache._cache), 1)
+
+    def test_recipe_stats_empty(self):
+        """ Test statistics of a user without recipes """
+        self.client.force_authenticate(create_user(
+            email='new@sample.com', password='test123456'))
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['count'], 0)
+        self.assertIsNone(res.data['price']['min'])
+        self.assertIsNone(res.data['price']['percentiles']['p99'])
+        self.assertIsNone(res.data['time_minutes']['avg'])
+
+
+class RecipeSyncApiTests(APITransactionTestCase):
+    """ Test the incremental sync of recipes """
+
+    def setUp(self):
+        self.user = create_user(email='user@sample.com', password='test123456')
+        self.client.force_authenticate(self.user)
+
+    def test_sync_recipes(self):
+        """ Test recipes written and deleted since a watermark """
+        kept = create_recipe(user=self.user)
+        deleted = create_recipe(user=self.user)
+        res = self.client.get(SYNC_URL)
+        self.assertEqual([r['id'] for r in res.data['changed']],
+                         [kept.id, deleted.id])
+        self.assertIn('description', res.data['changed'][0])
+
+        self.client.patch(detail_url(kept.id), {'title': 'New'})
+        self.client.delete(detail_url(deleted.id))
+        res = self.client.get(SYNC_URL, {'since': res.data['watermark']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['title'] for r in res.data['changed']], ['New'])
+        self.assertEqual(res.data['deleted'], [deleted.id])
+
+
+class AsyncRecipeApiTests(TestCase):
+    """ Test the async recipe list and retrieve views """
+
+    def setUp(self):
+        self.user = create_user(email='user@sample.com', password='test123456')
+        token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': f'Token {token.key}'}
+        self.recipe = create_recipe(user=self.user)
+        create_recipe(user=self.user, title='Second Recipe')
+        create_recipe(
+            user=create_user(email='other@sample.com', password='test123'))
+
+    async def test_auth_required(self):
+        """ Test that a token is required """
+        res = await self.async_client.get(ASYNC_RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_list_recipes(self):
+        """ Test listing recipes of the user with the list serializer """
+        res = await self.async_client.get(
+            ASYNC_RECIPES_URL, headers=self.headers)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        serializer = RecipeSerializer(
+            [recipe async for recipe in recipes], many=True)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['results'],
+                         json.loads(json.dumps(serializer.data)))
+
+    async def test_retrieve_recipe(self):
+        """ Test retrieving recipe details """
+        res = await self.async_client.get(
+            async_detail_url(self.recipe.id), headers=self.headers)
+
+        serializer = RecipeDetailsSerializer(self.recipe)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), json.loads(json.dumps(serializer.data)))
@@ -13,4 +13,8 @@ router.register(r'recipes', views.RecipeViewSet, basename='recipe')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/recipes/', views.RecipeAsyncView.as_view(),
+         name='recipe-async-list'),
+    path('async/recipes/<int:pk>/', views.RecipeAsyncView.as_view(),
+         name='recipe-async-detail'),
 ]
@@ -1,25 +1,78 @@
 """ Views for the recipes app """
 
 from rest_framework import viewsets
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from core import export
+from core.async_views import AsyncReadView
+from core.authentication import CachedTokenAuthentication
+from core.bulk import BulkActionsMixin
+from core.etags import ConditionalGetMixin
+from core.fieldsets import SparseFieldsetViewMixin
 from core.models import Recipe
+from core.pagination import KeysetPagination
+from core.planner import plan_queryset
+from core.readers import ValuesListMixin
+from core.sync import SyncMixin
+from . import filters
 from .serializers import (
     RecipeSerializer,
     RecipeDetailsSerializer,
+    RecipeListQuerySerializer,
+    RecipeStatsQuerySerializer,
 )
+from .stats import get_recipe_stats
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, ValuesListMixin,
+                    SparseFieldsetViewMixin, BulkActionsMixin, SyncMixin,
+                    viewsets.ModelViewSet):
     """ View set for the recipes app  """
     serializer_class = RecipeDetailsSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    etag_resource = 'recipe'
+    bulk_update_fields = ['title', 'time_minutes', 'price', 'link',
+                          'description']
+    bulk_filter_fields = ['title', 'title__icontains', 'time_minutes__lte',
+                          'time_minutes__gte', 'price__lte', 'price__gte']
 
     def get_queryset(self):
-        """ Return all recipes for the user """
-        return self.queryset.filter(user=self.request.user).order_by('-id')
+        """ Return all recipes for the user, filtered and sorted in lists """
+        queryset = self.queryset.filter(
+            user=self.request.user).order_by('-id')
+        if self.list_params is not None:
+            queryset = filters.sort_recipes(
+                filters.filter_recipes(queryset, **self.list_params),
+                self.list_params['ordering'])
+        if self.action not in ('list', 'retrieve'):
+            # Writes load the one row they change, unplanned
+            return queryset
+        return plan_queryset(queryset, self.get_serializer())
+
+    @property
+    def list_params(self):
+        """ Return the filter and sort parameters of a list request """
+        if self.action != 'list':
+            return None
+        if not hasattr(self, '_list_params'):
+            params = RecipeListQuerySerializer(
+                data=self.request.query_params)
+            params.is_valid(raise_exception=True)
+            self._list_params = params.validated_data
+        return self._list_params
+
+    @property
+    def paginator(self):
+        # Sorted lists are paged by their sort key
+        if self.list_params is not None and not hasattr(self, '_paginator'):
+            paginator = filters.get_paginator(self.list_params['ordering'])
+            if paginator is not None:
+                self._paginator = paginator
+        return super().paginator
 
     def get_serializer_class(self):
         """ Return serializer class for the """
@@ -31,3 +84,41 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """ Create a new recipe and return """
         serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_recipes(self, request):
+        """ Stream all recipes as NDJSON or CSV (`?export_format=csv`) """
+        export_format = export.get_export_format(request)
+        serializer = RecipeDetailsSerializer()
+        queryset = plan_queryset(
+            self.queryset.filter(user=request.user).order_by('id'),
+            serializer)
+        rows = (serializer.to_representation(recipe)
+                for recipe in export.iterate(queryset))
+        return export.stream_export(
+            rows, export_format, 'recipes',
+            fieldnames=RecipeDetailsSerializer.Meta.fields)
+
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        """ Price and time statistics of the user's recipes
+
+        `?time_buckets=15,30,60` sets the upper bounds of the time
+        histogram buckets. Answers are cached until a recipe is written.
+        """
+        return self._conditional(self._stats, request)
+
+    def _stats(self, request):
+        params = RecipeStatsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(get_recipe_stats(
+            request.user, self.get_resource_version(),
+            params.validated_data['time_buckets']))
+
+
+class RecipeAsyncView(AsyncReadView):
+    """ Async list and retrieve of recipes """
+    queryset = Recipe.objects.all()
+    serializer_class = RecipeDetailsSerializer
+    list_serializer_class = RecipeSerializer
+    etag_resource = 'recipe'
@@ -1,8 +1,12 @@
 from rest_framework import serializers
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
+from core import hashing
+from core.metrics import TimedSerializerMixin
+from core.provisioning import MAX_PROVISION_USERS
 
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class UserCreateSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Serializer for creating users."""
 
     class Meta:
@@ -11,7 +15,10 @@ class UserCreateSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
-        return get_user_model().objects.create_user(**validated_data)
+        """Create a user, hashing the password in the hashing pool"""
+        password = validated_data.pop('password')
+        return get_user_model().objects.create_user(
+            password_hash=hashing.make_password(password), **validated_data)
 
     def validate_password(self, value):
         if len(value) < 6:
@@ -24,24 +31,55 @@ class UserCreateSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password', None)
         user = super().update(instance, validated_data)
         if password:
-            user.set_password(password)
+            user.password = hashing.make_password(password)
             user.save()
         return user
 
 
-class AuthTokenSerializer(serializers.Serializer):
+class CredentialsSerializer(serializers.Serializer):
+    """Email and password of a sign-in, not checked yet"""
     email = serializers.EmailField()
     password = serializers.CharField(
         style={'input_type': 'password'}, trim_whitespace=False)
 
+    def authentication_failed(self):
+        return serializers.ValidationError(
+            {'non_field_errors': [
+                'Unable to authenticate with provided credentials']},
+            code='authorization')
+
+
+class AuthTokenSerializer(CredentialsSerializer):
+
     def validate(self, attrs):
         email = attrs.get('email')
         password = attrs.get('password')
-        user = authenticate(username=email, password=password)
+        user = hashing.authenticate_user(
+            email, password, request=self.context.get('request'))
         if user:
             attrs['user'] = user
             return attrs
         else:
-            raise serializers.ValidationError(
-                'Unable to authenticate with provided credentials',
-                code='authorization')
+            raise self.authentication_failed()
+
+
+class ProvisionUserSerializer(serializers.Serializer):
+    """An account to provision, without a password it can't sign in"""
+    email = serializers.EmailField(max_length=255)
+    name = serializers.CharField(max_length=255, required=False,
+                                 allow_blank=True, default='')
+    password = serializers.CharField(min_length=6, required=False,
+                                     trim_whitespace=False)
+
+
+class ProvisionSerializer(serializers.Serializer):
+    """Accounts provisioned at once by staff"""
+    users = ProvisionUserSerializer(
+        many=True, allow_empty=False, max_length=MAX_PROVISION_USERS)
+
+    def validate_users(self, value):
+        emails = [get_user_model().objects.normalize_email(user['email'])
+                  for user in value]
+        if len(set(emails)) < len(emails):
+            raise serializers.ValidationError('Emails must be unique.')
+        return value
@@ -1,15 +1,22 @@
 """
 Test User API
 """
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.hashing import HashingPool
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
+PROVISION_URL = reverse('user:provision')
+ASYNC_CREATE_USER_URL = reverse('user:async-create')
+ASYNC_TOKEN_URL = reverse('user:async-token')
 
 
 def create_user(**params):
@@ -37,9 +44,11 @@ class PublicUserApiTests(TestCase):
         res = self.client.post(CREATE_USER_URL, payload)
 
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        token = res.data.pop('token')
         user = get_user_model().objects.get(**res.data)
         self.assertTrue(user.check_password(payload['password']))
         self.assertNotIn('password', res.data)
+        self.assertEqual(token, user.auth_token.key)
 
     def test_user_exists(self):
         """ Test creating a user that already exists """
@@ -155,3 +164,130 @@ class PrivateUserApiTest(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class ProvisionUsersApiTests(TestCase):
+    """ Test the staff endpoint provisioning users in bulk """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = create_user(email='staff@example.com',
+                                 password='testpass', is_staff=True)
+        self.client.force_authenticate(user=self.staff)
+
+    def test_provision_users(self):
+        """ Test new users are created with tokens, taken emails skipped """
+        res = self.client.post(PROVISION_URL, {'users': [
+            {'email': 'new@example.com', 'name': 'New',
+             'password': 'newpass123'},
+            {'email': 'staff@example.com', 'password': 'otherpass'},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = get_user_model().objects.get(email='new@example.com')
+        self.assertTrue(user.check_password('newpass123'))
+        self.assertEqual(res.data, {
+            'created': [{'email': 'new@example.com', 'name': 'New',
+                         'token': user.auth_token.key}],
+            'existing': ['staff@example.com'],
+        })
+        self.staff.refresh_from_db()
+        self.assertTrue(self.staff.check_password('testpass'))
+
+    def test_provision_users_invalid(self):
+        """ Test duplicate emails and short passwords are refused """
+        for users in [
+                [{'email': 'a@example.com'}, {'email': 'a@example.com'}],
+                [{'email': 'a@example.com', 'password': 'pw'}],
+                []]:
+            res = self.client.post(PROVISION_URL, {'users': users},
+                                   format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_provision_users_staff_only(self):
+        """ Test users that aren't staff can't provision """
+        user = create_user(email='user@example.com', password='testpass')
+        self.client.force_authenticate(user=user)
+
+        res = self.client.post(PROVISION_URL, {'users': [
+            {'email': 'new@example.com'}]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AsyncUserApiTests(TestCase):
+    """
+    Test the async sign-up and sign-in views
+    """
+
+    def test_create_user(self):
+        """
+        Test signing up returns the user and its token
+        """
+        payload = {
+            'email': 'test@example.com',
+            'password': 'testpass',
+            'name': 'Test Name'
+        }
+        res = self.client.post(
+            ASYNC_CREATE_USER_URL, payload, content_type='application/json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = get_user_model().objects.get(email=payload['email'])
+        self.assertTrue(user.check_password(payload['password']))
+        self.assertEqual(res.json(), {
+            'email': payload['email'], 'name': payload['name'],
+            'token': user.auth_token.key})
+
+    def test_create_user_invalid(self):
+        """
+        Test signing up validates like the sync view
+        """
+        create_user(email='test@example.com', password='testpass')
+
+        res = self.client.post(ASYNC_CREATE_USER_URL, {
+            'email': 'test@example.com', 'password': 'pw'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(res.json()), {'email', 'password', 'name'})
+
+    def test_create_token(self):
+        """
+        Test signing in returns the same token each time
+        """
+        create_user(email='test@example.com', password='testpass')
+        payload = {'email': 'test@example.com', 'password': 'testpass'}
+
+        res = self.client.post(ASYNC_TOKEN_URL, payload)
+        again = self.client.post(ASYNC_TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['token'], again.json()['token'])
+
+    def test_create_token_invalid_credentials(self):
+        """
+        Test signing in with a wrong password or unknown email fails
+        """
+        create_user(email='test@example.com', password='testpass')
+
+        for payload in [
+                {'email': 'test@example.com', 'password': 'wrongpass'},
+                {'email': 'nobody@example.com', 'password': 'testpass'}]:
+            res = self.client.post(ASYNC_TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('non_field_errors', res.json())
+
+    def test_sign_ins_are_rejected_when_hashing_is_saturated(self):
+        """
+        Test sign-ins get a 429 when no hashing slot is free
+        """
+        create_user(email='test@example.com', password='testpass')
+        payload = {'email': 'test@example.com', 'password': 'testpass'}
+
+        with patch('core.hashing.hashing_pool', HashingPool(1, 0)):
+            for url in [TOKEN_URL, ASYNC_TOKEN_URL]:
+                res = self.client.post(url, payload)
+                self.assertEqual(
+                    res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+                self.assertEqual(res['Retry-After'], '1')
@@ -8,5 +8,11 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.UserCreateAPIView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('me/', views.ManageUserView.as_view(), name='me')
+    path('provision/', views.ProvisionUsersView.as_view(),
+         name='provision'),
+    path('me/', views.ManageUserView.as_view(), name='me'),
+    path('async/create/', views.AsyncUserCreateView.as_view(),
+         name='async-create'),
+    path('async/token/', views.AsyncCreateTokenView.as_view(),
+         name='async-token'),
 ]
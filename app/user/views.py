@@ -2,13 +2,20 @@
 User views module for CRM API
 """
 
-from rest_framework import generics, status, authentication, permissions
+from asgiref.sync import sync_to_async
+from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
+from core import hashing
+from core.async_views import AsyncAPIView
+from core.authentication import CachedTokenAuthentication
+from core.provisioning import provision_users
 from .serializers import (
     UserCreateSerializer,
-    AuthTokenSerializer
+    AuthTokenSerializer,
+    CredentialsSerializer,
+    ProvisionSerializer,
 )
 
 
@@ -22,21 +29,12 @@ class UserCreateAPIView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         user = serializer.save()
-        Token.objects.create(user=user)
+        self.token = Token.objects.create(user=user)
 
     def create(self, request, *args, **kwargs):
-        response = super(UserCreateAPIView,
-                         self).create(request,
-                                      *args,
-                                      **kwargs)
-        if response.status_code == status.HTTP_201_CREATED:
-            # Ensure we have a valid user instance from the serializer
-            user = self.get_serializer().instance
-            if user and user.pk:
-                token, created = Token.objects.get_or_create(user=user)
-                response.data['token'] = token.key
-            else:
-                pass
+        """ Create a user, answering with its token too """
+        response = super().create(request, *args, **kwargs)
+        response.data['token'] = self.token.key
         return response
 
 
@@ -59,9 +57,67 @@ class CreateTokenView(generics.CreateAPIView):
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """ Manage the authenticated user """
     serializer_class = UserCreateSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """ Retrieve and update the authenticated user """
         return self.request.user
+
+
+class ProvisionUsersView(generics.GenericAPIView):
+    """ Create many users at once, for staff
+
+    Accounts whose email is already taken are skipped and listed in
+    `existing`, the others are created with their tokens.
+    """
+    serializer_class = ProvisionSerializer
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, existing = provision_users(
+            serializer.validated_data['users'])
+        return Response({
+            'created': [
+                {'email': user.email, 'name': user.name,
+                 'token': user.auth_token.key}
+                for user in created],
+            'existing': existing,
+        }, status=status.HTTP_201_CREATED)
+
+
+class AsyncUserCreateView(AsyncAPIView):
+    """ Async sign-up returning the new user and its token """
+    http_method_names = ['post', 'options']
+
+    async def post(self, request):
+        serializer = UserCreateSerializer(data=request.data)
+        # Validation looks up the email, off the event loop
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        data = dict(serializer.validated_data)
+        password_hash = await hashing.amake_password(data.pop('password'))
+        user = await sync_to_async(get_user_model().objects.create_user)(
+            password_hash=password_hash, **data)
+        token = await Token.objects.acreate(user=user)
+        return self.render(
+            {**UserCreateSerializer(user).data, 'token': token.key},
+            status.HTTP_201_CREATED)
+
+
+class AsyncCreateTokenView(AsyncAPIView):
+    """ Async sign-in creating (or returning) the user's token """
+    http_method_names = ['post', 'options']
+
+    async def post(self, request):
+        serializer = CredentialsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = await hashing.aauthenticate_user(
+            serializer.validated_data['email'],
+            serializer.validated_data['password'], request=request)
+        if user is None:
+            raise serializer.authentication_failed()
+        token, _ = await Token.objects.aget_or_create(user=user)
+        return self.render({'token': token.key})